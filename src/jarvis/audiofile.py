@@ -0,0 +1,81 @@
+"""Audio file output — utterances written chunk by chunk while they are generated.
+
+The file format follows the request's "format" field, else the output extension:
+WAV and FLAC as 16-bit PCM, Ogg as Opus. AudioWriter writes to "<output>.part" and
+renames it over the output when the utterance is complete, so a cancelled or failed
+request leaves no half-written file behind, and readers never see a partial output.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+# format name -> (libsndfile major format, subtype)
+FORMATS = {
+    "wav": ("WAV", "PCM_16"),
+    "flac": ("FLAC", "PCM_16"),
+    "opus": ("OGG", "OPUS"),
+}
+EXTENSIONS = {".wav": "wav", ".flac": "flac", ".ogg": "opus", ".opus": "opus"}
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)  # the only rates Ogg/Opus can carry
+
+
+def output_format(path, fmt: str | None = None) -> str:
+    """Format name for an output: fmt if given, else from the extension."""
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown audio format {fmt!r} (known: {', '.join(FORMATS)})")
+        return fmt
+    suffix = Path(path).suffix.lower()
+    if suffix not in EXTENSIONS:
+        raise ValueError(f"unknown audio file extension {suffix or '(none)'!r} for {path} "
+                         f"(known: {', '.join(EXTENSIONS)}, or set the format)")
+    return EXTENSIONS[suffix]
+
+
+class AudioWriter:
+    """Mono audio written to a file as it arrives: write() each block, then close().
+
+    discard() drops what was written (cancelled request, a take given up on).
+    """
+
+    def __init__(self, path, sr: int, fmt: str | None = None):
+        self.path = Path(path)
+        self.format = output_format(path, fmt)
+        major, subtype = FORMATS[self.format]
+        if subtype == "OPUS" and sr not in OPUS_RATES:
+            raise ValueError(f"Ogg/Opus can't carry {sr} Hz audio")
+        self.part = self.path.with_name(self.path.name + ".part")
+        self.frames = 0
+        self._file = sf.SoundFile(self.part, "w", samplerate=sr, channels=1,
+                                  format=major, subtype=subtype)
+
+    def write(self, pcm: np.ndarray):
+        pcm = np.asarray(pcm, dtype=np.float32).reshape(-1)
+        if len(pcm):
+            self._file.write(pcm)
+            self.frames += len(pcm)
+
+    def close(self) -> Path:
+        """Finish the file and move it to its output path."""
+        self._file.close()
+        os.replace(self.part, self.path)
+        return self.path
+
+    def discard(self):
+        if not self._file.closed:
+            self._file.close()
+        self.part.unlink(missing_ok=True)
+
+
+def write_audio(path, audio: np.ndarray, sr: int, fmt: str | None = None):
+    """Write a whole utterance in one go (audio the main process already holds)."""
+    writer = AudioWriter(path, sr, fmt)
+    try:
+        writer.write(audio)
+    except BaseException:
+        writer.discard()
+        raise
+    writer.close()
@@ -0,0 +1,155 @@
+"""jah batch — render a manifest of lines to audio files through the daemon.
+
+The manifest is JSONL (one object per line) or CSV (header row), with the fields text,
+output, and optionally language, instruct, speaker and format. Relative output paths
+are resolved against the manifest's directory. Requests are pipelined over one
+DaemonClient connection, enough of them in flight to keep every worker slot busy.
+Lines whose output already exists are skipped: the daemon only renames a file into
+place once it is complete, so an interrupted job resumes where it stopped.
+"""
+
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import click
+
+from jarvis.cli import DaemonClient
+
+FIELDS = ("text", "output", "language", "instruct", "speaker", "format")
+BUSY_RETRY_S = 1.0  # wait before resubmitting a request the daemon refused as busy, at least
+REQUEST_TIMEOUT = 600  # queue wait included
+
+
+def read_manifest(path: Path) -> list[dict]:
+    """Manifest entries, each with its line number and an absolute output path."""
+    with open(path, newline="", encoding="utf-8") as f:
+        rows: list[tuple[int, dict]]  # (line number, fields)
+        if path.suffix.lower() == ".csv":
+            rows = list(enumerate(csv.DictReader(f), 2))
+        else:
+            rows = []
+            for number, text in enumerate(f, 1):
+                if not text.strip():
+                    continue
+                try:
+                    rows.append((number, json.loads(text)))
+                except ValueError as e:
+                    raise click.ClickException(f"{path}:{number}: invalid JSON ({e})") from None
+
+    entries = []
+    for line, row in rows:
+        entry: dict = {k: row[k] for k in FIELDS if row.get(k)}
+        if not entry.get("text") or not entry.get("output"):
+            raise click.ClickException(f"{path}:{line}: text and output are required")
+        entry["output"] = str((path.parent / Path(entry["output"]).expanduser()).resolve())
+        entry["line"] = line
+        entries.append(entry)
+    return entries
+
+
+def auto_concurrency(client: DaemonClient) -> int:
+    """Two requests per worker slot the pool may grow to: one running, one queued behind it."""
+    status = client.request({"action": "status"}, timeout=10)
+    workers = status.get("max_workers") or status.get("target_workers") or 1
+    return int(2 * workers * status.get("slots_per_worker", 1))
+
+
+class Progress:
+    """Counts and throughput of a batch run, redrawn on one stderr line."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.ok = self.failed = 0
+        self.audio_s = 0.0
+        self.t0 = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, reply: dict):
+        with self._lock:
+            if reply.get("status") == "ok":
+                self.ok += 1
+                self.audio_s += reply.get("audio_s") or 0.0
+            else:
+                self.failed += 1
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.t0
+        done = self.ok + self.failed
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - done) / rate if rate else None
+        return (f"{done}/{self.total}  ok {self.ok}  failed {self.failed}  "
+                f"{rate * 60:.1f}/min  audio {self.audio_s / elapsed if elapsed > 0 else 0.0:.2f}x  "
+                f"ETA {'-' if eta is None else _clock(eta)}")
+
+    def show(self, final: bool = False):
+        if sys.stderr.isatty():
+            click.echo(f"\r\033[K{self.line()}", err=True, nl=final)
+        elif final:
+            click.echo(self.line(), err=True)
+
+
+def _clock(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def render(client: DaemonClient, entry: dict, defaults: dict, request_id: str) -> dict:
+    """Generate one entry to its file, resubmitting while the daemon answers busy."""
+    request = {"action": "generate", "id": request_id, **defaults,
+               **{k: v for k, v in entry.items() if k != "line"}}
+    Path(request["output"]).parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        try:
+            reply = client.request(request, timeout=REQUEST_TIMEOUT)
+        except (OSError, ValueError) as e:
+            return {"status": "error", "message": str(e)}
+        if reply.get("status") != "busy":
+            return reply
+        time.sleep(max(BUSY_RETRY_S, reply.get("wait_s") or 0.0))
+
+
+def run_batch(manifest: Path, concurrency: int | None, defaults: dict, overwrite: bool) -> int:
+    """Render the manifest; returns the number of failed entries."""
+    entries = read_manifest(manifest)
+    todo = [e for e in entries if overwrite or not os.path.exists(e["output"])]
+    click.echo(f"{len(entries)} lines, {len(entries) - len(todo)} already rendered, "
+               f"{len(todo)} to go", err=True)
+    if not todo:
+        return 0
+
+    progress = Progress(len(todo))
+    failures = []
+    prefix = f"batch-{os.getpid()}"
+    with DaemonClient(timeout=REQUEST_TIMEOUT) as client:
+        concurrency = concurrency or auto_concurrency(client)
+        click.echo(f"concurrency {concurrency}", err=True)
+        pool = ThreadPoolExecutor(concurrency)
+        futures = {pool.submit(render, client, e, defaults, f"{prefix}-{i}"): (i, e)
+                   for i, e in enumerate(todo)}
+        try:
+            for fut in as_completed(futures):
+                reply = fut.result()
+                progress.add(reply)
+                if reply.get("status") != "ok":
+                    failures.append((futures[fut][1], reply))
+                progress.show()
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            running = [f"{prefix}-{i}" for fut, (i, _) in futures.items() if not fut.done()]
+            client.request({"action": "cancel", "ids": running}, timeout=10)
+            progress.show(final=True)
+            click.echo("Interrupted: run the same command again to resume.", err=True)
+            return len(todo) - progress.ok
+        pool.shutdown()
+    progress.show(final=True)
+
+    for entry, reply in failures:
+        click.echo(f"{manifest}:{entry['line']}: {entry['output']}: "
+                   f"{reply.get('status')} {reply.get('message') or ''}".rstrip(), err=True)
+    return len(failures)
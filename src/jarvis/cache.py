@@ -0,0 +1,188 @@
+"""Content-addressed TTS result cache — served from the daemon main process.
+
+Key: sha256 over (sanitized text, language, instruct, speaker, model id, and the
+long-text options split, trim and crossfade_ms, which change the stitched audio).
+Store: one raw float32 file per entry under CACHE_DIR, plus index.json holding
+{key: [sample_rate, n_bytes]} in LRU order (oldest first). The in-memory index is
+an OrderedDict in the same order; total size is capped and the least recently
+used entries are evicted first. index.json is rewritten at most every
+INDEX_SAVE_INTERVAL seconds (and at shutdown): entries stored since the last save are
+dropped at the next start if the daemon dies in between.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from jarvis.handlers import sanitize_text
+from jarvis.longtext import CROSSFADE_MS
+
+CACHE_DIR = Path.home() / ".cache" / "jarvis" / "tts"
+DEFAULT_CACHE_MB = 512
+INDEX_SAVE_INTERVAL = 5.0  # seconds between two index writes triggered by put()
+
+
+def cache_key(request: dict, model_id: str) -> str | None:
+    """Key for a generate request, or None if the request should bypass the cache."""
+    if request.get("cache") is False:
+        return None
+    text = sanitize_text(request.get("text") or "")
+    if not text:
+        return None
+    parts = [
+        text,
+        request.get("language", "English"),
+        request.get("instruct") or "",
+        request.get("speaker") or "",
+        model_id,
+        # long-text options, with the defaults the daemon applies
+        str(bool(request.get("split", True))),
+        str(bool(request.get("trim", True))),
+        str(float(request.get("crossfade_ms", CROSSFADE_MS))),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """LRU-evicted on-disk PCM store with an in-memory index and hit/miss counters."""
+
+    def __init__(self, root: Path = CACHE_DIR, max_mb: int = DEFAULT_CACHE_MB):
+        self.root = root
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index: OrderedDict[str, tuple[int, int]] = OrderedDict()  # key -> (sr, n_bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # one index writer at a time
+        self._dirty = False  # index.json differs from _index
+        self._saved_at = time.monotonic()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.f32"
+
+    def _load_index(self):
+        index_file = self.root / "index.json"
+        try:
+            entries = json.loads(index_file.read_text())
+        except (OSError, ValueError):
+            entries = {}
+        for key, (sr, n_bytes) in entries.items():
+            if self._path(key).exists():
+                self._index[key] = (sr, n_bytes)
+                self._bytes += n_bytes
+        # Drop files the index doesn't know about (crash between write and index save)
+        for path in self.root.glob("*.f32"):
+            if path.stem not in self._index:
+                path.unlink(missing_ok=True)
+        for path in self.root.glob("*.tmp"):
+            path.unlink(missing_ok=True)
+        self._evict()
+
+    def _write_file(self, path: Path, write):
+        """Write through a uniquely named temporary file, then move it into place."""
+        with tempfile.NamedTemporaryFile("wb", dir=self.root, suffix=".tmp", delete=False) as f:
+            tmp = Path(f.name)
+            try:
+                write(f)
+            except BaseException:
+                f.close()
+                tmp.unlink(missing_ok=True)
+                raise
+        os.replace(tmp, path)
+
+    def save_index(self):
+        """Persist the index (LRU order included) to disk, if it changed."""
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries = {k: list(v) for k, v in self._index.items()}
+                self._dirty = False
+            try:
+                self._write_file(self.root / "index.json",
+                                 lambda f: f.write(json.dumps(entries).encode("utf-8")))
+            except OSError:
+                with self._lock:
+                    self._dirty = True
+                raise
+            self._saved_at = time.monotonic()
+
+    def get(self, key: str) -> tuple[np.ndarray, int] | None:
+        """Return (audio (n, 1) float32, sample_rate) and mark it recently used, or None."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self._dirty = True
+        try:
+            audio = np.fromfile(self._path(key), dtype=np.float32).reshape(-1, 1)
+        except OSError:
+            with self._lock:
+                self._drop(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return audio, entry[0]
+
+    def put(self, key: str, audio: np.ndarray, sr: int):
+        """Store an utterance, evicting least recently used entries beyond the size cap."""
+        data = np.ascontiguousarray(audio, dtype=np.float32)
+        if data.nbytes == 0 or data.nbytes > self.max_bytes:
+            return
+        self._write_file(self._path(key), lambda f: f.write(memoryview(data).cast("B")))
+        with self._lock:
+            if key in self._index:
+                self._drop(key, unlink=False)
+            self._index[key] = (sr, data.nbytes)
+            self._bytes += data.nbytes
+            self._evict()
+            self._dirty = True
+        if time.monotonic() - self._saved_at >= INDEX_SAVE_INTERVAL:
+            try:
+                self.save_index()
+            except OSError:
+                pass  # retried at the next put or at shutdown; the entry itself is stored
+
+    def _drop(self, key: str, unlink: bool = True):
+        # get() reads the file outside the lock: the entry may be evicted meanwhile
+        entry = self._index.pop(key, None)
+        if entry is None:
+            return
+        _, n_bytes = entry
+        self._bytes -= n_bytes
+        if unlink:
+            self._path(key).unlink(missing_ok=True)
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._index:
+            key = next(iter(self._index))
+            self._drop(key)
+            self.evictions += 1
+            self._dirty = True
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "size_mb": round(self._bytes / (1024 * 1024), 1),
+                "max_mb": self.max_bytes // (1024 * 1024),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+            }
@@ -1,24 +1,34 @@
 """jah — CLI client for the jarvis TTS daemon."""
 
-import json
+import itertools
+import os
+import queue
 import socket
 import struct
 import sys
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import Future
 from pathlib import Path
 
 import click
 
+from jarvis import protocol
+from jarvis import trace as tracing
+
 SOCKET_PATH = Path.home() / ".q3tts.sock"
 
-SUBCOMMANDS = {"serve", "stop", "status", "stress", "listen", "echo", "talk", "panel"}
+SUBCOMMANDS = {"serve", "stop", "status", "top", "trace", "batch", "stress", "listen", "echo", "talk", "panel"}
+TRACED_ACTIONS = {"generate", "generate_stream"}
 
 
 def send_message(sock: socket.socket, msg: dict):
-    payload = json.dumps(msg).encode("utf-8")
-    sock.sendall(struct.pack("!I", len(payload)) + payload)
+    sock.sendall(protocol.encode_json(msg))
 
 
 def read_message(sock: socket.socket) -> dict:
+    """Read one frame: a JSON message, or an audio frame decoded to a dict with "pcm"."""
     raw_len = b""
     while len(raw_len) < 4:
         chunk = sock.recv(4 - len(raw_len))
@@ -27,13 +37,15 @@ def read_message(sock: socket.socket) -> dict:
         raw_len += chunk
     msg_len = struct.unpack("!I", raw_len)[0]
 
-    data = b""
-    while len(data) < msg_len:
-        chunk = sock.recv(msg_len - len(data))
-        if not chunk:
+    data = bytearray(msg_len)
+    view = memoryview(data)
+    received = 0
+    while received < msg_len:
+        n = sock.recv_into(view[received:])
+        if not n:
             raise ConnectionError("daemon disconnected")
-        data += chunk
-    return json.loads(data.decode("utf-8"))
+        received += n
+    return protocol.decode(data)
 
 
 def daemon_is_running() -> bool:
@@ -41,12 +53,217 @@ def daemon_is_running() -> bool:
     return SOCKET_PATH.exists()
 
 
+def start_trace(request: dict) -> tuple[dict, "tracing.Trace | None"]:
+    """Give a generate request a trace id (kept if the caller set one)."""
+    if request.get("action", "generate") not in TRACED_ACTIONS:
+        return request, None
+    trace = tracing.Trace(request.get("trace_id"), "client")
+    return {**request, "trace_id": trace.id}, trace
+
+
+def finish_trace(trace, reply: dict, start: float):
+    """Record the client round trip, add it to the reply's timing and write the client spans."""
+    if trace is None:
+        return
+    end = time.time()
+    trace.add("client.request", start, end, status=reply.get("status"))
+    if isinstance(reply.get("timing"), dict):
+        reply["timing"]["connect_s"] = round(trace.total("client.connect"), 3)
+        reply["timing"]["client_s"] = round(end - start, 3)
+    tracing.write(trace.spans)
+
+
 def send_request(request: dict, timeout: float = 120) -> dict:
+    """Send one request on a fresh connection and return the reply."""
+    request, trace = start_trace(request)
+    start = time.time()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        connect_start = time.time()
+        s.connect(str(SOCKET_PATH))
+        if trace is not None:
+            trace.add("client.connect", connect_start, time.time())
+        send_message(s, request)
+        reply = read_message(s)
+    finish_trace(trace, reply, start)
+    return reply
+
+
+def stream_request(request: dict, timeout: float = 120) -> Iterator[dict]:
+    """Send a generate_stream request. Yields chunk messages, then the final message."""
+    request, trace = start_trace({**request, "action": "generate_stream"})
+    start = time.time()
     with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
         s.settimeout(timeout)
+        connect_start = time.time()
         s.connect(str(SOCKET_PATH))
+        if trace is not None:
+            trace.add("client.connect", connect_start, time.time())
         send_message(s, request)
-        return read_message(s)
+        while True:
+            msg = read_message(s)
+            if msg.get("status") != "chunk":
+                finish_trace(trace, msg, start)
+                yield msg
+                return
+            yield msg
+
+
+Replies = queue.Queue[dict | Exception]  # messages for one request, or the connection's error
+
+
+class DaemonClient:
+    """One long-lived connection to the daemon, carrying many requests tagged with ids.
+
+    Thread-safe: requests from several threads are pipelined over the same socket and a
+    reader thread routes replies, which may arrive out of order, back by id. Reconnects
+    on the next request if the daemon went away.
+    """
+
+    def __init__(self, timeout: float = 120):
+        self.timeout = timeout
+        self._sock: socket.socket | None = None
+        self._send_lock = threading.Lock()
+        self._waiters: dict[str, tuple[Replies, socket.socket]] = {}  # id -> (messages, socket)
+        self._waiters_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._prefix = f"c{os.getpid()}-{id(self) & 0xffff:x}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(str(SOCKET_PATH))
+        self._sock = sock
+        threading.Thread(target=self._read_loop, args=(sock,), daemon=True).start()
+        return sock
+
+    def _read_loop(self, sock):
+        try:
+            while True:
+                msg = read_message(sock)
+                with self._waiters_lock:
+                    entry = self._waiters.get(msg.get("id", ""))
+                if entry is not None:
+                    entry[0].put(msg)
+        except (OSError, ValueError) as e:
+            error = e if isinstance(e, ConnectionError) else ConnectionError(str(e))
+        with self._send_lock:
+            if self._sock is sock:
+                self._sock = None
+        with self._waiters_lock:
+            waiters = [q for q, s in self._waiters.values() if s is sock]
+        for q in waiters:
+            q.put(error)
+
+    def _send(self, request: dict) -> tuple[str, Replies]:
+        request_id = request.get("id") or f"{self._prefix}-{next(self._ids)}"
+        q: Replies = queue.Queue()
+        try:
+            with self._send_lock:
+                sock = self._sock or self._connect()
+                with self._waiters_lock:
+                    self._waiters[request_id] = (q, sock)
+                send_message(sock, {**request, "id": request_id})
+        except OSError:
+            self._forget(request_id)
+            raise
+        return request_id, q
+
+    def _forget(self, request_id):
+        with self._waiters_lock:
+            self._waiters.pop(request_id, None)
+
+    def _next(self, q: Replies, timeout: float | None) -> dict:
+        try:
+            msg = q.get(timeout=timeout or self.timeout)
+        except queue.Empty:
+            raise TimeoutError("no reply from daemon") from None
+        if isinstance(msg, Exception):
+            raise msg
+        return msg
+
+    def request(self, request: dict, timeout: float | None = None) -> dict:
+        """Send a request and wait for its reply (chunk messages are skipped)."""
+        request, trace = start_trace(request)
+        start = time.time()
+        request_id, q = self._send(request)
+        try:
+            while True:
+                msg = self._next(q, timeout)
+                if msg.get("status") != "chunk":
+                    finish_trace(trace, msg, start)
+                    return msg
+        finally:
+            self._forget(request_id)
+
+    def submit(self, request: dict, timeout: float | None = None) -> Future:
+        """Send a request without waiting. The Future resolves to its final reply."""
+        fut: Future[dict] = Future()
+
+        def wait():
+            try:
+                fut.set_result(self.request(request, timeout))
+            except Exception as e:
+                fut.set_exception(e)
+
+        threading.Thread(target=wait, daemon=True).start()
+        return fut
+
+    def stream(self, request: dict, timeout: float | None = None):
+        """generate_stream over this connection: yields chunk messages, then the final one."""
+        request, trace = start_trace({**request, "action": "generate_stream"})
+        start = time.time()
+        request_id, q = self._send(request)
+        try:
+            while True:
+                msg = self._next(q, timeout)
+                if msg.get("status") != "chunk":
+                    finish_trace(trace, msg, start)
+                    yield msg
+                    return
+                yield msg
+        finally:
+            self._forget(request_id)
+
+    def close(self):
+        with self._send_lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+
+def decode_chunk(msg: dict):
+    """Decode a stream chunk message (audio frame or base64 JSON) into a float32 (n, 1) array."""
+    return protocol.to_float32(msg)
+
+
+def play_stream(request: dict) -> dict:
+    """Play a streamed generation on the local speakers. Returns the final message."""
+    import sounddevice as sd
+
+    out = None
+    try:
+        for msg in stream_request({**request, "wire": "binary"}):
+            if msg.get("status") != "chunk":
+                return msg
+            if out is None:
+                out = sd.OutputStream(samplerate=msg["sample_rate"], channels=1, dtype="float32")
+                out.start()
+            out.write(decode_chunk(msg))
+    finally:
+        if out is not None:
+            out.stop()
+            out.close()
+    return {"status": "error", "message": "stream ended without result"}
 
 
 class JahGroup(click.Group):
@@ -68,9 +285,18 @@ def cli():
 @cli.command()
 @click.argument("text", required=False)
 @click.option("-o", "--output", default=None, help="Save audio to file")
+@click.option("-f", "--format", "audio_format", type=click.Choice(["wav", "flac", "opus"]), default=None,
+              help="Format of the -o file (default: from its extension; unknown extensions are refused)")
 @click.option("-l", "--language", default="English", help="Language (default: English)")
 @click.option("-i", "--instruct", default=None, help="Voice instruction")
-def speak(text, output, language, instruct):
+@click.option("--stream", is_flag=True, help="Stream audio to this process and play as it arrives")
+@click.option("-p", "--priority", type=click.Choice(["interactive", "normal", "batch"]),
+              default="normal", help="Scheduling class (default: normal)")
+@click.option("--deadline", type=float, default=None,
+              help="Refused up front if the predicted wait is longer, dropped if no worker is free in time")
+@click.option("--speculative", is_flag=True,
+              help="Also generate a second take on an idle worker, keep the first that passes")
+def speak(text, output, audio_format, language, instruct, stream, priority, deadline, speculative):
     """Generate speech from text."""
     # Piped input always wins over positional argument
     if not sys.stdin.isatty():
@@ -87,15 +313,27 @@ def speak(text, output, language, instruct):
         click.echo("Error: daemon is not running. Start it with: jah serve", err=True)
         sys.exit(1)
 
+    if stream and output:
+        click.echo("Error: --stream plays locally and cannot be combined with -o.", err=True)
+        sys.exit(1)
+
+    if audio_format and not output:
+        click.echo("Error: --format applies to the -o file.", err=True)
+        sys.exit(1)
+
     request = {
         "action": "generate",
         "text": text,
         "language": language,
         "instruct": instruct,
         "output": output,
+        "format": audio_format,
+        "priority": priority,
+        "deadline_s": deadline,
+        "speculative": speculative,
     }
 
-    resp = send_request(request)
+    resp = play_stream(request) if stream else send_request(request)
     if resp.get("status") == "ok":
         click.echo("ok")
     else:
@@ -106,10 +344,23 @@ def speak(text, output, language, instruct):
 @cli.command()
 @click.option("-m", "--model", default=None, help="TTS model: 1.7b (default) or 0.6b")
 @click.option("-w", "--workers", default=3, type=int, help="Number of parallel TTS workers (default: 3)")
-def serve(model, workers):
+@click.option("--max-workers", default=None, type=int,
+              help="Grow up to this many workers when requests queue up (default: --workers)")
+@click.option("--idle-timeout", default=600, type=float,
+              help="Retire workers above --workers after this many idle seconds (default: 600)")
+@click.option("--cache-mb", default=512, type=int, help="TTS result cache size in MB, 0 disables (default: 512)")
+@click.option("-s", "--slots", default=1, type=int,
+              help="Requests each worker decodes as one batch on its one model copy (default: 1)")
+@click.option("--production", is_flag=True,
+              help="Never reload handlers.py (default: reload it when the file changes)")
+@click.option("--preload", is_flag=True,
+              help="Fork workers from a server that imported mlx-audio once, and warm them up")
+def serve(model, workers, max_workers, idle_timeout, cache_mb, slots, production, preload):
     """Start the TTS daemon."""
     from jarvis.daemon import main as daemon_main
-    daemon_main(model_name=model, n_workers=workers)
+    daemon_main(model_name=model, n_workers=workers, cache_mb=cache_mb,
+                max_workers=max_workers, idle_timeout=idle_timeout, slots=slots,
+                hot_reload=not production, preload=preload)
 
 
 @cli.command()
@@ -128,11 +379,184 @@ def stop():
 
 @cli.command()
 def status():
-    """Check if the daemon is running."""
-    if daemon_is_running():
-        click.echo("Daemon is running.")
-    else:
+    """Check that the daemon is running and answering, and show its load."""
+    if not daemon_is_running():
         click.echo("Daemon is not running.")
+        return
+    try:
+        resp = send_request({"action": "status"}, timeout=5)
+    except (OSError, ValueError) as e:
+        click.echo(f"Daemon socket exists but the daemon is not responding ({e}).", err=True)
+        sys.exit(1)
+
+    click.echo("Daemon is running.")
+    click.echo(f"  workers:  {resp.get('workers')}/{resp.get('target_workers')} "
+               f"(idle {resp.get('idle_workers')}, {resp.get('slots_per_worker', 1)} slots each, "
+               f"restarts {resp.get('restarts', 0)})")
+    click.echo(f"  requests: served {resp.get('requests_served')}, running {resp.get('running', 0)}, "
+               f"queued {resp.get('queued', 0)}")
+    pending = resp.get("queue")
+    if pending:
+        click.echo("  queue:    " + ", ".join(
+            f"{name} {pending['depth'][name]} (wait ~{pending['predicted_wait_s'][name]}s)"
+            for name in pending["depth"]))
+    click.echo(f"  memory:   main process {resp.get('memory_mb')} MB (see jah top for workers)")
+    click.echo(f"  reload:   {'on handlers.py change' if resp.get('hot_reload', True) else 'off (production)'}")
+    startup = resp.get("startup")
+    if startup:
+        def phase(key):
+            return "-" if startup.get(key) is None else f"{startup[key]:.1f}s"
+        click.echo(f"  startup:  {startup.get('start_method')}, imports {phase('imports_s')}, "
+                   f"load {phase('load_s')}, warm-up {phase('warmup_s')}, ready {phase('ready_s')}, "
+                   f"fillers {phase('fillers_s')}")
+    playback = resp.get("playback")
+    if playback:
+        click.echo(f"  playback: played {playback['played']} ({playback['played_s']}s), queued {playback['queued']}, "
+                   f"underflows {playback['underflows']}, gaps {playback['gaps']}")
+    cache = resp.get("cache")
+    if cache:
+        click.echo(f"  cache:    {cache['entries']} entries, {cache['size_mb']}/{cache['max_mb']} MB, "
+                   f"hit rate {cache['hit_rate']}")
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+def render_metrics(m: dict, interval: float) -> str:
+    """Format a metrics reply as the jah top screen."""
+    def num(v, fmt="{:.2f}"):
+        return "-" if v is None else fmt.format(v)
+
+    counters = m.get("counters", {})
+    mem = m.get("memory_mb", {})
+    workers = m.get("workers", [])
+    free = sum(w["slots"] - w["running"] for w in workers if w["state"] in ("idle", "busy"))
+
+    lines = [
+        f"jah top — {m.get('model')}   up {_duration(m.get('uptime_s', 0))}   every {interval:g}s",
+        f"requests  served {m.get('requests_served', 0)}  ok {counters.get('requests_ok', 0)}  "
+        f"errors {counters.get('requests_error', 0)}  cancelled {counters.get('requests_cancelled', 0)}  "
+        f"cache hits {counters.get('cache_hits', 0)}",
+        f"load      running {m.get('running', 0)}  queued {m.get('queued', 0)}  free slots {free}",
+        f"memory    main {num(mem.get('main'), '{} MB')}  workers {num(mem.get('workers'), '{} MB')}  "
+        f"available {num(mem.get('available'), '{} MB')}",
+    ]
+    playback = m.get("playback")
+    if playback:
+        lines.append(f"playback  {'playing' if playback['playing'] else 'idle'}  queued {playback['queued']}  "
+                     f"played {playback['played']}  underflows {playback['underflows']}  gaps {playback['gaps']}")
+    if m.get("queued") and not free:
+        lines.append(f"SATURATED: {m['queued']} request(s) waiting, no free worker slot")
+    lines.append("")
+
+    labels = {"queue_wait_s": "queue wait (s)", "first_chunk_s": "first chunk (s)",
+              "generation_s": "generation (s)", "rtf": "real-time factor", "retries": "retries",
+              "handler_reload_s": "handler reload (s)"}
+    lines.append(f"{'':18s}{'count':>7s}{'mean':>8s}{'p50':>8s}{'p90':>8s}{'p99':>8s}{'max':>8s}")
+    for name, label in labels.items():
+        h = m.get("histograms", {}).get(name)
+        if h is None:
+            continue
+        lines.append(f"{label:18s}{h['count']:>7d}" + "".join(
+            f"{num(h[k]):>8s}" for k in ("mean", "p50", "p90", "p99", "max")))
+    lines.append("")
+
+    lines.append(f"{'worker':>6s}  {'pid':>7s}  {'state':8s}{'load':>6s}{'busy 1m':>9s}{'busy all':>10s}"
+                 f"{'served':>8s}{'restarts':>10s}{'rss':>10s}")
+    for w in workers:
+        lines.append(
+            f"{w['id']:>6d}  {w['pid'] or '-':>7}  {w['state']:8s}{w['running']:>3d}/{w['slots']:<2d}"
+            f"{num(w['busy_ratio']):>9s}{num(w['busy_ratio_total']):>10s}"
+            f"{w['served']:>8d}{w['restarts']:>10d}{num(w['rss_mb'], '{} MB'):>10s}")
+    return "\n".join(lines)
+
+
+@cli.command()
+@click.option("-n", "--interval", default=1.0, type=float, help="Refresh interval in seconds (default: 1)")
+def top(interval):
+    """Live dashboard of daemon load, latencies and workers (Ctrl-C to quit)."""
+    if not daemon_is_running():
+        click.echo("Error: daemon is not running. Start it with: jah serve", err=True)
+        sys.exit(1)
+
+    with DaemonClient(timeout=10) as client:
+        try:
+            while True:
+                try:
+                    screen = render_metrics(client.request({"action": "metrics"}), interval)
+                except (OSError, ValueError) as e:
+                    screen = f"daemon not responding: {e}"
+                click.clear()
+                click.echo(screen)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+
+@cli.command(name="trace")
+@click.argument("trace_id", required=False)
+@click.option("--last", default=1, type=int, help="Without TRACE_ID: number of latest traces (default: 1)")
+@click.option("--chrome", "chrome_path", default=None,
+              help="Write Chrome/Perfetto trace-event JSON to this file instead of printing")
+def trace_cmd(trace_id, last, chrome_path):
+    """Show request traces (default: the latest) or export them for Perfetto."""
+    import json
+
+    spans = sorted(tracing.read(), key=lambda s: s["ts"])
+    if trace_id:
+        spans = [s for s in spans if s["trace"].startswith(trace_id)]
+    else:
+        ids = set(list(dict.fromkeys(s["trace"] for s in spans))[-last:])
+        spans = [s for s in spans if s["trace"] in ids]
+    if not spans:
+        click.echo(f"No matching traces in {tracing.TRACE_FILE}", err=True)
+        sys.exit(1)
+
+    if chrome_path:
+        Path(chrome_path).write_text(json.dumps(tracing.to_chrome(spans)))
+        n_traces = len({s["trace"] for s in spans})
+        click.echo(f"{len(spans)} spans from {n_traces} trace(s) written to {chrome_path} "
+                   f"(open in https://ui.perfetto.dev or chrome://tracing)")
+        return
+
+    by_trace: dict[str, list[dict]] = {}
+    for s in spans:
+        by_trace.setdefault(s["trace"], []).append(s)
+    for tid, trace_spans in by_trace.items():
+        t0 = trace_spans[0]["ts"]
+        click.echo(f"trace {tid}")
+        for s in trace_spans:
+            attrs = " ".join(f"{k}={v}" for k, v in s.get("attrs", {}).items() if v is not None)
+            click.echo(f"  +{(s['ts'] - t0) * 1000:8.1f}ms {s['dur'] * 1000:9.1f}ms  "
+                       f"{s['proc']:10s} {s['name']:20s} {attrs}".rstrip())
+
+
+@cli.command()
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("-c", "--concurrency", default=None, type=int,
+              help="Requests in flight (default: two per worker slot the daemon may run)")
+@click.option("-l", "--language", default="English", help="Language of lines that don't set one (default: English)")
+@click.option("-i", "--instruct", default=None, help="Voice instruction of lines that don't set one")
+@click.option("-f", "--format", "audio_format", type=click.Choice(["wav", "flac", "opus"]), default=None,
+              help="Format of lines that don't set one (default: from the output extension)")
+@click.option("-p", "--priority", type=click.Choice(["interactive", "normal", "batch"]),
+              default="normal", help="Scheduling class (default: normal)")
+@click.option("--overwrite", is_flag=True, help="Render every line, even those whose output exists")
+def batch(manifest, concurrency, language, instruct, audio_format, priority, overwrite):
+    """Render a JSONL/CSV manifest (text, output, language, instruct) to audio files."""
+    if not daemon_is_running():
+        click.echo("Error: daemon is not running. Start it with: jah serve", err=True)
+        sys.exit(1)
+
+    from jarvis.batch import run_batch
+    defaults = {"language": language, "instruct": instruct, "format": audio_format, "priority": priority}
+    failed = run_batch(manifest, concurrency, defaults, overwrite)
+    if failed:
+        sys.exit(1)
 
 
 @cli.command()
@@ -140,7 +564,9 @@ def status():
 @click.option("--delay", default=0.5, help="Delay between requests in seconds")
 @click.option("--report", default="tests/stability_report.json", help="Path for JSON report")
 @click.option("--category", default=None, help="Only run tests from this category")
-def stress(silent, delay, report, category):
+@click.option("-c", "--concurrency", default=1, type=int,
+              help="Requests in flight over one connection (default: 1, sequential)")
+def stress(silent, delay, report, category, concurrency):
     """Run stress tests against the daemon."""
     import importlib.util
     spec = importlib.util.spec_from_file_location(
@@ -149,7 +575,8 @@ def stress(silent, delay, report, category):
     )
     mod = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(mod)
-    mod.run_stress(silent=silent, delay=delay, report_path=report, category=category)
+    mod.run_stress(silent=silent, delay=delay, report_path=report, category=category,
+                   concurrency=concurrency)
 
 
 @cli.command()
@@ -190,6 +617,7 @@ def echo_cmd(language, instruct):
                 "text": text,
                 "language": language,
                 "instruct": instruct,
+                "priority": "interactive",
             })
             if resp.get("status") != "ok":
                 click.echo(f"TTS error: {resp.get('message')}", err=True)
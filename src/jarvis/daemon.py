@@ -3,24 +3,36 @@
 Architecture:
   Main process: asyncio server, handles status/filler/shutdown, dispatches generate to workers.
   N worker processes: each loads its own MLX model, handles generate requests.
+  Audio flows back through a per-worker shared-memory ring (jarvis.ring), not the queues.
+  Workers never play audio: speaker output goes through the main process's Player
+  (jarvis.playback), so a worker is free again as soon as its generation ends.
   MLX is NOT thread-safe — multiprocessing is required (one model per process).
+  With preload, workers fork from a fork server that imported the heavy modules once.
 """
 
 import asyncio
+import base64
+import contextlib
 import gc
+import hashlib
+import heapq
 import importlib
-import json
+import itertools
 import logging
+import math
 import multiprocessing as mp
+import os
 import queue
-import random
+import re
 import resource
 import signal
 import struct
+import subprocess
 import sys
 import time
 import traceback
 import warnings
+from collections import deque
 
 warnings.filterwarnings("ignore", message="You are using a model of type")
 warnings.filterwarnings("ignore", message=".*incorrect regex pattern.*")
@@ -28,14 +40,49 @@ warnings.filterwarnings("ignore", message=".*incorrect regex pattern.*")
 from pathlib import Path
 
 import numpy as np
-import soundfile as sf
 import structlog
 
+from jarvis import handlers, protocol
+from jarvis.audiofile import AudioWriter, output_format, write_audio
+from jarvis.cache import AudioCache, DEFAULT_CACHE_MB, cache_key
+from jarvis.fillers import FillerBank
+from jarvis.longtext import CROSSFADE_MS, PIECE_SEP, Stitcher, split_text
+from jarvis.metrics import Metrics, ServiceTime
+from jarvis.pcm import PcmBuffer
+from jarvis import trace as tracing
+from jarvis.trace import Trace
+from jarvis.playback import Player
+from jarvis.ring import AudioRing
+
 SOCKET_PATH = Path.home() / ".q3tts.sock"
 LOG_DIR = Path(__file__).parent.parent.parent / "logs"
 MAX_RETRIES = 2
 DEFAULT_WORKERS = 3
 
+# Scheduling classes for generate requests ("priority" field), lower runs first
+PRIORITIES = {"interactive": 0, "normal": 1, "batch": 2}
+BATCH_RESERVE = 1  # idle workers batch requests may not take (kept for interactive traffic)
+CANCEL_TTL = 30  # seconds a cancel is remembered for requests that haven't arrived yet
+SPARE_SUFFIX = "~spare"  # request id suffix of the second take of a speculative request
+MAX_PREDICTED_S = 90  # without deadline_s, requests predicted to end later are refused (clients wait 120 s)
+
+# Elastic pool: grow while requests queue up, shrink when idle or short on memory
+SCALE_INTERVAL = 1.0  # seconds between autoscaler checks
+DEFAULT_IDLE_TIMEOUT = 600  # seconds a worker may sit idle before it is retired
+WORKER_MEMORY_MB = 5000  # estimated footprint of one worker (model + activations)
+MEMORY_HEADROOM_MB = 1024  # keep at least this much system memory available
+
+# Supervisor: heartbeats from workers, respawn of dead or wedged ones
+HEARTBEAT_INTERVAL = 1.0  # idle workers beat at least this often
+HEARTBEAT_TIMEOUT = 90  # a busy worker silent for this long is considered wedged
+SUPERVISE_INTERVAL = 1.0  # seconds between supervisor checks
+REQUEUE_LIMIT = 1  # times a request is re-queued after its worker died
+MAX_RESPAWN_BACKOFF = 60  # seconds, doubled per consecutive failed start
+BUSY_WINDOW = 60  # seconds of busy-time samples behind each worker's busy ratio
+
+# Preloaded start: modules the fork server imports once, before forking any worker
+PRELOAD_MODULES = ["jarvis.daemon", "mlx_audio.tts.utils"]
+
 
 def generation_timeout(text: str) -> int:
     """Scale timeout with text length: 10s base + 0.1s/char, max 60s."""
@@ -62,119 +109,73 @@ def setup_logging():
     return structlog.get_logger()
 
 
-def mem_mb() -> int:
-    """Current RSS memory in MB."""
-    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 * 1024)
+def process_rss_mb(pids) -> dict:
+    """Current resident memory of processes in MB, {pid: mb} (unreadable pids are left out).
 
+    Linux: VmRSS from /proc/<pid>/status. Elsewhere (macOS): one `ps -o rss=` call, in KiB.
+    """
+    rss = {}
+    missing = []
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss[pid] = int(line.split()[1]) // 1024
+                        break
+        except OSError:
+            missing.append(pid)
+    if missing:
+        try:
+            out = subprocess.run(["ps", "-o", "pid=,rss=", "-p", ",".join(map(str, missing))],
+                                 capture_output=True, text=True, timeout=2).stdout
+        except (OSError, subprocess.SubprocessError):
+            return rss
+        for line in out.splitlines():
+            fields = line.split()
+            if len(fields) == 2 and fields[0].isdigit() and fields[1].isdigit():
+                rss[int(fields[0])] = int(fields[1]) // 1024
+    return rss
 
-class GenerationTimeout(BaseException):
-    """Inherits BaseException so it won't be caught by 'except Exception' in handlers."""
-    pass
 
+def mem_mb() -> int:
+    """Current RSS of the daemon main process in MB (peak RSS if it can't be read)."""
+    rss = process_rss_mb([os.getpid()]).get(os.getpid())
+    if rss is None:
+        # ru_maxrss is in KiB on Linux but in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss = peak // (1024 * 1024) if sys.platform == "darwin" else peak // 1024
+    return rss
 
-FILLER_VARIANTS = 5  # number of vocal takes per phrase
-
-FILLERS = {
-    "French": [
-        "Hmm.",
-        "Voyons.",
-        "Alors.",
-        "Bonne question.",
-        "Voyons voir.",
-        "Attends, je réfléchis.",
-        "Laisse-moi réfléchir un instant.",
-        "Ah, intéressant.",
-        "OK, voyons ça.",
-        "Oui, alors.",
-        "Attends voir.",
-        "Eh bien.",
-        "C'est une bonne question, ça.",
-        "Hmm, laisse-moi vérifier.",
-        "OK, deux secondes.",
-        "Alors, comment dire.",
-        "Ah oui, d'accord.",
-        "Hmm, voyons un peu.",
-        "Oui, je vois.",
-        "Euh, attends.",
-    ],
-    "English": [
-        "Hmm.",
-        "Let me think.",
-        "Well.",
-        "Good question.",
-        "Let's see.",
-        "One moment.",
-        "OK, let me check.",
-        "Right, so.",
-        "Interesting.",
-        "Let me think about that.",
-        "Hmm, good one.",
-        "OK, hang on.",
-        "Yeah, so.",
-        "Let me see.",
-        "Ah, right.",
-    ],
-}
 
+def available_memory_mb() -> int | None:
+    """System memory available without swapping, in MB (None if it can't be read)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    # macOS: free + inactive + speculative + purgeable pages from vm_stat
+    try:
+        out = subprocess.run(["vm_stat"], capture_output=True, text=True, timeout=2).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    page = re.search(r"page size of (\d+) bytes", out)
+    if not page:
+        return None
+    pages = 0
+    for field in ("free", "inactive", "speculative", "purgeable"):
+        m = re.search(rf"Pages {field}:\s+(\d+)", out)
+        if m:
+            pages += int(m.group(1))
+    return pages * int(page.group(1)) // (1024 * 1024)
 
-def warm_fillers(model, log):
-    """Pre-generate filler audio files at startup. Cached on disk.
 
-    Generates FILLER_VARIANTS vocal takes per phrase for natural variety.
-    """
-    cache_dir = Path.home() / ".cache" / "jarvis" / "fillers"
-    cache_dir.mkdir(parents=True, exist_ok=True)
-
-    filler_cache = {}
-    for lang, phrases in FILLERS.items():
-        prefix = lang[:2].lower()
-        paths = []
-        for i, phrase in enumerate(phrases):
-            for v in range(FILLER_VARIANTS):
-                path = cache_dir / f"{prefix}_{i:02d}_v{v}.wav"
-                if path.exists():
-                    paths.append(str(path))
-                    continue
-                log.info("generating filler", lang=lang, phrase=phrase, variant=v)
-                try:
-                    all_audio = []
-                    max_tokens = max(256, len(phrase) * 20)
-                    is_custom_voice = getattr(model.config, "tts_model_type", "") == "custom_voice"
-                    if is_custom_voice:
-                        gen = model.generate_custom_voice(
-                            text=phrase, language=lang,
-                            speaker=model.supported_speakers[0],
-                            verbose=False,
-                            temperature=0.7, repetition_penalty=1.2,
-                            max_tokens=max_tokens,
-                        )
-                    else:
-                        gen = model.generate_voice_design(
-                            text=phrase, language=lang, instruct="",
-                            verbose=False,
-                            temperature=0.7, repetition_penalty=1.2,
-                            max_tokens=max_tokens,
-                        )
-                    for result in gen:
-                        chunk = np.array(result.audio, dtype=np.float32)
-                        all_audio.append(chunk)
-                    if all_audio:
-                        audio = np.concatenate(all_audio)
-                        # Trim trailing silence
-                        flat = audio.flatten() if audio.ndim > 1 else audio
-                        above = np.where(np.abs(flat) > 0.01)[0]
-                        if len(above) > 0:
-                            end = min(above[-1] + int(model.sample_rate * 0.3), len(flat))
-                            audio = audio[:end]
-                        sf.write(str(path), audio, model.sample_rate)
-                        paths.append(str(path))
-                        log.info("filler ready", path=str(path))
-                    else:
-                        log.warning("filler empty", phrase=phrase, variant=v)
-                except Exception as e:
-                    log.error("filler generation failed", phrase=phrase, variant=v, error=str(e))
-        filler_cache[lang] = paths
-    return filler_cache
+class GenerationTimeout(BaseException):
+    """Inherits BaseException so it won't be caught by 'except Exception' in handlers."""
+    pass
 
 
 MODEL_ALIASES = {
@@ -212,11 +213,94 @@ class WorkerLog:
         pass
 
 
-def worker_loop(task_queue, result_queue, model_id, worker_id, do_fillers):
+def warm_up(model, handlers, log) -> float:
+    """Run one short throw-away generation so the first real request skips kernel compilation."""
+    t0 = time.time()
+    handlers.handle(model, {"text": "Bonjour.", "language": "French", "output": "/dev/null"})
+    elapsed = time.time() - t0
+    log.info("warm-up done", elapsed=f"{elapsed:.1f}s")
+    return elapsed
+
+
+def mp_context(preload: bool):
+    """Multiprocessing context of the workers: a fork server that imported PRELOAD_MODULES
+    (modules missing here are skipped by the server), or the platform's default start."""
+    if not preload:
+        return mp.get_context()
+    ctx = mp.get_context("forkserver")
+    ctx.set_forkserver_preload(PRELOAD_MODULES)
+    return ctx
+
+
+class HandlerSource:
+    """Tracks a module's source file so a worker reloads it only after it changed.
+
+    (mtime_ns, size) is checked on every request, a cheap stat; only when it moved is
+    the file hashed, so a touch or an editor saving identical bytes doesn't reload.
+    """
+
+    def __init__(self, module):
+        self.path = Path(module.__file__)
+        self.stat = self._stat()
+        self.digest = self._digest()
+
+    def _stat(self):
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _digest(self):
+        try:
+            return hashlib.sha256(self.path.read_bytes()).hexdigest()
+        except OSError:
+            return None
+
+    def changed(self) -> bool:
+        stat = self._stat()
+        if stat == self.stat:
+            return False
+        self.stat = stat
+        digest = self._digest()
+        if digest == self.digest:
+            return False
+        self.digest = digest
+        return True
+
+    def invalidate(self):
+        """Forget the loaded version (failed reload): the next check reloads again."""
+        self.stat = self.digest = None
+
+
+def worker_loop(task_queue, result_queue, model_id, worker_id, ring_name,
+                cancel_event, heartbeat, warmup, slots=1, hot_reload=True, created=None):
     """Worker process entry point: load model, handle generate requests.
 
     Each worker is a separate OS process with its own MLX model instance.
-    Communication with main process via multiprocessing.Queue.
+    Requests and results travel via multiprocessing.Queue; audio samples go through
+    the worker's shared-memory AudioRing and only (pos, length) descriptors are queued.
+
+    Up to `slots` requests run at once on the one model. With a Qwen3-TTS model they are
+    decoded as one batch (jarvis.decoder): each round of the loop is one batched forward
+    pass for all of them, so the worker's throughput grows with its slots. New requests
+    join between two rounds and finished ones leave immediately. Other models have their
+    generations stepped round-robin one chunk at a time instead (concurrency only). Every
+    task and result carries the pool's tag for its request.
+
+    Task queue messages: ("generate", tag, request), ("cancel", [tags]) or None (exit).
+    Result queue messages: ("chunk" | "audio", tag, payload, sample_rate), ("result", tag, dict).
+    cancel_event is set by the main process after queueing a cancel, so that a worker busy
+    inside a step (or playing audio) looks at its queue at the next chunk.
+    heartbeat (shared double) gets time.time() between requests and between chunks, so the
+    supervisor can tell a long generation from a wedged one. With warmup set (respawned
+    or scaled-up workers), a short generation runs before the worker reports ready.
+    With hot_reload, handlers.py is reloaded before a request when it changed on disk;
+    without (production mode), the code imported at start is used for the worker's life.
+
+    The ready message carries the worker's startup phases in seconds: imports_s (from
+    `created`, when the main process asked for the worker, to the end of the imports —
+    near zero for a worker forked from the preloaded fork server), load_s and warmup_s.
     """
     # Ignore SIGINT/SIGTERM — main process handles shutdown via poison pill
     signal.signal(signal.SIGINT, signal.SIG_IGN)
@@ -232,63 +316,163 @@ def worker_loop(task_queue, result_queue, model_id, worker_id, do_fillers):
     warnings.filterwarnings("ignore", message=".*incorrect regex pattern.*")
 
     log = WorkerLog(worker_id)
-    log.info("loading model", model=model_id)
+    from mlx_audio.tts.utils import load_model  # already in memory when forked from the fork server
     t0 = time.time()
+    phases = {"imports_s": round(t0 - (created or t0), 3), "load_s": None, "warmup_s": None}
+    log.info("loading model", model=model_id, slots=slots, imports=f"{phases['imports_s']:.1f}s")
 
-    from mlx_audio.tts.utils import load_model
     model = load_model(model_id)
-    log.info("model loaded", elapsed=f"{time.time() - t0:.1f}s")
-
-    # Worker 0 generates fillers (cached on disk, fast on subsequent runs)
-    filler_cache = None
-    if do_fillers:
-        log.info("warming fillers")
-        filler_cache = warm_fillers(model, log)
-        log.info("fillers done", count=sum(len(v) for v in filler_cache.values()))
-
-    # Signal ready to main process
-    result_queue.put(("ready", worker_id, filler_cache))
-
-    # Import handlers (hot-reloaded on each request)
+    batch = None  # jarvis.decoder.Batch stepping every request of this worker at once
+    if slots > 1:
+        from jarvis import decoder
+        if decoder.supports(model):
+            model = decoder.BatchedModel(model)
+            batch = model.batch
+    phases["load_s"] = round(time.time() - t0, 3)
+    log.info("model loaded", elapsed=f"{phases['load_s']:.1f}s", batched=batch is not None)
+
+    ring = AudioRing.attach(ring_name)
+    sr = model.sample_rate
+
+    # Import handlers (hot-reloaded when the file changes, unless in production mode)
     from jarvis import handlers
+    source = HandlerSource(handlers) if hot_reload else None
+
+    if warmup:
+        phases["warmup_s"] = round(warm_up(model, handlers, log), 3)
+
+    backlog: deque[tuple[int, dict]] = deque()  # (tag, request) received, not started yet
+    active: dict[int, list] = {}  # tag -> [Generation, timeout_s, timeouts so far, start time]
+    cancelled = set()
+    running = True
+
+    def take(msg):
+        nonlocal running
+        if msg is None:
+            running = False  # poison pill → shutdown
+        elif msg[0] == "cancel":
+            cancelled.update(msg[1])
+        else:
+            backlog.append(msg[1:])
 
-    # Request loop
-    while True:
-        task = task_queue.get()
-        if task is None:
-            break  # poison pill → shutdown
-
-        request = task
-        text = request.get("text", "")
-        timeout_s = generation_timeout(text)
-
-        # Hot-reload handlers from disk
+    def poll(timeout=None):
+        """Move queued tasks into the backlog, waiting up to `timeout` for the first one."""
         try:
-            importlib.reload(handlers)
-        except SyntaxError as e:
-            log.error("syntax error in handlers", error=str(e))
-            result_queue.put({"status": "error", "message": f"syntax error: {e}"})
-            continue
-
-        # Generation with SIGALRM timeout + retry
-        for attempt in range(1, MAX_RETRIES + 1):
-            signal.alarm(timeout_s)
+            take(task_queue.get(timeout=timeout) if timeout else task_queue.get_nowait())
+            while True:
+                take(task_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+    def beat():
+        heartbeat.value = time.time()
+
+    def stopper(tag):
+        def should_stop():
+            """Heartbeat + cancellation check, polled by handlers between chunks."""
+            beat()
+            if cancel_event.is_set():
+                cancel_event.clear()
+                poll()
+            return tag in cancelled
+        return should_stop
+
+    def start(tag, request):
+        def on_chunk(chunk):
+            # Descriptor when the ring has room, the array itself (pickled) otherwise
+            desc = ring.write(chunk)
+            result_queue.put(("chunk", tag, desc if desc is not None else chunk, sr))
+
+        def on_audio(audio):
+            desc = ring.write(audio)
+            result_queue.put(("audio", tag, desc if desc is not None else audio, sr))
+
+        t_start = time.time()
+        trace = Trace(request.get("trace_id"), f"worker-{worker_id}")
+
+        # Hot-reload changed handlers from disk (generations already running keep their code)
+        if source is not None and source.changed():
             try:
-                result = handlers.handle(model, request)
-                break
-            except GenerationTimeout:
-                signal.alarm(0)
-                if attempt < MAX_RETRIES:
-                    log.warning("timeout, retrying", attempt=attempt, timeout=timeout_s, text=text[:40])
-                else:
-                    result = {"status": "error",
-                              "message": f"generation timed out after {MAX_RETRIES}x{timeout_s}s"}
-            finally:
-                signal.alarm(0)
+                with trace.span("worker.reload"):
+                    importlib.reload(handlers)
+            except SyntaxError as e:
+                source.invalidate()
+                log.error("syntax error in handlers", error=str(e))
+                result_queue.put(("result", tag, {"status": "error",
+                                                  "message": f"syntax error: {e}",
+                                                  "spans": trace.spans}))
+                return
+            log.info("handlers reloaded", elapsed=f"{trace.spans[-1]['dur']:.3f}s")
+
+        streaming = request.get("action") == "generate_stream"
+        gen = handlers.Generation(
+            model, request,
+            on_chunk=on_chunk if streaming else None,
+            on_audio=on_audio if request.get("return_audio") else None,
+            should_stop=stopper(tag),
+            trace=trace,
+        )
+        active[tag] = [gen, generation_timeout(request.get("text", "")), 0, t_start]
+        if len(active) > 1:
+            log.debug("request joined batch", tag=tag, active=len(active))
+
+    def step(tag):
+        """Advance one generation by one chunk, under its SIGALRM timeout."""
+        entry = active[tag]
+        gen, timeout_s, timeouts, t_start = entry
+        # Timeout per attempt counts this request's own steps (and the batched ones), not the
+        # interleaved steps of the others
+        signal.alarm(max(1, math.ceil(timeout_s - gen.attempt_s)))
+        try:
+            gen.step()
+        except GenerationTimeout:
+            pass
+        finally:
+            signal.alarm(0)
+        if not gen.done and gen.attempt_s >= timeout_s:
+            entry[2] = timeouts + 1
+            retry = not gen.streaming and entry[2] < MAX_RETRIES
+            log.warning("timeout, retrying" if retry else "timeout", tag=tag, timeout=timeout_s,
+                        text=gen.gen_kwargs["text"][:40])
+            gen.timed_out(timeout_s, retry)
+        if gen.done:
+            del active[tag]
+            cancelled.discard(tag)
+            gen.trace.add("worker.generate", t_start, time.time(), status=gen.result.get("status"),
+                          running=len(active) + 1)
+            result_queue.put(("result", tag, {**gen.result, "spans": gen.trace.spans}))
 
-        result_queue.put(result)
-        gc.collect()
+    # Signal ready to main process
+    beat()
+    result_queue.put(("ready", worker_id, phases))
 
+    # Request loop
+    while running:
+        poll(None if active or backlog else HEARTBEAT_INTERVAL)
+        beat()
+        if not running:
+            break
+
+        while backlog and len(active) < slots:
+            tag, request = backlog.popleft()
+            if tag in cancelled:
+                cancelled.discard(tag)
+                result_queue.put(("result", tag, {"status": "cancelled"}))
+                continue
+            start(tag, request)
+
+        if batch is not None and len(batch):
+            # One forward pass for every request; each of them waited for all of it
+            elapsed = batch.step()
+            for gen, *_ in active.values():
+                gen.attempt_s += elapsed
+        for tag in list(active):
+            step(tag)
+
+        if not active:
+            gc.collect()
+
+    ring.close()
     log.info("exiting")
 
 
@@ -296,190 +480,1336 @@ def worker_loop(task_queue, result_queue, model_id, worker_id, do_fillers):
 # Worker Pool
 # ---------------------------------------------------------------------------
 
+def _take_pcm(ring: AudioRing, payload: tuple[int, int] | np.ndarray) -> np.ndarray:
+    """Resolve a worker audio payload: ring descriptor (pos, length) or a pickled array."""
+    if isinstance(payload, tuple):
+        return ring.read(*payload).reshape(-1, 1)
+    return payload
+
+
+class Dropped(Exception):
+    """Request left the pending queue without running (deadline passed or cancelled)."""
+
+    def __init__(self, result: dict):
+        super().__init__(result.get("message"))
+        self.result = result
+
+
+class Route:
+    """A request running on a worker: where the worker's messages for it are delivered.
+
+    queue is None once the requester went away; its messages are then discarded.
+    """
+
+    __slots__ = ("request_id", "queue", "predicted", "started")
+
+    def __init__(self, request_id, q, predicted: float = 0.0):
+        self.request_id = request_id
+        self.queue = q
+        self.predicted = predicted  # generation seconds expected by the service-time model
+        self.started = time.monotonic()
+
+
+class Worker:
+    """Main-process handles for one worker process.
+
+    A respawned worker keeps its id and shared-memory ring but gets fresh queues.
+    Queues, events and the process all come from ctx (see mp_context).
+    """
+
+    def __init__(self, worker_id, model_id, ring=None, warmup=False, slots=1,
+                 hot_reload=True, ctx=mp):
+        self.id = worker_id
+        self.task_q = ctx.Queue()
+        self.result_q = ctx.Queue()
+        self.ring = ring or AudioRing.create()
+        self.cancel = ctx.Event()  # set by the pool after queueing a cancel for this worker
+        self.heartbeat = ctx.Value("d", time.time(), lock=False)
+        self.slots: int = slots
+        self.running: dict[int, Route] = {}  # tag -> Route of each request running here
+        self.busy_s = 0.0  # time spent with at least one request running (finished spells)
+        self._busy_since = 0.0  # start of the current busy spell, while running
+        # (monotonic, busy_time) once a second
+        self.busy_samples: deque[tuple[float, float]] = deque(maxlen=BUSY_WINDOW)
+        self.served = 0
+        self.started = time.monotonic()
+        self.dead = False  # death already handled by the supervisor
+        self.idle_since = time.monotonic()
+        self.pump = None  # task routing result_q messages, started once the worker is ready
+        self.phases = {}  # startup phases reported in the ready message
+        self.process = ctx.Process(
+            target=worker_loop,
+            args=(self.task_q, self.result_q, model_id, worker_id, self.ring.name, self.cancel, self.heartbeat, warmup, slots, hot_reload,
+                  time.time()),
+            daemon=True,
+        )
+        self.process.start()
+
+    @property
+    def busy(self) -> bool:
+        return bool(self.running)
+
+    @property
+    def free_slots(self) -> int:
+        return self.slots - len(self.running)
+
+    @property
+    def request_ids(self) -> list:
+        return [r.request_id for r in self.running.values()]
+
+    def assign(self, tag, route):
+        if not self.running:
+            self._busy_since = time.monotonic()
+        self.running[tag] = route
+
+    def finish(self, tag):
+        """Remove a request from the worker. Returns its Route (None if unknown)."""
+        route = self.running.pop(tag, None)
+        if route is not None and not self.running:
+            self.busy_s += time.monotonic() - self._busy_since
+        return route
+
+    def busy_time(self, now: float) -> float:
+        return self.busy_s + (now - self._busy_since if self.running else 0.0)
+
+    def busy_ratio(self) -> float | None:
+        """Share of the last BUSY_WINDOW seconds with at least one request running."""
+        if len(self.busy_samples) < 2:
+            return None
+        (t0, b0), (t1, b1) = self.busy_samples[0], self.busy_samples[-1]
+        return round((b1 - b0) / (t1 - t0), 3) if t1 > t0 else None
+
+
+def _adopt_spans(result: dict, trace) -> dict:
+    """Move the spans a worker attached to its result onto the daemon-side trace."""
+    spans = result.pop("spans", None)
+    if trace is not None:
+        trace.extend(spans)
+    return result
+
+
+def _died(msg) -> bool:
+    """True for the sentinel the supervisor queues when a worker process is gone."""
+    return isinstance(msg, tuple) and msg[0] == "died"
+
+
 class WorkerPool:
-    """Manages N worker processes, dispatches generate requests round-robin."""
+    """Manages worker processes, dispatches generate requests by priority and deadline.
+
+    Pending requests wait in a heap ordered by (priority class, deadline, arrival).
+    Requests still waiting when their deadline passes are dropped. Batch requests
+    never take the last BATCH_RESERVE free slots, so an interactive request
+    arriving during a bulk run finds a worker right away.
+
+    Each worker runs up to `slots` requests at once on its single model copy, decoded as
+    one batch (see worker_loop). A request goes to an idle worker first, else to the least
+    loaded one. A pump task per worker routes its results to the requests.
+
+    The pool is elastic between n_workers and max_workers: the autoscaler starts a
+    worker while requests are queued and memory allows, and retires workers (unloading
+    their model) after idle_timeout seconds or when system memory runs low.
+
+    The supervisor respawns workers whose process died or whose heartbeat went silent
+    during a request (killing them first), warms them up before they rejoin the free
+    queue, and re-queues the requests they were running.
 
-    def __init__(self, n_workers, model_id, log):
+    Admission control: the pool learns generation time from text length per language
+    (ServiceTime, fed by every result) and predicts the wait of a new request from the
+    work running and queued ahead of it; admit() refuses what can't start before its
+    deadline, or finish within MAX_PREDICTED_S, instead of letting it queue.
+
+    hot_reload=False (production mode) stops workers from checking handlers.py for changes.
+    preload starts workers from a fork server that imported the heavy modules once, and
+    warms up the first workers too; startup holds their slowest phases once all are ready.
+    """
+
+    def __init__(self, n_workers, model_id, log, max_workers=None,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, slots=1, metrics=None, hot_reload=True,
+                 preload=False):
         self._log = log
-        self._n_workers = n_workers
-        self._workers = []  # [(Process, task_q, result_q), ...]
-        self._free = asyncio.Queue()  # worker_ids of available workers
+        self.metrics = metrics or Metrics()
+        self.service = ServiceTime(model_id)
+        self._model_id = model_id
+        self.min_workers = n_workers
+        self.max_workers = max(n_workers, max_workers or n_workers)
+        self.target = n_workers
+        self.slots = max(1, slots)
+        self.hot_reload = hot_reload
+        self.preload = preload
+        self._ctx = mp_context(preload)
+        self.startup = {"start_method": self._ctx.get_start_method()}
+        self._idle_timeout = idle_timeout
+        self._ids = itertools.count(n_workers)
+        self._starting = set()  # worker_ids still loading their model
+        self._scaler = None
+        self._memory_blocked = False  # last grow attempt was refused for lack of memory
+        self._supervisor = None
+        self.restarts = {}  # worker_id -> respawn count
+        self._failures = {}  # worker_id -> consecutive deaths before becoming ready
+        self._respawn_at = {}  # worker_id -> earliest monotonic time for next respawn
+        self._workers = {}  # worker_id -> Worker
+        self._free: deque[int] = deque()  # worker_ids with at least one free slot
+        self._pending = []  # heap of (priority, deadline, seq, future, request)
+        self._waiting = {}  # request id -> future of a pending request
+        self._cancelled = {}  # request id -> time.monotonic() of its cancel
+        self._seq = itertools.count()
+        self._tags = itertools.count()  # routing tag of each dispatched request
+        self._spares = {}  # request id -> id of its speculative second take
+        self._pieces = {}  # request id -> ids of its long-text pieces (fan_out)
+        self._background = set()  # losing speculative takes, running until cancelled
 
         for i in range(n_workers):
-            task_q = mp.Queue()
-            result_q = mp.Queue()
-            p = mp.Process(
-                target=worker_loop,
-                args=(task_q, result_q, model_id, i, i == 0),
-                daemon=True,
-            )
-            p.start()
-            self._workers.append((p, task_q, result_q))
-            log.info("worker started", worker=i, pid=p.pid)
-
-    async def wait_ready(self) -> dict:
-        """Wait for all workers to load their models. Returns filler_cache from worker 0."""
-        filler_cache = {}
-
-        async def wait_one(i):
-            nonlocal filler_cache
-            p, _, result_q = self._workers[i]
-            msg = await asyncio.to_thread(result_q.get)
-            _, wid, fc = msg
-            if fc is not None:
-                filler_cache = fc
-            self._free.put_nowait(wid)
-            self._log.info("worker ready", worker=wid, pid=p.pid)
-
-        await asyncio.gather(*[wait_one(i) for i in range(self._n_workers)])
-        return filler_cache
-
-    async def submit(self, request) -> dict:
-        """Submit a generate request to the next available worker. Awaits if all busy."""
-        worker_id = await self._free.get()
-        p, task_q, result_q = self._workers[worker_id]
-
-        await asyncio.to_thread(task_q.put, request)
+            w = Worker(i, model_id, warmup=preload, slots=self.slots, hot_reload=hot_reload,
+                       ctx=self._ctx)
+            self._workers[i] = w
+            log.info("worker started", worker=i, pid=w.process.pid, slots=self.slots)
+
+    async def wait_ready(self):
+        """Wait for all workers to load their models."""
+        loop = asyncio.get_running_loop()
+        self._supervisor = loop.create_task(self._supervise())
+        self._starting.update(self._workers)
+        workers = list(self._workers.values())
+        await asyncio.gather(*[self._await_ready(w) for w in workers])
+        for phase in ("imports_s", "load_s", "warmup_s"):
+            values = [w.phases[phase] for w in workers if w.phases.get(phase) is not None]
+            self.startup[phase] = max(values) if values else None
+        self._scaler = loop.create_task(self._autoscale())
+
+    async def _await_ready(self, w: Worker):
+        """Wait for a starting worker's ready message, then add it to the free queue."""
+        msg = await asyncio.to_thread(w.result_q.get)
+        self._starting.discard(w.id)
+        if _died(msg) or self._workers.get(w.id) is not w:
+            return
+        _, wid, w.phases = msg
+        self._failures.pop(wid, None)
+        self._log.info("worker ready", worker=wid, pid=w.process.pid, **w.phases)
+        w.pump = asyncio.get_running_loop().create_task(self._pump(w))
+        self._release(w)
+
+    async def _pump(self, w: Worker):
+        """Deliver a worker's result messages to the requests running on it.
+
+        Ring payloads are copied out here, in the order the worker wrote them, so the
+        ring's read cursor only moves forward whatever the requesters do. Returns once
+        the worker is gone (the "died" sentinel is passed on to every running request).
+        """
+        while True:
+            msg = await asyncio.to_thread(w.result_q.get)
+            if _died(msg):
+                for route in [w.finish(tag) for tag in list(w.running)]:
+                    if route.queue is not None:
+                        route.queue.put_nowait(msg)
+                return
+            kind, tag = msg[0], msg[1]
+            route = w.running.get(tag)
+            if kind == "result":
+                w.finish(tag)
+                w.served += 1
+                if route is not None and route.queue is not None:
+                    route.queue.put_nowait(("result", msg[2]))
+                self._release(w)
+                continue
+            _, _, payload, sr = msg
+            if route is None or route.queue is None:
+                if isinstance(payload, tuple):
+                    w.ring.release(*payload)
+                continue
+            route.queue.put_nowait((kind, _take_pcm(w.ring, payload), sr))
+
+    @property
+    def size(self) -> int:
+        """Workers that are up (ready or busy), not counting ones still loading."""
+        return len(self._workers) - len(self._starting)
+
+    def _start_worker(self):
+        wid = next(self._ids)
+        w = Worker(wid, self._model_id, warmup=True, slots=self.slots,
+                   hot_reload=self.hot_reload, ctx=self._ctx)
+        self._workers[wid] = w
+        self._starting.add(wid)
+        self._log.info("worker started", worker=wid, pid=w.process.pid, target=self.target)
+        asyncio.get_running_loop().create_task(self._await_ready(w))
+
+    async def _supervise(self):
+        """Respawn workers that died or stopped beating while busy."""
+        while True:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            now = time.monotonic()
+            for w in list(self._workers.values()):
+                w.busy_samples.append((now, w.busy_time(now)))
+                if w.process.is_alive():
+                    silent = time.time() - w.heartbeat.value
+                    if not (w.busy and silent > HEARTBEAT_TIMEOUT):
+                        continue
+                    self._log.error("worker wedged, killing", worker=w.id,
+                                    requests=w.request_ids, silent=f"{silent:.0f}s")
+                    w.process.kill()
+                    await asyncio.to_thread(w.process.join, 2)
+                if not w.dead:
+                    self._bury(w)
+                if time.monotonic() >= self._respawn_at.get(w.id, 0):
+                    self._respawn(w)
+
+    def _bury(self, w: Worker):
+        """Take a dead worker out of rotation and wake up whoever waits on its results."""
+        w.dead = True
+        if w.id in self._free:
+            self._free.remove(w.id)
+        failures = self._failures[w.id] = self._failures.get(w.id, 0) + 1
+        self._respawn_at[w.id] = time.monotonic() + min(MAX_RESPAWN_BACKOFF, 2 ** (failures - 1) - 1)
+        self._log.error("worker died", worker=w.id, pid=w.process.pid,
+                        exitcode=w.process.exitcode, requests=w.request_ids)
+        w.result_q.put(("died", w.id))
+
+    def _respawn(self, w: Worker):
+        """Start a replacement process under the same worker id and ring."""
+        self.restarts[w.id] = self.restarts.get(w.id, 0) + 1
+        new = Worker(w.id, self._model_id, ring=w.ring, warmup=True, slots=self.slots,
+                     hot_reload=self.hot_reload, ctx=self._ctx)
+        self._workers[w.id] = new
+        self._starting.add(w.id)
+        self._log.info("worker respawned", worker=w.id, pid=new.process.pid,
+                       restarts=self.restarts[w.id])
+        asyncio.get_running_loop().create_task(self._await_ready(new))
+
+    def _retire_worker(self, wid, reason):
+        """Stop an idle worker and unload its model."""
+        w = self._workers.pop(wid)
+        self._free.remove(wid)
+        self._log.info("worker retired", worker=wid, reason=reason, target=self.target)
+
+        def stop():
+            w.task_q.put(None)
+            w.process.join(timeout=10)
+            if w.process.is_alive():
+                w.process.kill()
+                w.process.join(timeout=2)
+            w.result_q.put(("died", w.id))  # ends its pump
+            w.ring.close()
+
+        asyncio.get_running_loop().run_in_executor(None, stop)
+
+    async def _autoscale(self):
+        """Grow on backlog, shrink on idleness or memory pressure (one step per tick)."""
+        while True:
+            await asyncio.sleep(SCALE_INTERVAL)
+            now = time.monotonic()
+            count = len(self._workers)
+
+            if self.pending and not self._starting and count < self.max_workers:
+                avail = available_memory_mb()
+                if avail is None or avail - WORKER_MEMORY_MB > MEMORY_HEADROOM_MB:
+                    self.target = count + 1
+                    self._start_worker()
+                    self._memory_blocked = False
+                elif not self._memory_blocked:
+                    self._memory_blocked = True
+                    self._log.warning("backlog but no memory for another worker",
+                                      available_mb=avail, pending=self.pending)
+                continue
+
+            # Longest-idle worker comes first among the fully idle ones
+            idle = [wid for wid in self._free if not self._workers[wid].running]
+            if not idle:
+                continue
+            wid = idle[0]
+            if count > 1 and (avail := available_memory_mb()) is not None \
+                    and avail < MEMORY_HEADROOM_MB:
+                self.target = count - 1
+                self._retire_worker(wid, f"memory low ({avail} MB available)")
+            elif count > self.min_workers and \
+                    now - self._workers[wid].idle_since > self._idle_timeout:
+                self.target = count - 1
+                self._retire_worker(wid, "idle")
+
+    # -- admission control -------------------------------------------------
+
+    def predict(self, request) -> float:
+        """Generation seconds expected for a request (service-time model)."""
+        return self.service.predict(request.get("language", "English"), len(request.get("text", "")))
+
+    def _learn(self, request, result):
+        if result.get("status") == "ok" and result.get("generation_s"):
+            self.service.observe(request.get("language", "English"), len(request.get("text", "")),
+                                 result["generation_s"])
+
+    def predicted_wait(self, priority: int = PRIORITIES["normal"]) -> float:
+        """Seconds before a new request of this priority class would get a slot: work left
+        on running requests plus work queued ahead of it, spread over the workers."""
+        ahead = [request for p, _, _, fut, request in self._pending if p <= priority and not fut.done()]
+        if not ahead and self._free:
+            return 0.0
+        now = time.monotonic()
+        work = sum(max(0.0, r.predicted - (now - r.started))
+                   for w in self._workers.values() for r in w.running.values())
+        work += sum(self.predict(request) for request in ahead)
+        return work / max(1, self.size)
+
+    def admit(self, request, pieces: int = 1) -> dict | None:
+        """None to accept a request, else the "busy" reply refusing it right away.
+
+        Refused: a request with deadline_s whose predicted wait exceeds it, or one without
+        that has to wait and whose predicted end (wait + generation, its pieces spread over
+        the workers) is past MAX_PREDICTED_S. A request that can start right away, and a
+        batch request without deadline (meant to wait behind everything else), is accepted.
+        """
+        priority = PRIORITIES.get(request.get("priority"), PRIORITIES["normal"])
+        wait = self.predicted_wait(priority)
+        eta = wait + self.predict(request) / max(1, min(pieces, self.size))
+        deadline_s = request.get("deadline_s")
+        if deadline_s is not None:
+            if wait <= float(deadline_s):
+                return None
+            reason = f"predicted wait {wait:.1f}s exceeds deadline ({deadline_s}s)"
+        elif not wait or priority == PRIORITIES["batch"] or eta <= MAX_PREDICTED_S:
+            return None
+        else:
+            reason = f"predicted completion in {eta:.0f}s (limit {MAX_PREDICTED_S}s)"
+        return {"status": "busy", "message": f"daemon busy: {reason}", "eta_s": round(eta, 1),
+                "wait_s": round(wait, 1), "queued": self.pending}
+
+    def queue_stats(self) -> dict:
+        """Pending requests and predicted wait per priority class."""
+        depth = {name: 0 for name in PRIORITIES}
+        names = {v: k for k, v in PRIORITIES.items()}
+        for p, _, _, fut, _ in self._pending:
+            if not fut.done():
+                depth[names[p]] += 1
+        return {
+            "depth": depth,
+            "predicted_wait_s": {name: round(self.predicted_wait(p), 1) for name, p in PRIORITIES.items()},
+            "service_time": self.service.snapshot(),
+        }
+
+    @property
+    def pending(self) -> int:
+        """Requests waiting for a worker."""
+        return sum(1 for _, _, _, fut, _ in self._pending if not fut.done())
+
+    @property
+    def idle(self) -> int:
+        """Workers running no request at all."""
+        return sum(1 for wid in self._free if not self._workers[wid].running)
+
+    @property
+    def free_slots(self) -> int:
+        return sum(self._workers[wid].free_slots for wid in self._free)
+
+    @property
+    def running(self) -> int:
+        """Requests currently generating, over all workers."""
+        return sum(len(w.running) for w in self._workers.values())
+
+    @property
+    def pids(self) -> list:
+        return [w.process.pid for w in self._workers.values() if w.process.pid]
+
+    def worker_stats(self, rss: dict) -> list:
+        """Per-worker state, load, busy ratio and RSS ({pid: mb}, see process_rss_mb)."""
+        workers = sorted(self._workers.values(), key=lambda w: w.id)
+        now = time.monotonic()
+        stats = []
+        for w in workers:
+            if w.id in self._starting:
+                state = "starting"
+            elif w.dead or not w.process.is_alive():
+                state = "dead"
+            else:
+                state = "busy" if w.running else "idle"
+            uptime = now - w.started
+            stats.append({
+                "id": w.id,
+                "pid": w.process.pid,
+                "state": state,
+                "running": len(w.running),
+                "slots": w.slots,
+                "served": w.served,
+                "restarts": self.restarts.get(w.id, 0),
+                "busy_ratio": w.busy_ratio(),
+                "busy_ratio_total": round(w.busy_time(now) / uptime, 3) if uptime > 0 else None,
+                "rss_mb": rss.get(w.process.pid),
+            })
+        return stats
+
+    async def _acquire(self, request, trace=None) -> tuple[Worker, int, asyncio.Queue]:
+        """Wait for a worker slot according to the request's priority and deadline.
+
+        Returns (worker, tag, queue of that worker's messages for this request).
+        Raises Dropped if the deadline passes or the request is cancelled while waiting.
+        The wait is recorded as a "daemon.queue" span on trace, if given.
+        """
+        request_id = request.get("id")
+        if request_id is not None and request_id in self._cancelled:
+            raise Dropped({"status": "cancelled", "id": request_id})
+
+        priority = PRIORITIES.get(request.get("priority"), PRIORITIES["normal"])
+        deadline_s = request.get("deadline_s")
+        timeout = float(deadline_s) if deadline_s is not None else None
+        deadline = time.monotonic() + timeout if timeout is not None else math.inf
+
+        fut = asyncio.get_running_loop().create_future()
+        queued_at = time.monotonic()
+        queued_wall = time.time()
+        heapq.heappush(self._pending, (priority, deadline, next(self._seq), fut, request))
+        if request_id is not None:
+            self._waiting[request_id] = fut
+        self._dispatch()
+        try:
+            w, tag = await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            raise Dropped({"status": "error", "expired": True, "id": request_id,
+                           "message": f"deadline exceeded ({deadline_s}s) before a worker was free"})
+        except asyncio.CancelledError:
+            # A slot may have been handed over just before the caller was cancelled
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                w, tag = fut.result()
+                w.finish(tag)
+                self._release(w)
+            raise
+        finally:
+            self._waiting.pop(request_id, None)
+
+        self.metrics.observe("queue_wait_s", time.monotonic() - queued_at)
+        if trace is not None:
+            trace.add("daemon.queue", queued_wall, time.time(), worker=w.id, running=len(w.running))
+        return w, tag, w.running[tag].queue
+
+    def _pick(self) -> Worker:
+        """Worker to run a request on, with at least one free slot: an idle one first (a
+        process of its own), else the least loaded one."""
+        return min((self._workers[wid] for wid in self._free), key=lambda w: len(w.running))
+
+    def _dispatch(self):
+        """Hand free worker slots to the highest-priority pending requests."""
+        while self._free and self._pending:
+            priority, _, _, fut, request = self._pending[0]
+            if fut.done():  # timed out or cancelled while waiting
+                heapq.heappop(self._pending)
+                continue
+            reserve = BATCH_RESERVE if len(self._workers) * self.slots > BATCH_RESERVE else 0
+            if priority == PRIORITIES["batch"] and self.free_slots <= reserve:
+                break  # heap order: everything left is batch too
+            heapq.heappop(self._pending)
+            w = self._pick()
+            tag = next(self._tags)
+            w.assign(tag, Route(request.get("id"), asyncio.Queue(), self.predict(request)))
+            w.heartbeat.value = time.time()
+            if w.free_slots == 0:
+                self._free.remove(w.id)
+            fut.set_result((w, tag))
+
+    def cancel(self, request_ids) -> dict:
+        """Cancel requests by id: drop them if pending, stop them between chunks if running.
+
+        Unknown ids are remembered for CANCEL_TTL seconds, so a request that reaches the
+        daemon just after its cancel is dropped on arrival.
+        """
+        now = time.monotonic()
+        self._cancelled = {k: t for k, t in self._cancelled.items() if now - t < CANCEL_TTL}
+        request_ids = [*request_ids, *(self._spares[i] for i in request_ids if i in self._spares),
+                       *(p for i in request_ids for p in self._pieces.get(i, ()))]
+        pending = running = 0
+        for request_id in request_ids:
+            self._cancelled[request_id] = now
+            fut = self._waiting.get(request_id)
+            if fut is not None and not fut.done():
+                fut.set_exception(Dropped({"status": "cancelled", "id": request_id}))
+                pending += 1
+                continue
+            for w in self._workers.values():
+                tags = [tag for tag, r in w.running.items() if r.request_id == request_id]
+                if tags:
+                    self._stop(w, tags)
+                    running += len(tags)
+        return {"pending": pending, "running": running}
+
+    def _stop(self, w: Worker, tags):
+        """Ask a worker to cancel some of its requests at their next chunk."""
+        w.task_q.put(("cancel", tags))
+        w.cancel.set()
+
+    async def submit(self, request, on_audio=None, trace=None) -> dict:
+        """Submit a generate request to the next available worker. Awaits if all busy.
+
+        With request["return_audio"] set, the worker also sends back the final utterance,
+        which is passed to on_audio(pcm, sample_rate) before the result is returned.
+        Queue, worker and handler spans are added to trace, if given.
+        """
+        for attempt in range(REQUEUE_LIMIT + 1):
+            try:
+                w, tag, q = await self._acquire(request, trace)
+            except Dropped as e:
+                return e.result
+
+            w.task_q.put(("generate", tag, request))
 
+            while True:
+                msg = await q.get()
+                if msg[0] == "audio":
+                    if on_audio is not None:
+                        on_audio(msg[1], msg[2])
+                    continue
+                break
+
+            if not _died(msg):
+                self._learn(request, msg[1])
+                return _adopt_spans(msg[1], trace)
+            if attempt < REQUEUE_LIMIT:
+                self._log.warning("re-queueing request", id=request.get("id"), worker=w.id)
+
+        return {"status": "error", "message": f"worker died {REQUEUE_LIMIT + 1} times on this request"}
+
+    async def stream(self, request, trace=None):
+        """Submit a generate_stream request. Yields (pcm, sample_rate) per chunk, then the result dict."""
         try:
-            result = await asyncio.to_thread(result_q.get, True, 120)
-        except queue.Empty:
-            result = {"status": "error", "message": "worker timeout"}
+            w, tag, q = await self._acquire(request, trace)
+        except Dropped as e:
+            yield e.result
+            return
+        done = False
+        chunks = 0
 
-        if p.is_alive():
-            self._free.put_nowait(worker_id)
-        else:
-            self._log.error("worker died", worker=worker_id)
+        try:
+            w.task_q.put(("generate", tag, request))
+            while True:
+                msg = await q.get()
+                if msg[0] == "chunk":
+                    chunks += 1
+                    yield msg[1], msg[2]
+                    continue
+                done = True
+                if _died(msg):
+                    if chunks == 0 and not request.get("requeued"):
+                        # Nothing reached the client yet: start over on another worker
+                        self._log.warning("re-queueing stream", id=request.get("id"), worker=w.id)
+                        async for item in self.stream({**request, "requeued": True}, trace):
+                            yield item
+                        return
+                    msg = ("result", {"status": "error", "message": "worker died during generation"})
+                self._learn(request, msg[1])
+                yield _adopt_spans(msg[1], trace)
+                return
+        finally:
+            route = w.running.get(tag)
+            if not done and route is not None:
+                # Client went away mid-stream: stop the request at its next chunk; the
+                # pump discards what is still in flight and frees the slot at its result.
+                route.queue = None
+                self._stop(w, [tag])
+
+    async def speculate(self, request, trace=None):
+        """Run a generate request as two takes at once, the second one on another worker.
+
+        Neither take plays or writes anything: both send their utterance back, the first
+        take whose result passed the quality gate wins and the other is cancelled. When
+        neither passes, the successful take with the lower RMS wins.
+        Returns (result, pcm, sample_rate), pcm None if no take succeeded.
+        """
+        request_id = request["id"]
+        self._spares[request_id] = request_id + SPARE_SUFFIX
+        self.metrics.count("speculative_requests")
+
+        async def take(take_id):
+            audio = []
+            result = await self.submit(
+                {**request, "id": take_id, "output": "/dev/null", "return_audio": True},
+                on_audio=lambda pcm, sr: audio.append((pcm, sr)),
+                trace=trace,
+            )
+            return result, *(audio[0] if audio else (None, None))
 
-        return result
+        tasks = {asyncio.create_task(take(i)): i for i in (request_id, self._spares[request_id])}
+        results = {}
+        best = None  # (take id, result, pcm, sr)
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result, pcm, sr = task.result()
+                    results[tasks[task]] = result
+                    if result.get("status") != "ok" or pcm is None:
+                        continue
+                    rank = (bool(result.get("passed")), -result["rms"])
+                    if best is None or rank > (bool(best[1].get("passed")), -best[1]["rms"]):
+                        best = (tasks[task], result, pcm, sr)
+                if best is not None and best[1].get("passed"):
+                    break
+        finally:
+            del self._spares[request_id]
+            losers = [t for t in tasks if not t.done()]
+            if losers:
+                self.cancel([tasks[t] for t in losers])
+                for t in losers:
+                    self._background.add(t)
+                    t.add_done_callback(self._background.discard)
+
+        if best is None:
+            return results.get(request_id, {"status": "error", "message": "no take finished"}), None, None
+        take_id, result, pcm, sr = best
+        if take_id != request_id:
+            self.metrics.count("speculative_spare_won")
+        return {**result, "speculative": True}, pcm, sr
+
+    def fan_out(self, request, texts, trace=None, first=0) -> list:
+        """Queue one sub-request per piece of a long text (from texts[first] on), all at once.
+
+        Pieces are queued in text order with the request's priority, so they take every
+        slot that is free or frees up; none of them plays or writes anything. Each task
+        resolves to (result, pcm, sample_rate), pcm None if the piece has no audio.
+        Cancelling the request id cancels its pieces; call end_fan_out() when done.
+        """
+        ids = [f"{request['id']}{PIECE_SEP}{i}" for i in range(len(texts))]
+        self._pieces[request["id"]] = ids
+
+        async def piece(i):
+            audio = []
+            result = await self.submit(
+                {**request, "id": ids[i], "text": texts[i], "action": "generate",
+                 "output": "/dev/null", "return_audio": True},
+                on_audio=lambda pcm, sr: audio.append((pcm, sr)),
+                trace=trace,
+            )
+            return result, *(audio[0] if audio else (None, None))
+
+        self.metrics.count("split_requests")
+        self.metrics.count("pieces", len(texts))
+        return [asyncio.create_task(piece(i)) for i in range(first, len(texts))]
+
+    def end_fan_out(self, request_id, tasks):
+        """Forget a request's pieces; those still queued or running are cancelled."""
+        ids = self._pieces.pop(request_id, [])
+        ids = ids[len(ids) - len(tasks):]  # the pieces these tasks run
+        losers = [(piece_id, t) for piece_id, t in zip(ids, tasks) if not t.done()]
+        if losers:
+            self.cancel([piece_id for piece_id, _ in losers])
+            for _, t in losers:
+                self._background.add(t)
+                t.add_done_callback(self._background.discard)
+
+    def _release(self, w: Worker):
+        """A slot on w freed up: make it available again, unless its process has died."""
+        if self._workers.get(w.id) is not w or w.dead or not w.process.is_alive():
+            return
+        if not w.running:
+            w.idle_since = time.monotonic()
+        if w.id not in self._free and w.free_slots > 0:
+            self._free.append(w.id)
+        self._dispatch()
 
     def shutdown(self):
         """Send poison pills and join all worker processes."""
-        for _, task_q, _ in self._workers:
+        for task in (self._scaler, self._supervisor):
+            if task:
+                task.cancel()
+        for w in self._workers.values():
             try:
-                task_q.put(None)
+                w.task_q.put(None)
             except Exception:
                 pass
 
-        for p, _, _ in self._workers:
-            p.join(timeout=5)
-            if p.is_alive():
-                p.kill()
-                p.join(timeout=2)
+        for w in self._workers.values():
+            w.process.join(timeout=5)
+            if w.process.is_alive():
+                w.process.kill()
+                w.process.join(timeout=2)
+            w.result_q.put(("died", w.id))  # ends its pump
+            w.ring.close()
 
 
 # ---------------------------------------------------------------------------
-# Async socket protocol (length-prefixed JSON, same as cli.py)
+# Async socket protocol (length-prefixed frames, see jarvis.protocol)
 # ---------------------------------------------------------------------------
 
 async def async_read_message(reader: asyncio.StreamReader) -> dict:
-    """Read a length-prefixed JSON message from an async stream."""
+    """Read one frame from an async stream and decode it."""
     raw_len = await reader.readexactly(4)
     msg_len = struct.unpack("!I", raw_len)[0]
     data = await reader.readexactly(msg_len)
-    return json.loads(data.decode("utf-8"))
+    return protocol.decode(data)
 
 
-async def async_send_message(writer: asyncio.StreamWriter, msg: dict):
-    """Send a length-prefixed JSON message to an async stream."""
-    payload = json.dumps(msg).encode("utf-8")
-    writer.write(struct.pack("!I", len(payload)) + payload)
+async def async_send_message(writer: asyncio.StreamWriter, msg: dict, binary: bool = False):
+    """Send a message to an async stream (see encode_message)."""
+    writer.write(encode_message(msg, binary))
     await writer.drain()
 
 
+def encode_message(msg: dict, binary: bool = False) -> bytes:
+    """Frame a reply. One carrying a "pcm" array (see chunk_message) goes out as an
+    audio frame when `binary` is set, else as JSON with the samples base64-encoded."""
+    pcm = msg.get("pcm")
+    if pcm is None:
+        return protocol.encode_json(msg)
+    meta = {k: v for k, v in msg.items() if k not in ("pcm", "sample_rate", "dtype")}
+    if binary:
+        return protocol.encode_audio(meta, pcm, msg["sample_rate"], msg["dtype"])
+    return protocol.encode_json({
+        **meta,
+        "sample_rate": msg["sample_rate"],
+        "dtype": msg["dtype"],
+        "audio": base64.b64encode(pcm.tobytes()).decode("ascii"),
+    })
+
+
+def chunk_message(index: int, pcm: np.ndarray, sr: int, sample_format: str = "float32",
+                  sample_rate: int | None = None) -> dict:
+    """Wrap a PCM chunk as a stream message, converted to the client's negotiated format.
+
+    The request id is added by the sender, like on every other reply; the encoding
+    (audio frame or base64 JSON) is chosen when it is sent.
+    """
+    pcm, sr = protocol.convert(pcm, sr, sample_format, sample_rate)
+    return {"status": "chunk", "index": index, "sample_rate": sr, "dtype": sample_format, "pcm": pcm}
+
+
 # ---------------------------------------------------------------------------
 # Main server
 # ---------------------------------------------------------------------------
 
-async def serve(model_id: str, n_workers: int, log):
+async def deliver(request: dict, audio: np.ndarray, sr: int, trace: Trace,
+                  player: Player | None = None, ticket: int | None = None, **attrs):
+    """Play (on the player, at the request's ticket) or write an utterance held by the main process."""
+    output = request.get("output")
+    if output is None:
+        if player is None or ticket is None:
+            raise ValueError("speaker output needs the player and a reserved ticket")
+        with trace.span("daemon.playback", **attrs):
+            await asyncio.wrap_future(player.submit(ticket, audio, sr))
+    elif output != "/dev/null":
+        with trace.span("handler.write", path=output, **attrs):
+            await asyncio.to_thread(write_audio, output, audio, sr, request.get("format"))
+
+
+async def serve_cached(request: dict, audio: np.ndarray, sr: int, trace: Trace,
+                       player: Player | None = None, ticket: int | None = None) -> dict:
+    """Answer a generate request from the cache, without a worker."""
+    await deliver(request, audio, sr, trace, player, ticket, cached=True)
+    return {"status": "ok", "cached": True, "audio_s": round(len(audio) / sr, 3)}
+
+
+def _merge_pieces(results, samples: int, sr: int, t0: float) -> dict:
+    """Result of a request generated as pieces: generation_s is wall time, all pieces included."""
+    return {
+        "status": "ok",
+        "pieces": len(results),
+        "chunks": sum(r.get("chunks", 0) for r in results),
+        "audio_s": round(samples / sr, 3),
+        "generation_s": round(time.time() - t0, 3),
+        "rms": max(r.get("rms", 0.0) for r in results),
+        "attempts": max(r.get("attempts") or 1 for r in results),
+        "aborted": sum(r.get("aborted", 0) for r in results),
+        "passed": all(r.get("passed") for r in results),
+    }
+
+
+async def generate_long(pool: WorkerPool, request: dict, texts: list, trace: Trace,
+                        player: Player | None = None, tickets=(), keep: bool = True) -> tuple:
+    """Generate a long request as pieces on all free workers, stitched in text order.
+
+    Speaker output plays each piece at its own player ticket, file output writes it, as
+    soon as it and the pieces before it are done. With keep, the stitched utterance is
+    also returned (cache, reply_audio). Returns (result, pcm, sample_rate): pcm is None
+    if a piece failed or keep is False.
+    """
+    t0 = time.time()
+    tasks = pool.fan_out(request, texts, trace)
+    output = request.get("output")
+    stitcher = writer = None
+    parts, results, played = [], [], []
+    samples = 0
+    write_s = 0.0
+    try:
+        for i, task in enumerate(tasks):
+            result, pcm, sr = await task
+            if result.get("status") != "ok" or pcm is None:
+                return {**result, "piece": i, "pieces": len(texts)}, None, None
+            results.append(result)
+            if stitcher is None:
+                stitcher = Stitcher(sr, request.get("crossfade_ms", CROSSFADE_MS), request.get("trim", True))
+                if output and output != "/dev/null":
+                    writer = AudioWriter(output, sr, request.get("format"))
+            part = stitcher.add(pcm)
+            if i == len(tasks) - 1:
+                part = np.concatenate([part, stitcher.finish()])
+            samples += len(part)
+            if keep:
+                parts.append(part)
+            if player is not None and tickets:
+                played.append(asyncio.wrap_future(player.submit(tickets[i], part, sr)))
+            if writer is not None:
+                w0 = time.monotonic()
+                await asyncio.to_thread(writer.write, part)
+                write_s += time.monotonic() - w0
+        if writer is not None:
+            with trace.span("handler.write", path=output, format=writer.format, pieces=len(texts),
+                            incremental_s=round(write_s, 3)):
+                await asyncio.to_thread(writer.close)
+            writer = None
+    finally:
+        pool.end_fan_out(request["id"], tasks)
+        if writer is not None:
+            writer.discard()
+    if played:
+        with trace.span("daemon.playback", pieces=len(played)):
+            await asyncio.gather(*played)
+    pcm = np.concatenate(parts) if keep else None
+    return _merge_pieces(results, samples, sr, t0), pcm, sr
+
+
+async def stream_long(pool: WorkerPool, request: dict, texts: list, trace: Trace):
+    """Long generate_stream request: like pool.stream(), yields (pcm, sample_rate) then the result.
+
+    The first piece streams chunk by chunk (as is: already sent, it is neither trimmed
+    nor crossfaded) while the other pieces generate on the other workers; each of them
+    then follows as one chunk, in order, as soon as it and the pieces before it are done.
+    """
+    t0 = time.time()
+    tasks = pool.fan_out(request, texts, trace, first=1)
+    results = []
+    samples = 0
+    try:
+        first = {**request, "id": f"{request['id']}{PIECE_SEP}0", "text": texts[0]}
+        async with contextlib.aclosing(pool.stream(first, trace)) as stream:
+            async for msg in stream:
+                if isinstance(msg, dict):
+                    result = msg
+                    break
+                samples += len(msg[0])
+                sr = msg[1]
+                yield msg
+        if result.get("status") != "ok":
+            yield {**result, "piece": 0, "pieces": len(texts)}
+            return
+        results.append(result)
+        stitcher = None
+        for i, task in enumerate(tasks, 1):
+            result, pcm, sr = await task
+            if result.get("status") != "ok" or pcm is None:
+                yield {**result, "piece": i, "pieces": len(texts)}
+                return
+            results.append(result)
+            if stitcher is None:
+                stitcher = Stitcher(sr, request.get("crossfade_ms", CROSSFADE_MS), request.get("trim", True))
+            part = stitcher.add(pcm)
+            if i == len(texts) - 1:
+                part = np.concatenate([part, stitcher.finish()])
+            samples += len(part)
+            yield part, sr
+    finally:
+        pool.end_fan_out(request["id"], tasks)
+    yield _merge_pieces(results, samples, sr, t0)
+
+
+async def warm_fillers(pool: WorkerPool, bank: FillerBank, log):
+    """Generate the filler takes missing from the bank, as background work on all workers.
+
+    Takes are batch-priority requests, at most as many in flight as there are worker
+    slots outside the batch reserve, so interactive traffic is served first and the
+    autoscaler doesn't grow the pool for them.
+    """
+    missing = bank.missing()
+    if not missing:
+        log.info("fillers ready", **bank.stats())
+        return
+    log.info("warming fillers", missing=len(missing), cached=bank.stats()["takes"])
+    t0 = time.time()
+    limit = asyncio.Semaphore(max(1, pool.size * pool.slots - BATCH_RESERVE))
+
+    async def make(key, language, phrase, variant):
+        audio = []
+        async with limit:
+            result = await pool.submit(
+                {"id": f"filler-{key[:12]}", "text": phrase, "language": language,
+                 "output": "/dev/null", "return_audio": True, "priority": "batch"},
+                on_audio=lambda pcm, sr: audio.append((pcm, sr)),
+            )
+        if audio and result.get("status") == "ok":
+            bank.add(key, *audio[0])
+        else:
+            log.warning("filler failed", phrase=phrase, variant=variant, error=result.get("message"))
+
+    try:
+        await asyncio.gather(*(make(*take) for take in missing))
+    except asyncio.CancelledError:
+        bank.save()  # daemon stopping: keep the takes made so far
+        raise
+    await asyncio.to_thread(bank.save)
+    log.info("fillers done", elapsed=f"{time.time() - t0:.1f}s", **bank.stats())
+
+
+async def serve(model_id: str, n_workers: int, log, cache_mb: int = DEFAULT_CACHE_MB,
+                max_workers: int | None = None, idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                slots: int = 1, hot_reload: bool = True, preload: bool = False):
     """Async main loop: start workers, accept connections, dispatch requests."""
+    t_boot = time.time()
     # Clean up stale socket
     if SOCKET_PATH.exists():
         log.warning("removing stale socket", path=str(SOCKET_PATH))
         SOCKET_PATH.unlink()
 
     # Start worker pool and wait for readiness
-    log.info("starting workers", model=model_id, workers=n_workers)
-    pool = WorkerPool(n_workers, model_id, log)
-    filler_cache = await pool.wait_ready()
-    log.info("all workers ready", fillers=sum(len(v) for v in filler_cache.values()))
+    log.info("starting workers", model=model_id, workers=n_workers, max_workers=max_workers, slots=slots,
+             hot_reload=hot_reload, preload=preload)
+    pool = WorkerPool(n_workers, model_id, log, max_workers=max_workers, idle_timeout=idle_timeout,
+                      slots=slots, hot_reload=hot_reload, preload=preload)
+    await pool.wait_ready()
+    log.info("all workers ready")
+
+    # Startup timeline: slowest worker's phases, then seconds since launch to each milestone
+    startup = {**pool.startup, "ready_s": None, "fillers_s": None}
+
+    async def fillers_phase():
+        await warm_fillers(pool, fillers, log)
+        startup["fillers_s"] = round(time.time() - t_boot, 3)
+        log.info("startup complete", fillers_s=startup["fillers_s"])
+
+    fillers = FillerBank(model_id)
+    filler_task = asyncio.create_task(fillers_phase())
+
+    cache = AudioCache(max_mb=cache_mb) if cache_mb > 0 else None
+    if cache:
+        log.info("tts cache", **cache.stats())
+    player = Player()
 
     shutdown_event = asyncio.Event()
     request_count = 0
 
-    async def handle_client(reader, writer):
+    async def finish_trace(trace, request, result, t_start, **attrs):
+        """Close a generate request's trace: write its spans, attach id and timing to the reply."""
+        end = time.time()
+        trace.add("daemon.request", t_start, end, action=request.get("action"),
+                  status=result.get("status"), **attrs)
+        pool.metrics.record_trace(trace.spans)
+        await asyncio.to_thread(tracing.write, trace.spans)
+        return {**result, "trace_id": trace.id, "timing": tracing.timing(trace, result, end - t_start)}
+
+    async def handle_request(request, send):
+        """Handle one request; every reply is tagged with the request's id."""
         nonlocal request_count
+
+        binary = request.get("wire") == "binary"
+
+        async def reply(msg):
+            if request.get("id") is not None:
+                msg = {**msg, "id": request["id"]}
+            await send(msg, binary)
+
         try:
-            request = await async_read_message(reader)
             action = request.get("action", "generate")
 
             if action == "shutdown":
-                await async_send_message(writer, {"status": "ok"})
+                await reply({"status": "ok"})
                 log.info("shutdown requested by client")
                 shutdown_event.set()
                 return
 
             if action == "status":
-                await async_send_message(writer, {
+                await reply({
                     "status": "ok",
                     "model": "loaded",
-                    "workers": n_workers,
+                    "workers": pool.size,
+                    "target_workers": pool.target,
+                    "min_workers": pool.min_workers,
+                    "max_workers": pool.max_workers,
+                    "restarts": sum(pool.restarts.values()),
+                    "restarts_by_worker": pool.restarts,
+                    "idle_workers": pool.idle,
+                    "slots_per_worker": pool.slots,
+                    "hot_reload": pool.hot_reload,
+                    "running": pool.running,
+                    "queued": pool.pending,
+                    "queue": pool.queue_stats(),
                     "requests_served": request_count,
-                    "memory_mb": mem_mb(),
+                    "memory_mb": await asyncio.to_thread(mem_mb),
+                    "cache": cache.stats() if cache else None,
+                    "playback": player.stats(),
+                    "fillers": fillers.stats(),
+                    "startup": startup,
                 })
                 return
 
+            if action == "metrics":
+                rss = await asyncio.to_thread(process_rss_mb, [os.getpid(), *pool.pids])
+                workers = pool.worker_stats(rss)
+                await reply({
+                    "status": "ok",
+                    "model": model_id,
+                    "requests_served": request_count,
+                    "running": pool.running,
+                    "queued": pool.pending,
+                    **pool.metrics.snapshot(),
+                    "workers": workers,
+                    "memory_mb": {
+                        "main": rss.get(os.getpid()),
+                        "workers": sum(w["rss_mb"] or 0 for w in workers),
+                        "available": await asyncio.to_thread(available_memory_mb),
+                    },
+                    "cache": cache.stats() if cache else None,
+                    "playback": player.stats(),
+                })
+                return
+
+            if action == "cancel":
+                ids = request.get("ids") or ([request["id"]] if request.get("id") else [])
+                counts = {**pool.cancel(ids), "playback": player.cancel(ids)}
+                log.info("cancel", ids=len(ids), **counts)
+                await reply({"status": "ok", **counts})
+                return
+
             if action == "get_filler":
                 lang = request.get("language", "French")
-                paths = filler_cache.get(lang, [])
-                if paths:
-                    await async_send_message(writer, {"status": "ok", "path": random.choice(paths)})
-                else:
-                    await async_send_message(writer, {"status": "error", "message": f"no fillers for {lang}"})
+                try:
+                    _, sample_format, sample_rate = protocol.negotiate(request)
+                except protocol.ProtocolError as e:
+                    await reply({"status": "error", "message": str(e)})
+                    return
+                take = fillers.get(lang)
+                if take is None:
+                    await reply({"status": "error", "message": f"no fillers for {lang}"})
+                    return
+                phrase, pcm, sr = take
+                pcm, sr = protocol.convert(pcm, sr, sample_format, sample_rate)
+                await reply({"status": "ok", "text": phrase, "sample_rate": sr, "dtype": sample_format,
+                             "pcm": pcm})
                 return
 
             if action == "generate":
                 request_count += 1
                 req_num = request_count
+                request.setdefault("id", f"req-{req_num}")
+                trace = Trace(request.get("trace_id"), "daemon")
+                request["trace_id"] = trace.id
                 t_start = time.time()
                 text = request.get("text", "")
                 output = request.get("output")
-                dest = output or "speakers"
-
-                log.debug("request received", req=req_num, text=text[:60], dest=dest)
-                result = await pool.submit(request)
+                reply_audio = bool(request.get("reply_audio"))
+                if reply_audio:
+                    # The utterance goes back in the reply: nothing is played or written
+                    try:
+                        _, sample_format, sample_rate = protocol.negotiate(request)
+                    except protocol.ProtocolError as e:
+                        await reply({"status": "error", "message": str(e)})
+                        return
+                    output = request["output"] = "/dev/null"
+                elif output and output != "/dev/null":
+                    try:
+                        output_format(output, request.get("format"))
+                    except ValueError as e:
+                        await reply({"status": "error", "message": str(e)})
+                        return
+                dest = "reply" if reply_audio else output or "speakers"
+
+                log.debug("request received", req=req_num, text=text[:60], dest=dest, trace=trace.id)
+                key = cache_key(request, model_id) if cache else None
+                hit = await asyncio.to_thread(cache.get, key) if cache and key else None
+                texts = split_text(text) if request.get("split", True) else [text]
+                busy = None if hit else pool.admit(request, len(texts))
+                if busy is not None:
+                    pool.metrics.record_result(busy)
+                    log.warning("request refused", req=req_num, text=text[:40], eta=busy["eta_s"],
+                                wait=busy["wait_s"], queued=busy["queued"])
+                    await reply(busy)
+                    return
+                # Speaker output: hold this request's place (one per piece) in the playback order
+                tickets = [player.reserve(request["id"]) for _ in texts] if output is None else []
+                ticket = tickets[0] if tickets else None
+                audio = None  # (pcm, sample_rate) of the utterance, when the main process has it
+                try:
+                    if hit:
+                        audio = hit
+                        result = await serve_cached(request, *hit, trace, player, ticket)
+                    elif len(texts) > 1:
+                        log.info("long text split", req=req_num, pieces=len(texts), chars=len(text))
+                        result, pcm, sr = await generate_long(pool, request, texts, trace, player, tickets,
+                                                              keep=key is not None or reply_audio)
+                        if pcm is not None:
+                            audio = (pcm, sr)
+                            if cache and key and result.get("passed"):
+                                with trace.span("daemon.cache_put"):
+                                    await asyncio.to_thread(cache.put, key, pcm, sr)
+                    elif request.get("speculative") and pool.idle >= 2 and not pool.pending:
+                        result, pcm, sr = await pool.speculate(request, trace)
+                        if pcm is not None:
+                            audio = (pcm, sr)
+                            await deliver(request, pcm, sr, trace, player, ticket, speculative=True)
+                            if cache and key and result.get("passed"):
+                                with trace.span("daemon.cache_put"):
+                                    await asyncio.to_thread(cache.put, key, pcm, sr)
+                    else:
+                        fresh = []
+                        work = {**request, "return_audio": key is not None or reply_audio}
+                        if output is None:
+                            work.update(output="/dev/null", return_audio=True)
+                        result = await pool.submit(
+                            work,
+                            on_audio=lambda pcm, sr: fresh.append((pcm, sr)),
+                            trace=trace,
+                        )
+                        if fresh and result.get("status") == "ok":
+                            audio = fresh[0]
+                            if cache and key and result.get("passed"):
+                                with trace.span("daemon.cache_put"):
+                                    await asyncio.to_thread(cache.put, key, *audio)
+                            if output is None:  # a file output was written by the worker
+                                await deliver(request, *audio, trace, player, ticket)
+                finally:
+                    for t in tickets:
+                        player.release(t)
                 elapsed = time.time() - t_start
+                pool.metrics.record_result(result)
+                result = await finish_trace(trace, request, result, t_start, cached=bool(hit))
+                if reply_audio and audio is not None and result.get("status") == "ok":
+                    pcm, sr = protocol.convert(*audio, sample_format, sample_rate)
+                    result = {**result, "sample_rate": sr, "dtype": sample_format, "pcm": pcm}
 
                 status = result.get("status", "?")
                 if status == "ok":
                     log.info("request done", req=req_num, elapsed=f"{elapsed:.1f}s",
-                             text=text[:40], dest=dest)
+                             text=text[:40], dest=dest, cached=bool(hit))
+                elif status == "cancelled":
+                    log.info("request cancelled", req=req_num, elapsed=f"{elapsed:.1f}s", text=text[:40])
                 else:
                     log.error("request failed", req=req_num, elapsed=f"{elapsed:.1f}s",
                               text=text[:40], error=result.get("message"))
 
-                await async_send_message(writer, result)
+                await reply(result)
                 return
 
-            await async_send_message(writer, {"status": "error", "message": f"unknown action: {action}"})
+            if action == "generate_stream":
+                request_count += 1
+                req_num = request_count
+                request.setdefault("id", f"req-{req_num}")
+                trace = Trace(request.get("trace_id"), "daemon")
+                request["trace_id"] = trace.id
+                t_start = time.time()
+                text = request.get("text", "")
+                first_chunk_s = None
+                n_chunks = 0
+                result = {"status": "error", "message": "no result from worker"}
+                try:
+                    _, sample_format, sample_rate = protocol.negotiate(request)
+                except protocol.ProtocolError as e:
+                    await reply({"status": "error", "message": str(e)})
+                    return
+
+                log.debug("stream request received", req=req_num, text=text[:60])
+                key = cache_key(request, model_id) if cache else None
+                hit = await asyncio.to_thread(cache.get, key) if cache and key else None
+                texts = split_text(text) if request.get("split", True) else [text]
+                busy = None if hit else pool.admit(request, len(texts))
+                if busy is not None:
+                    pool.metrics.record_result(busy)
+                    log.warning("stream refused", req=req_num, text=text[:40], eta=busy["eta_s"],
+                                wait=busy["wait_s"], queued=busy["queued"])
+                    await reply(busy)
+                    return
+                if hit:
+                    pcm, sr = hit
+                    first_chunk_s = time.time() - t_start
+                    await reply(chunk_message(0, pcm, sr, sample_format, sample_rate))
+                    n_chunks = 1
+                    result = {"status": "ok", "cached": True, "chunks": 1,
+                              "audio_s": round(len(pcm) / sr, 3)}
+                else:
+                    streamed = None  # PcmBuffer of the chunks sent, for the cache
+                    if len(texts) > 1:
+                        log.info("long text split", req=req_num, pieces=len(texts), chars=len(text))
+                        source = stream_long(pool, request, texts, trace)
+                    else:
+                        source = pool.stream(request, trace)
+                    async with contextlib.aclosing(source) as stream:
+                        async for msg in stream:
+                            if isinstance(msg, dict):
+                                result = msg
+                                break
+                            pcm, sr = msg
+                            if first_chunk_s is None:
+                                first_chunk_s = time.time() - t_start
+                                trace.add("daemon.first_chunk", t_start, time.time())
+                            await reply(chunk_message(n_chunks, pcm, sr, sample_format, sample_rate))
+                            n_chunks += 1
+                            if key:
+                                if streamed is None:
+                                    streamed = PcmBuffer(sr, capacity_s=len(text) * 0.1)
+                                streamed.append(pcm)
+                    passed = result.get("status") == "ok" and result.get("passed")
+                    if cache and key and streamed and passed:
+                        with trace.span("daemon.cache_put"):
+                            trimmed = handlers.trim_trailing_silence(streamed, sr)
+                            if len(trimmed):
+                                await asyncio.to_thread(cache.put, key, trimmed, sr)
+                elapsed = time.time() - t_start
+                pool.metrics.record_result(result)
+                if first_chunk_s is not None:
+                    pool.metrics.observe("first_chunk_s", first_chunk_s)
+                result = await finish_trace(trace, request, result, t_start, cached=bool(hit),
+                                            chunks=n_chunks)
+
+                if result.get("status") == "ok":
+                    result = {**result, "elapsed_s": round(elapsed, 3),
+                              "first_chunk_s": round(first_chunk_s, 3) if first_chunk_s else None}
+                    log.info("stream done", req=req_num, elapsed=f"{elapsed:.1f}s",
+                             first_chunk=f"{first_chunk_s or 0:.2f}s", chunks=n_chunks, text=text[:40])
+                elif result.get("status") == "cancelled":
+                    log.info("stream cancelled", req=req_num, elapsed=f"{elapsed:.1f}s", text=text[:40])
+                else:
+                    log.error("stream failed", req=req_num, elapsed=f"{elapsed:.1f}s",
+                              text=text[:40], error=result.get("message"))
+
+                await reply(result)
+                return
 
-        except asyncio.IncompleteReadError:
+            await reply({"status": "error", "message": f"unknown action: {action}"})
+
+        except (ConnectionResetError, BrokenPipeError):
             pass  # client disconnected
-        except ConnectionResetError:
-            pass
         except Exception as e:
             log.error("client error", error=str(e), traceback=traceback.format_exc())
             try:
-                await async_send_message(writer, {"status": "error", "message": str(e)})
+                await reply({"status": "error", "message": str(e)})
             except Exception:
                 pass
+
+    async def handle_client(reader, writer):
+        """Serve one connection until the client closes it.
+
+        Requests are read in a loop and handled concurrently, so a client can keep the
+        connection open and pipeline many requests; replies may come back out of order
+        and are matched by id. One-shot clients (send_request) just close after reading.
+        """
+        write_lock = asyncio.Lock()
+        tasks = set()
+        connections[writer] = asyncio.current_task()
+
+        async def send(msg, binary=False):
+            async with write_lock:
+                await async_send_message(writer, msg, binary)
+
+        try:
+            while True:
+                request = await async_read_message(reader)
+                task = asyncio.create_task(handle_request(request, send))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass  # client closed the connection
+        except Exception as e:
+            log.error("connection error", error=str(e), traceback=traceback.format_exc())
         finally:
+            connections.pop(writer, None)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
             writer.close()
             try:
                 await writer.wait_closed()
             except Exception:
                 pass
 
+    connections: dict = {}  # writer -> handle_client task of each open connection
+
     # Signal handlers → set shutdown event
     loop = asyncio.get_running_loop()
     for sig in (signal.SIGTERM, signal.SIGINT):
@@ -487,7 +1817,8 @@ async def serve(model_id: str, n_workers: int, log):
 
     # Start accepting connections
     server = await asyncio.start_unix_server(handle_client, path=str(SOCKET_PATH))
-    log.info("listening", socket=str(SOCKET_PATH))
+    startup["ready_s"] = round(time.time() - t_boot, 3)
+    log.info("listening", socket=str(SOCKET_PATH), **startup)
 
     # Serve until shutdown
     await shutdown_event.wait()
@@ -499,20 +1830,37 @@ async def serve(model_id: str, n_workers: int, log):
     except asyncio.TimeoutError:
         log.warning("forcing server close")
 
+    filler_task.cancel()
+    await asyncio.gather(filler_task, return_exceptions=True)
+
+    # Persistent client connections (jah talk, jah top...) would otherwise stay open
+    player.close()
+    for writer in list(connections):
+        writer.close()
+    if connections:
+        await asyncio.wait(list(connections.values()), timeout=5)
+
     pool.shutdown()
+    if cache:
+        cache.save_index()
     if SOCKET_PATH.exists():
         SOCKET_PATH.unlink()
     log.info("shutdown complete", requests_served=request_count)
 
 
-def main(model_name: str | None = None, n_workers: int = DEFAULT_WORKERS):
+def main(model_name: str | None = None, n_workers: int = DEFAULT_WORKERS,
+         cache_mb: int = DEFAULT_CACHE_MB, max_workers: int | None = None,
+         idle_timeout: float = DEFAULT_IDLE_TIMEOUT, slots: int = 1, hot_reload: bool = True,
+         preload: bool = False):
     log = setup_logging()
 
     # Resolve model name
     model_key = (model_name or DEFAULT_MODEL).lower()
     model_id = MODEL_ALIASES.get(model_key, model_key)
 
-    asyncio.run(serve(model_id, n_workers, log))
+    asyncio.run(serve(model_id, n_workers, log, cache_mb=cache_mb,
+                      max_workers=max_workers, idle_timeout=idle_timeout, slots=slots,
+                      hot_reload=hot_reload, preload=preload))
 
 
 if __name__ == "__main__":
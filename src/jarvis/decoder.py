@@ -0,0 +1,329 @@
+"""Batched decoding — the requests of a worker's slots advance in one forward pass per step.
+
+A worker holds one model copy for all its slots. Decoding one request at a time, every
+step is a forward pass at batch size 1 that reads all the weights for a single token;
+slots taking turns would share that throughput, not add to it. Here the Qwen3-TTS talker
+(mlx-audio) steps every request of the worker at once: one forward pass over a batch with
+a row per request, then one batched pass of the code predictor per codebook. A step is
+bound by reading the weights, so N rows cost little more than one and the worker's
+throughput grows with its slots.
+
+The batch is continuous: a request joins at the next step (its prompt is prefilled on
+its own, then its keys and values are merged in) and leaves as soon as it ends (codec
+EOS, max_tokens, closed), without waiting for the others. Rows have different lengths:
+the KV cache is right-aligned, shorter rows are left-padded, the padding is masked out
+and each row keeps its own rotary positions.
+
+Sampling, the repetition penalty and the end condition are those of mlx-audio's
+Model._generate_with_instruct, row by row. The codes of a finished request are decoded
+to audio by the speech tokenizer when its iterator is next read, outside the batch step.
+"""
+
+import time
+from typing import Any, NamedTuple
+
+import mlx.core as mx
+import numpy as np
+
+MASKED = -1e9  # additive attention mask of a padding column (as create_additive_causal_mask)
+
+
+def supports(model) -> bool:
+    """Whether model is a Qwen3-TTS model (mlx-audio layout) that BatchedModel can drive."""
+    return (all(hasattr(model, a) for a in ("talker", "speech_tokenizer", "_prepare_generation_inputs",
+                                            "_sample_token"))
+            and getattr(model.config, "tts_model_type", None) in ("voice_design", "custom_voice"))
+
+
+class Result(NamedTuple):
+    """What a request's iterator yields: audio is None until the request has ended."""
+
+    audio: Any
+    token_count: int
+    sample_rate: int
+
+
+class LayerCache:
+    """Keys and values of one attention layer, one row per request, right-aligned.
+
+    Same interface as mlx_lm's KVCache (offset, update_and_fetch): columns are written in
+    place into spare capacity grown STEP columns at a time. All rows share `offset`; a row
+    shorter than the batch has zero columns at its start, masked out by the caller.
+    """
+
+    STEP = 256
+
+    def __init__(self):
+        self.keys: Any = None  # [rows, kv heads, capacity, head_dim]
+        self.values: Any = None
+        self.offset = 0
+
+    def update_and_fetch(self, keys, values):
+        prev = self.offset
+        if self.keys is None or prev + keys.shape[2] > self.keys.shape[2]:
+            n = (keys.shape[2] + self.STEP - 1) // self.STEP * self.STEP
+            new_k = mx.zeros((*keys.shape[:2], n, keys.shape[3]), keys.dtype)
+            new_v = mx.zeros((*values.shape[:2], n, values.shape[3]), values.dtype)
+            if self.keys is not None:
+                new_k = mx.concatenate([self.keys[..., :prev, :], new_k], axis=2)
+                new_v = mx.concatenate([self.values[..., :prev, :], new_v], axis=2)
+            self.keys, self.values = new_k, new_v
+        self.offset += keys.shape[2]
+        self.keys[..., prev:self.offset, :] = keys
+        self.values[..., prev:self.offset, :] = values
+        return self.keys[..., :self.offset, :], self.values[..., :self.offset, :]
+
+    def state(self, width: int):
+        """Keys and values left-padded with zero columns to `width` columns."""
+        keys, values = self.keys[..., :self.offset, :], self.values[..., :self.offset, :]
+        pad = width - self.offset
+        if pad:
+            keys = mx.concatenate([mx.zeros((*keys.shape[:2], pad, keys.shape[3]), keys.dtype), keys],
+                                  axis=2)
+            values = mx.concatenate([mx.zeros((*values.shape[:2], pad, values.shape[3]), values.dtype),
+                                     values], axis=2)
+        return keys, values
+
+    def merge(self, other: "LayerCache"):
+        """Append other's rows, padding whichever side is shorter."""
+        width = max(self.offset, other.offset)
+        keys, values = self.state(width)
+        other_keys, other_values = other.state(width)
+        self.keys = mx.concatenate([keys, other_keys], axis=0)
+        self.values = mx.concatenate([values, other_values], axis=0)
+        self.offset = width
+
+    def keep(self, rows: list, width: int):
+        """Keep these rows and the last `width` columns."""
+        index = mx.array(rows)
+        start = self.offset - width
+        self.keys = self.keys[index, :, start:self.offset, :]
+        self.values = self.values[index, :, start:self.offset, :]
+        self.offset = width
+
+
+class Request:
+    """One generation in the batch, and the iterator the generate methods return.
+
+    next() yields a Result without audio while the request runs, then one Result with its
+    utterance, then stops. It steps the batch itself when nothing else did since it was
+    last read (a lone request, the warm-up); the worker loop steps it once per round.
+    close() takes the request out of the batch.
+    """
+
+    def __init__(self, batch: "Batch", prompt, trailing, pad, sampling: dict, max_tokens: int):
+        self.batch = batch
+        self.prompt = prompt  # [1, P, hidden], dropped once prefilled
+        self.trailing = trailing  # text embeddings fed one per step, then pad
+        self.pad = pad
+        self.sampling = sampling  # temperature, top_k, top_p
+        self.repetition_penalty = sampling.pop("repetition_penalty")
+        self.max_tokens = max_tokens
+        self.length = 0  # positions in the KV cache
+        self.codes: list = []  # [1, num_code_groups] per step; emptied once returned
+        self.first: list[int] = []  # first-codebook tokens, for the repetition penalty
+        self.next_embeds: Any = None
+        self.done = max_tokens <= 0
+        self.error: Exception | None = None
+        self.seen = batch.steps
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Result:
+        if self.error is None and not self.done and self.seen == self.batch.steps:
+            self.batch.step()
+        self.seen = self.batch.steps
+        if self.error is not None:
+            raise self.error
+        sr = self.batch.model.sample_rate
+        if not self.done:
+            return Result(None, len(self.codes), sr)
+        codes, self.codes = self.codes, []
+        if not codes:
+            raise StopIteration
+        return Result(self.batch.decode(codes), len(codes), sr)
+
+    def close(self):
+        self.batch.remove(self)
+
+
+class Batch:
+    """The running requests of one model and their shared KV cache (rows in self.rows order)."""
+
+    def __init__(self, model):
+        self.model = model
+        self.rows: list[Request] = []  # in the cache
+        self.joining: list[Request] = []  # prefilled at the next step
+        self.cache: list[LayerCache] = []  # one per talker layer, empty with no rows
+        self.steps = 0
+
+    def __len__(self) -> int:
+        return len(self.rows) + len(self.joining)
+
+    def submit(self, text, speaker, language, instruct, max_tokens, **sampling) -> Request:
+        if self.model.speech_tokenizer is None:
+            raise ValueError("Speech tokenizer not loaded")
+        prompt, trailing, pad = self.model._prepare_generation_inputs(
+            text=text, language=language, speaker=speaker, instruct=instruct)
+        mx.eval(prompt, trailing, pad)
+        request = Request(self, prompt, trailing, pad, sampling, max_tokens)
+        if not request.done:
+            self.joining.append(request)
+        return request
+
+    def remove(self, request: Request):
+        if request in self.joining:
+            self.joining.remove(request)
+        elif request in self.rows:
+            self._leave([request])
+
+    def step(self) -> float:
+        """One decoding step of every request: prefill those that joined, one forward pass
+        over the others, sampling. Returns its duration in seconds. An error fails every
+        request of the batch."""
+        if not len(self):
+            return 0.0
+        t0 = time.monotonic()
+        self.steps += 1
+        try:
+            self._step()
+        except Exception as e:
+            for request in self.rows + self.joining:
+                request.error = e
+            self.rows, self.joining, self.cache = [], [], []
+        return time.monotonic() - t0
+
+    def _step(self):
+        talker = self.model.talker
+        config = self.model.config.talker_config
+        row_logits, row_hidden = [], []
+        rows = list(self.rows)
+        if rows:
+            embeds = mx.concatenate([r.next_embeds for r in rows], axis=0)
+            width = self.cache[0].offset
+            lengths = mx.array([r.length for r in rows])
+            positions = mx.broadcast_to(lengths[None, :, None], (3, len(rows), 1))
+            padding = mx.arange(width + 1)[None, :] < (width - lengths)[:, None]
+            mask = mx.where(padding, MASKED, 0.0)[:, None, None, :].astype(embeds.dtype)
+            step_logits, step_hidden = talker(embeds, position_ids=positions, mask=mask,
+                                              cache=self.cache)
+            row_logits.append(step_logits)
+            row_hidden.append(step_hidden)
+            for r in rows:
+                r.length += 1
+        for r in self.joining:
+            cache = [LayerCache() for _ in talker.model.layers]
+            step_logits, step_hidden = talker(r.prompt, cache=cache)
+            row_logits.append(step_logits[:, -1:, :])
+            row_hidden.append(step_hidden[:, -1:, :])
+            r.length, r.prompt = r.prompt.shape[1], None
+            if not self.cache:
+                self.cache = cache
+            else:
+                for layer, new in zip(self.cache, cache):
+                    layer.merge(new)
+            self.rows.append(r)
+            rows.append(r)
+        self.joining = []
+        logits = mx.concatenate(row_logits, axis=0)
+        hidden = mx.concatenate(row_hidden, axis=0)
+
+        first = mx.concatenate([self._sample(r, logits[i:i + 1], r.first or None)
+                                for i, r in enumerate(rows)], axis=0)
+        tokens = np.array(first[:, 0]).tolist()
+        ended = [r for r, token in zip(rows, tokens) if token == config.codec_eos_token_id]
+        live = [i for i, r in enumerate(rows) if r not in ended]
+        if live:
+            self._predict_codes(talker, config, [rows[i] for i in live], first[mx.array(live)],
+                                hidden[mx.array(live)])
+        ended += [r for r in rows if r not in ended and len(r.codes) >= r.max_tokens]
+        for r in ended:
+            r.done = True
+        if ended:
+            self._leave(ended)
+
+    def _predict_codes(self, talker, config, rows, first, hidden):
+        """The other codebooks of each row's step, then each row's next input embedding."""
+        predictor = talker.code_predictor
+        code_tokens = [first]
+        cache = predictor.make_cache()
+        for code_idx in range(config.num_code_groups - 1):
+            if code_idx == 0:
+                code_input = mx.concatenate([hidden, talker.get_input_embeddings()(first)], axis=1)
+            else:
+                code_input = predictor.codec_embedding[code_idx - 1](code_tokens[-1])
+            code_logits, cache, _ = predictor(code_input, cache=cache, generation_step=code_idx)
+            code_tokens.append(mx.concatenate([self._sample(r, code_logits[i:i + 1])
+                                               for i, r in enumerate(rows)], axis=0))
+        codes = mx.concatenate(code_tokens, axis=1)
+        codec_embed = talker.get_input_embeddings()(first)
+        for i, code in enumerate(code_tokens[1:]):
+            codec_embed = codec_embed + predictor.codec_embedding[i](code)
+        for i, r in enumerate(rows):
+            r.codes.append(codes[i:i + 1])
+            r.first.append(int(first[i, 0]))
+            step = len(r.codes) - 1
+            text_embed = r.trailing[:, step:step + 1, :] if step < r.trailing.shape[1] else r.pad
+            r.next_embeds = text_embed + codec_embed[i:i + 1]
+        mx.eval([r.next_embeds for r in rows])
+
+    def _sample(self, request: Request, logits, generated=None):
+        return self.model._sample_token(logits, repetition_penalty=request.repetition_penalty,
+                                        generated_tokens=generated, **request.sampling)
+
+    def _leave(self, requests: list):
+        keep = [i for i, r in enumerate(self.rows) if r not in requests]
+        self.rows = [self.rows[i] for i in keep]
+        if not self.rows:
+            self.cache = []
+            mx.clear_cache()
+            return
+        width = max(r.length for r in self.rows)
+        for layer in self.cache:
+            layer.keep(keep, width)
+
+    def decode(self, codes: list):
+        """Audio of a finished request's codes, as mlx-audio's generation returns it."""
+        audio, lengths = self.model.speech_tokenizer.decode(mx.stack(codes, axis=1))
+        audio = audio[0]
+        valid = int(lengths[0])
+        if 0 < valid < audio.shape[0]:
+            audio = audio[:valid]
+        mx.eval(audio)
+        return audio
+
+
+class BatchedModel:
+    """A Qwen3-TTS model whose generate_voice_design / generate_custom_voice requests share
+    one Batch. Everything else (config, sample_rate, speakers, ...) is the model's."""
+
+    def __init__(self, model):
+        self.model = model
+        self.batch = Batch(model)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def generate_voice_design(self, text, instruct, language="auto", temperature=0.9,
+                              max_tokens=4096, top_k=50, top_p=1.0, repetition_penalty=1.05,
+                              verbose=False) -> Request:
+        if self.model.config.tts_model_type != "voice_design":
+            raise ValueError(f"Model type '{self.model.config.tts_model_type}' does not support "
+                             "generate_voice_design")
+        return self.batch.submit(text, None, language, instruct, max_tokens, temperature=temperature,
+                                 top_k=top_k, top_p=top_p, repetition_penalty=repetition_penalty)
+
+    def generate_custom_voice(self, text, speaker, language="auto", instruct=None, temperature=0.9,
+                              max_tokens=4096, top_k=50, top_p=1.0, repetition_penalty=1.05,
+                              verbose=False) -> Request:
+        if self.model.config.tts_model_type != "custom_voice":
+            raise ValueError(f"Model type '{self.model.config.tts_model_type}' does not support "
+                             "generate_custom_voice")
+        if speaker.lower() not in [s.lower() for s in self.model.supported_speakers]:
+            raise ValueError(f"Speaker '{speaker}' not supported. "
+                             f"Available: {self.model.supported_speakers}")
+        if self.model.config.tts_model_size == "0b6":
+            instruct = None  # not supported by the 0.6B models
+        return self.batch.submit(text, speaker, language, instruct, max_tokens, temperature=temperature,
+                                 top_k=top_k, top_p=top_p, repetition_penalty=repetition_penalty)
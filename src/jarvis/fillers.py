@@ -0,0 +1,207 @@
+"""Filler bank — short "thinking" phrases jah talk plays while it waits for an answer.
+
+Takes are generated in the background once the daemon is ready (daemon.warm_fillers,
+batch-priority requests spread over all workers), accumulated in one growable PcmBuffer
+and packed into one raw float32 file that the daemon memory-maps: get() returns a view
+of the mapped (or accumulated) samples, with no WAV decoding and no file read.
+
+Key of a take: sha256 over (phrase, language, model id, variant), so editing FILLERS or
+switching models never serves stale audio. Takes no longer wanted are dropped the next
+time the bank is written.
+
+Files under FILLER_DIR: bank.f32 (all takes back to back) and bank.json
+{"sample_rate": sr, "takes": {key: [language, phrase, offset, length]}} (offsets in samples).
+The one-WAV-per-take files of earlier versions (fr_00_v0.wav, ...) are deleted once a bank
+has been written.
+"""
+
+import hashlib
+import json
+import mmap
+import random
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from jarvis.pcm import PcmBuffer
+
+FILLER_DIR = Path.home() / ".cache" / "jarvis" / "fillers"
+FILLER_VARIANTS = 5  # number of vocal takes per phrase
+LEGACY_TAKES = "[a-z][a-z]_[0-9][0-9]_v[0-9]*.wav"  # superseded by the bank
+
+FILLERS = {
+    "French": [
+        "Hmm.",
+        "Voyons.",
+        "Alors.",
+        "Bonne question.",
+        "Voyons voir.",
+        "Attends, je réfléchis.",
+        "Laisse-moi réfléchir un instant.",
+        "Ah, intéressant.",
+        "OK, voyons ça.",
+        "Oui, alors.",
+        "Attends voir.",
+        "Eh bien.",
+        "C'est une bonne question, ça.",
+        "Hmm, laisse-moi vérifier.",
+        "OK, deux secondes.",
+        "Alors, comment dire.",
+        "Ah oui, d'accord.",
+        "Hmm, voyons un peu.",
+        "Oui, je vois.",
+        "Euh, attends.",
+    ],
+    "English": [
+        "Hmm.",
+        "Let me think.",
+        "Well.",
+        "Good question.",
+        "Let's see.",
+        "One moment.",
+        "OK, let me check.",
+        "Right, so.",
+        "Interesting.",
+        "Let me think about that.",
+        "Hmm, good one.",
+        "OK, hang on.",
+        "Yeah, so.",
+        "Let me see.",
+        "Ah, right.",
+    ],
+}
+
+
+Take = np.ndarray | tuple[int, int]  # samples, or (start, end) in FillerBank._fresh
+
+
+def filler_key(phrase: str, language: str, model_id: str, variant: int) -> str:
+    parts = [phrase, language, model_id, str(variant)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class FillerBank:
+    """Filler takes of one model: a memory-mapped bank plus the takes made since it was written.
+
+    Used from the daemon's event loop; save() may run in a thread: it writes the files
+    from a snapshot of the takes and swaps in the new mapping under the lock.
+    """
+
+    def __init__(self, model_id: str, root: Path = FILLER_DIR):
+        self.model_id = model_id
+        self.root = root
+        self.sample_rate = 0  # of the takes, once there are some
+        self._wanted = {
+            filler_key(phrase, lang, model_id, v): (lang, phrase, v)
+            for lang, phrases in FILLERS.items()
+            for phrase in phrases
+            for v in range(FILLER_VARIANTS)
+        }
+        # key -> (language, phrase, float32 samples or (start, end) in _fresh)
+        self._takes: dict[str, tuple[str, str, Take]] = {}
+        self._fresh: PcmBuffer | None = None  # the takes made since the bank was written
+        self._dirty = False  # bank files differ from _takes
+        self._lock = threading.Lock()  # _takes and _fresh are swapped by save()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            index = json.loads((self.root / "bank.json").read_text())
+            pcm = self._map(self.root / "bank.f32")
+        except (OSError, ValueError):
+            return
+        self.sample_rate = index.get("sample_rate")
+        for key, (lang, phrase, offset, length) in index.get("takes", {}).items():
+            if key in self._wanted and offset + length <= len(pcm):
+                self._takes[key] = (lang, phrase, pcm[offset:offset + length])
+            else:
+                self._dirty = True  # stale or damaged: compacted away at the next save
+
+    @staticmethod
+    def _map(path: Path) -> np.ndarray:
+        """Map a bank file read-only and ask the OS to page it in now, not at first get()."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+            mapped.madvise(mmap.MADV_WILLNEED)
+        return np.frombuffer(mapped, dtype=np.float32)
+
+    def missing(self) -> list:
+        """[(key, language, phrase, variant)] of the wanted takes not in the bank yet."""
+        return [(key, *spec) for key, spec in self._wanted.items() if key not in self._takes]
+
+    def add(self, key: str, pcm: np.ndarray, sr: int):
+        lang, phrase, _ = self._wanted[key]
+        with self._lock:
+            if self._fresh is None:
+                self._fresh = PcmBuffer(sr, capacity_s=60.0)
+            start = len(self._fresh)
+            self._fresh.append(pcm)
+            self._takes[key] = (lang, phrase, (start, len(self._fresh)))
+            self.sample_rate = sr
+            self._dirty = True
+
+    def _samples(self, pcm: Take) -> np.ndarray:
+        if not isinstance(pcm, tuple):
+            return pcm
+        if self._fresh is None:
+            raise KeyError(f"take {pcm} is not in the fresh takes")
+        return self._fresh.view(*pcm).reshape(-1)
+
+    def get(self, language: str) -> tuple[str, np.ndarray, int] | None:
+        """A random take for the language: (phrase, samples, sample_rate), or None."""
+        with self._lock:
+            takes = [(phrase, pcm) for lang, phrase, pcm in self._takes.values() if lang == language]
+            if not takes:
+                return None
+            phrase, pcm = random.choice(takes)
+            return phrase, self._samples(pcm), self.sample_rate
+
+    def save(self):
+        """Write all takes into a fresh bank and map it in place of the old one."""
+        with self._lock:
+            if not self._dirty or not self._takes:
+                return
+            takes = {key: (lang, phrase, self._samples(pcm))
+                     for key, (lang, phrase, pcm) in self._takes.items()}
+            sample_rate = self.sample_rate
+        entries: dict[str, tuple[str, str, int, int]] = {}
+        offset = 0
+        tmp = self.root / "bank.f32.tmp"
+        with open(tmp, "wb") as f:
+            for key, (lang, phrase, samples) in takes.items():
+                f.write(memoryview(samples).cast("B"))
+                entries[key] = (lang, phrase, offset, len(samples))
+                offset += len(samples)
+        tmp.replace(self.root / "bank.f32")
+        index_tmp = self.root / "bank.json.tmp"
+        index_tmp.write_text(json.dumps({"sample_rate": sample_rate, "takes": entries}))
+        index_tmp.replace(self.root / "bank.json")
+        for path in self.root.glob(LEGACY_TAKES):
+            path.unlink(missing_ok=True)
+
+        # Serve from the new mapping; views of the old one stay valid until dropped
+        bank = self._map(self.root / "bank.f32")
+        with self._lock:
+            for key, (lang, phrase, start, length) in entries.items():
+                self._takes[key] = (lang, phrase, bank[start:start + length])
+            # takes added while the files were written are still in _fresh
+            if not any(isinstance(p, tuple) for _, _, p in self._takes.values()):
+                self._fresh = None
+            self._dirty = self._fresh is not None
+
+    def stats(self) -> dict:
+        per_lang: dict[str, int] = {}
+        with self._lock:
+            for lang, _, _ in self._takes.values():
+                per_lang[lang] = per_lang.get(lang, 0) + 1
+            samples = sum(len(self._samples(pcm)) for _, _, pcm in self._takes.values())
+            n_takes = len(self._takes)
+        return {
+            "takes": n_takes,
+            "wanted": len(self._wanted),
+            "by_language": per_lang,
+            "size_mb": round(samples * 4 / (1024 * 1024), 1),
+        }
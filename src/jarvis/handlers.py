@@ -1,14 +1,18 @@
-"""TTS request handler — hot-reloaded by the daemon on every request."""
+"""TTS request handler — hot-reloaded by the daemon whenever the file changes."""
 
 import time
 import traceback
 import sys
 
 import re
+from collections.abc import Iterator
 
 import numpy as np
 import sounddevice as sd
-import soundfile as sf
+
+from jarvis.audiofile import AudioWriter, write_audio
+from jarvis.pcm import PcmBuffer
+from jarvis.trace import Trace
 
 
 def sanitize_text(text: str) -> str:
@@ -20,16 +24,25 @@ def sanitize_text(text: str) -> str:
     return text
 
 
-def trim_trailing_silence(audio: np.ndarray, sr: int, threshold: float = 0.02, min_silence_s: float = 0.15) -> np.ndarray:
-    """Remove trailing silence and low-energy artifacts from audio."""
-    flat = audio.flatten() if audio.ndim > 1 else audio
+def trim_trailing_silence(audio: np.ndarray | PcmBuffer, sr: int, threshold: float = 0.02,
+                          min_silence_s: float = 0.15) -> np.ndarray:
+    """Remove trailing silence and low-energy artifacts from audio.
+
+    audio is an array, or a PcmBuffer of the same sample rate: then the cut is looked up
+    in its window energies and the result is a view of the buffer.
+    """
+    if isinstance(audio, PcmBuffer):
+        if audio.sr != sr:
+            raise ValueError(f"PcmBuffer holds {audio.sr} Hz audio, not {sr} Hz")
+        return audio.trimmed(min_silence_s, threshold)
+    flat = audio.reshape(-1)
     win = int(sr * 0.02)  # 20ms windows
     n_wins = len(flat) // win
     if n_wins == 0:
         return audio[:0]
-    trimmed = flat[:n_wins * win].reshape(n_wins, win)
-    rms = np.sqrt(np.mean(trimmed ** 2, axis=1))
-    above = np.where(rms > threshold)[0]
+    frames = flat[:n_wins * win].reshape(n_wins, win)
+    energy = np.einsum("ij,ij->i", frames, frames)  # sum of squares per window, no squared copy
+    above = np.flatnonzero(energy > threshold * threshold * win)
     if len(above) == 0:
         return audio[:0]
     last_loud = (above[-1] + 1) * win
@@ -41,131 +54,436 @@ def trim_trailing_silence(audio: np.ndarray, sr: int, threshold: float = 0.02, m
 MAX_RETRIES = 3
 BAD_RMS_THRESHOLD = 0.1
 
+# Per-chunk quality scoring (QualityScore)
+SILENCE_RMS = 0.02  # chunk or 20 ms window RMS below which it counts as silence
+CLIP_LEVEL = 0.99  # sample magnitude counted as clipped
+FLATNESS_FRAME = 1024  # samples per spectral flatness frame
+EARLY_ABORT_CHUNKS = 3  # chunks scored before a take may be aborted
+ABORT_RMS = 0.2  # mean chunk RMS of a take that won't come back under BAD_RMS_THRESHOLD
+ABORT_CLIP_RATIO = 0.01  # share of clipped samples
+ABORT_FLATNESS = 0.4  # mean flatness of non-silent frames: speech ~0.05, white noise ~0.56
+ABORT_SILENCE_RATIO = 0.95  # share of silent 20 ms windows
 
-def _generate_audio(gen_method, gen_kwargs, max_chunks, sr):
-    """Run generation and return (chunks, avg_rms)."""
-    all_audio = []
-    rms_values = []
-    silent_streak = 0
-
-    for i, result in enumerate(gen_method(**gen_kwargs)):
-        if i >= max_chunks:
-            print(f"[TTS] chunk limit reached ({max_chunks})", file=sys.stderr)
-            break
-        chunk = np.array(result.audio, dtype=np.float32)
-        if chunk.ndim == 1:
-            chunk = chunk.reshape(-1, 1)
-        rms = float(np.sqrt(np.mean(chunk ** 2)))
-        dur_ms = len(chunk) / sr * 1000
-        print(f"[TTS] chunk {i}: {dur_ms:.0f}ms rms={rms:.4f}", file=sys.stderr)
-        rms_values.append(rms)
-        if rms < 0.02:
-            silent_streak += 1
-            if silent_streak >= 3:
-                print(f"[TTS] stopping: {silent_streak} silent chunks in a row", file=sys.stderr)
+_HANN = np.hanning(FLATNESS_FRAME).astype(np.float32)
+
+
+class QualityScore:
+    """Running quality measures of one take, updated as each chunk is generated.
+
+    rms is the mean of the chunk RMS values (the BAD_RMS_THRESHOLD gate); clip_ratio the
+    share of clipped samples; flatness the mean spectral flatness of the non-silent frames
+    (close to 0 for voiced speech, 1 for flat noise); silence_ratio the share of silent
+    20 ms windows. Chunk and window RMS come from the take's PcmBuffer.
+    """
+
+    def __init__(self):
+        self.chunks = 0
+        self.samples = 0
+        self._rms_sum = 0.0
+        self._clipped = 0
+        self._windows = 0
+        self._silent_windows = 0
+        self._flatness_sum = 0.0
+        self._frames = 0
+
+    def add(self, take: PcmBuffer, start: int, rms: float) -> float:
+        """Score the chunk appended to take at sample start, rms as returned by
+        PcmBuffer.append(). Returns rms."""
+        flat = take.view(start).reshape(-1)
+        self.chunks += 1
+        self.samples += len(flat)
+        self._rms_sum += rms
+        if len(flat) and (flat.max() >= CLIP_LEVEL or flat.min() <= -CLIP_LEVEL):
+            self._clipped += int(np.count_nonzero(np.abs(flat) >= CLIP_LEVEL))
+
+        win_rms = take.window_rms()
+        self._windows += len(win_rms)
+        self._silent_windows += int(np.count_nonzero(win_rms < SILENCE_RMS))
+
+        n = len(flat) // FLATNESS_FRAME
+        if n:
+            frames = flat[:n * FLATNESS_FRAME].reshape(n, FLATNESS_FRAME)
+            energy = np.einsum("ij,ij->i", frames, frames)
+            frames = frames[energy >= SILENCE_RMS * SILENCE_RMS * FLATNESS_FRAME]
+            if len(frames):
+                power = np.abs(np.fft.rfft(frames * _HANN, axis=1)) ** 2 + 1e-12
+                flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+                self._flatness_sum += float(np.sum(flatness))
+                self._frames += len(frames)
+        return rms
+
+    @property
+    def rms(self) -> float:
+        return self._rms_sum / self.chunks if self.chunks else 0.0
+
+    @property
+    def clip_ratio(self) -> float:
+        return self._clipped / self.samples if self.samples else 0.0
+
+    @property
+    def flatness(self) -> float | None:
+        return self._flatness_sum / self._frames if self._frames else None
+
+    @property
+    def silence_ratio(self) -> float:
+        return self._silent_windows / self._windows if self._windows else 0.0
+
+    def defect(self) -> str | None:
+        """What makes the take clearly bad so far, or None."""
+        if self.clip_ratio > ABORT_CLIP_RATIO:
+            return f"clipping {self.clip_ratio:.1%}"
+        if self.flatness is not None and self.flatness > ABORT_FLATNESS:
+            return f"noise (flatness {self.flatness:.2f})"
+        if self.rms > ABORT_RMS:
+            return f"rms {self.rms:.4f}"
+        if self.silence_ratio > ABORT_SILENCE_RATIO:
+            return f"silence {self.silence_ratio:.0%}"
+        return None
+
+    def abort_reason(self) -> str | None:
+        """defect(), once enough chunks were scored to give up on the take."""
+        return self.defect() if self.chunks >= EARLY_ABORT_CHUNKS else None
+
+    def passes(self) -> bool:
+        return self.rms < BAD_RMS_THRESHOLD and self.defect() is None
+
+    def summary(self) -> dict:
+        return {
+            "rms": round(self.rms, 4),
+            "clip_ratio": round(self.clip_ratio, 4),
+            "flatness": None if self.flatness is None else round(self.flatness, 4),
+            "silence_ratio": round(self.silence_ratio, 3),
+        }
+
+
+class Cancelled(Exception):
+    """Raised between chunks when the daemon asks the worker to stop."""
+
+
+def play_chunks(chunks, sr: int, should_stop=None):
+    """Play float32 chunks on the default output device (blocking).
+
+    should_stop, if given, is polled between chunks and ends playback early.
+    """
+    stream = sd.OutputStream(samplerate=sr, channels=1, dtype="float32")
+    stream.start()
+    try:
+        for chunk in chunks:
+            if should_stop is not None and should_stop():
                 break
-            continue
-        else:
-            silent_streak = 0
-        all_audio.append(chunk)
+            stream.write(chunk)
+    finally:
+        time.sleep(0.1)
+        stream.stop()
+        stream.close()
+
+
+class Generation:
+    """One request's generation, advanced one chunk at a time by step().
+
+    handle() runs a single Generation to completion. A worker serving several requests
+    at once interleaves the step() calls of its active generations instead: requests
+    join between two steps and leave as soon as their result is set. With a batched
+    model (jarvis.decoder) the generator yields results without audio (audio is None)
+    while the request is decoded with the others; step() then has nothing to do.
+    Arguments are those of handle().
+    """
 
-    avg_rms = float(np.mean(rms_values)) if rms_values else 0.0
-    return all_audio, avg_rms
+    def __init__(self, model, request: dict, on_chunk=None, on_audio=None, should_stop=None,
+                 trace=None):
+        self.result: dict | None = None
+        self.trace = trace or Trace(request.get("trace_id"), "handler")
+        self.attempt = 0
+        self.attempt_s = 0.0  # time spent inside step() (and batched steps) for the current attempt
+        self.on_chunk = on_chunk
+        self.on_audio = on_audio
+        self.should_stop = should_stop
+
+        text = request.get("text")
+        if not text or not text.strip():
+            self.result = {"status": "error", "message": "no text provided"}
+            return
+
+        text = sanitize_text(text)
+        language = request.get("language", "English")
+        instruct = request.get("instruct") or ""
+        self.streaming = on_chunk is not None
+        self.output_path = None if self.streaming else request.get("output")
+        self.output_format = request.get("format")
+        self.play_audio = self.output_path is None and not self.streaming
+        self._writer: AudioWriter | None = None  # of the current take, when writing to a file
+        self._written = 0  # samples of the current take already in the file
+        self._write_s = 0.0
+
+        max_tokens = max(256, min(4096, len(text) * 20))
+
+        self.gen_kwargs = {
+            "text": text,
+            "language": language,
+            "verbose": False,
+            "temperature": 0.7,
+            "repetition_penalty": 1.2,
+            "max_tokens": max_tokens,
+        }
+
+        is_custom_voice = getattr(model.config, "tts_model_type", "") == "custom_voice"
+        if is_custom_voice:
+            self.gen_kwargs["speaker"] = request.get("speaker") or model.supported_speakers[0]
+            self.gen_method = model.generate_custom_voice
+        else:
+            self.gen_kwargs["instruct"] = instruct
+            self.gen_method = model.generate_voice_design
+
+        self.max_chunks = max(50, len(text) * 5)
+        self.sr = model.sample_rate
+        self.max_attempts = 1 if self.streaming else MAX_RETRIES
+        self.capacity_s = max(5.0, len(text) * 0.1)  # first allocation of a take's PcmBuffer
+        self.best_audio: PcmBuffer | None = None  # the kept take
+        self.best_chunks = 0
+        self._take = PcmBuffer(self.sr, self.capacity_s)  # the current take
+        self._spare: PcmBuffer | None = None  # a former best take's buffer, reused by the next take
+        self.best_rms = float("inf")
+        self.passed = False  # the kept take passed the quality gate
+        self.aborted = 0  # takes given up on after their first chunks
+
+        log_kwargs = {k: v for k, v in self.gen_kwargs.items() if k != "text"}
+        print(f"[TTS] text={text!r} params={log_kwargs}", file=sys.stderr)
+
+        self.t0 = time.monotonic()
+        self._guard(self._start_attempt)
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def step(self):
+        """Generate the next chunk; ends the attempt (and maybe the request) when it runs out."""
+        if self.done:
+            return
+        t0 = time.monotonic()
+        try:
+            self._guard(self._next_chunk)
+        finally:
+            self.attempt_s += time.monotonic() - t0
+
+    def timed_out(self, timeout_s: float, retry: bool):
+        """The current attempt exceeded timeout_s: start it over, or end with an error."""
+        self._close(outcome="timeout")
+        if retry:
+            print(f"[TTS] timeout after {timeout_s}s, retrying", file=sys.stderr)
+            self._guard(self._start_attempt)
+        else:
+            self._discard_output()
+            self.result = {"status": "error", "message": f"generation timed out ({timeout_s}s)"}
+
+    def _guard(self, fn):
+        try:
+            fn()
+        except Cancelled:
+            self._close(outcome="cancelled")
+            self._discard_output()
+            print(f"[TTS] cancelled after {time.monotonic() - self.t0:.1f}s", file=sys.stderr)
+            self.result = {"status": "cancelled"}
+        except Exception as e:
+            self._close(outcome="error")
+            self._discard_output()
+            traceback.print_exc(file=sys.stderr)
+            self.result = {"status": "error", "message": str(e)}
+
+    def _close(self, outcome: str = "done"):
+        """Drop the current attempt's generator and record its span."""
+        gen = getattr(self, "_gen", None)
+        if gen is None:
+            return
+        del self._gen
+        self.trace.add("handler.attempt", self._attempt_t0, time.time(), attempt=self.attempt,
+                       outcome=outcome, chunks=self._chunks, busy_s=round(self.attempt_s, 3),
+                       **self._score.summary())
+        if hasattr(gen, "close"):
+            try:
+                gen.close()
+            except Exception:
+                pass
+
+    def _start_attempt(self):
+        self.attempt += 1
+        self.attempt_s = 0.0
+        self._attempt_t0 = time.time()
+        if self._take is self.best_audio:
+            self._take, self._spare = self._spare or PcmBuffer(self.sr, self.capacity_s), None
+        self._take.reset()
+        if self.output_path and self.output_path != "/dev/null":
+            self._discard_output()
+            self._writer = AudioWriter(self.output_path, self.sr, self.output_format)
+            self._written = 0
+        self._chunks = 0
+        self._score = QualityScore()
+        self._silent_streak = 0
+        self._index = 0
+        self._gen: Iterator = iter(self.gen_method(**self.gen_kwargs))
+
+    def _next_chunk(self):
+        if self.should_stop is not None and self.should_stop():
+            raise Cancelled()
+        if self._index >= self.max_chunks:
+            print(f"[TTS] chunk limit reached ({self.max_chunks})", file=sys.stderr)
+            return self._end_attempt()
+        try:
+            result = next(self._gen)
+        except StopIteration:
+            return self._end_attempt()
+        if result.audio is None:
+            return  # still being decoded in the worker's batch
+
+        i = self._index
+        self._index += 1
+        start = len(self._take)
+        rms = self._score.add(self._take, start, self._take.append(result.audio))
+        dur_ms = (len(self._take) - start) / self.sr * 1000
+        print(f"[TTS] chunk {i}: {dur_ms:.0f}ms rms={rms:.4f}", file=sys.stderr)
 
+        # Give up on a clearly bad take early, unless it is the last one we may make
+        reason = None if self.attempt >= self.max_attempts else self._score.abort_reason()
+        if reason:
+            print(f"[TTS] attempt {self.attempt}/{self.max_attempts} aborted after {i + 1} chunks: "
+                  f"{reason}, retrying...", file=sys.stderr)
+            self.aborted += 1
+            self._close(outcome="aborted")
+            return self._start_attempt()
+
+        if rms < SILENCE_RMS:
+            self._take.truncate(start)  # silent chunks are scored, not kept
+            self._silent_streak += 1
+            if self._silent_streak >= 3:
+                print(f"[TTS] stopping: {self._silent_streak} silent chunks in a row", file=sys.stderr)
+                return self._end_attempt()
+            return
+        self._silent_streak = 0
+        self._chunks += 1
+        if self.on_chunk is not None:
+            self.on_chunk(self._take.view(start))
+        self._flush()
+
+    def _flush(self):
+        """Write the current take to the file up to its trimmed end: what follows the last
+        loud window may still turn out to be trailing silence, it waits for the next chunk."""
+        end = self._take.trim_end()
+        if self._writer is None or end <= self._written:
+            return
+        t0 = time.monotonic()
+        self._writer.write(self._take.view(self._written, end))
+        self._written = end
+        self._write_s += time.monotonic() - t0
+
+    def _discard_output(self):
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.discard()
+
+    def _end_attempt(self):
+        score = self._score
+        avg_rms = score.rms
+        passed = score.passes()
+        self._close()
+        print(f"[TTS] attempt {self.attempt}/{self.max_attempts}: avg_rms={avg_rms:.4f} "
+              f"clip={score.clip_ratio:.4f} flatness={score.flatness or 0:.3f} "
+              f"silence={score.silence_ratio:.2f}", file=sys.stderr)
+
+        if self.streaming or passed:
+            self._keep(avg_rms)
+            self.passed = passed
+            return self._finish()
+
+        # Keep the best attempt so far
+        if avg_rms < self.best_rms:
+            self._keep(avg_rms)
+
+        if self.attempt >= self.max_attempts:
+            return self._finish()
+        reason = score.defect() or f"rms={avg_rms:.4f} >= {BAD_RMS_THRESHOLD}"
+        print(f"[TTS] bad quality ({reason}), retrying...", file=sys.stderr)
+        self._start_attempt()
+
+    def _keep(self, rms: float):
+        """Make the current take the best one; the previous best's buffer becomes the spare."""
+        self._spare, self.best_audio = self.best_audio, self._take
+        self.best_chunks = self._chunks
+        self.best_rms = rms
+
+    def _finish(self):
+        sr = self.sr
+        output_path = self.output_path
+        best = self.best_audio if self.best_chunks else None
+        elapsed = time.monotonic() - self.t0
+        total_dur = len(best) / sr if best else 0
+        print(f"[TTS] done: {self.best_chunks} chunks, {total_dur:.1f}s audio, {elapsed:.1f}s wall, rms={self.best_rms:.4f}", file=sys.stderr)
+
+        full_audio = None
+        if best and (self.on_audio is not None or (output_path and output_path != "/dev/null")):
+            with self.trace.span("handler.trim"):
+                full_audio = trim_trailing_silence(best, sr)
+            if self.on_audio is not None and len(full_audio):
+                self.on_audio(full_audio)
 
-def handle(model, request: dict) -> dict:
+        # Play audio
+        if self.play_audio and best:
+            with self.trace.span("handler.playback", audio_s=round(total_dur, 3)):
+                play_chunks(best.blocks(sr // 10), sr, self.should_stop)
+
+        # Finish the file: the kept take is the one being written, or an earlier one
+        if self._writer is not None:
+            t0 = time.monotonic()
+            fmt = self._writer.format
+            incremental = best is not None and best is self._take
+            if incremental:
+                self._flush()
+                self._writer.close()
+                self._writer = None
+            else:
+                self._discard_output()
+                if full_audio is not None:
+                    write_audio(output_path, full_audio, sr, self.output_format)
+            self._write_s += time.monotonic() - t0
+            end = time.time()
+            # one span for all the writes, chunk by chunk included
+            self.trace.add("handler.write", end - self._write_s, end, path=output_path,
+                           format=fmt, incremental=incremental)
+
+        self.result = {
+            "status": "ok",
+            "chunks": self.best_chunks,
+            "audio_s": round(total_dur, 3),
+            "generation_s": round(elapsed, 3),
+            "rms": round(self.best_rms, 4),
+            "attempts": self.attempt,
+            "aborted": self.aborted,
+            "passed": self.passed,
+        }
+
+
+def handle(model, request: dict, on_chunk=None, on_audio=None, should_stop=None,
+           trace=None) -> dict:
     """
     Generate audio from text and stream to speakers.
 
     Args:
         model: loaded MLX TTS model (owned by daemon, do not reload)
-        request: dict with keys: text, language, instruct, output
+        request: dict with keys: text, language, instruct, output, format (audio file
+            format, see jarvis.audiofile; the file is written as the chunks come)
+        on_chunk: optional callback receiving each float32 chunk as it is generated.
+            When set, nothing is played or saved and only one attempt is made
+            (chunks already sent to the client cannot be taken back by a retry).
+        on_audio: optional callback receiving the final trimmed utterance (float32, (n, 1))
+            once the best attempt is chosen, before playback. Used by the daemon's cache.
+        should_stop: optional callable polled between chunks; when it returns True the
+            request ends with status "cancelled" and nothing is played or saved.
+        trace: optional jarvis.trace.Trace collecting the attempt / trim / playback /
+            write spans of this request.
 
     Returns:
         dict with status info
     """
-    text = request.get("text")
-    if not text or not text.strip():
-        return {"status": "error", "message": "no text provided"}
-
-    text = sanitize_text(text)
-    language = request.get("language", "English")
-    instruct = request.get("instruct") or ""
-    output_path = request.get("output")
-    play_audio = output_path is None
-
-    max_tokens = max(256, min(4096, len(text) * 20))
-
-    gen_kwargs = {
-        "text": text,
-        "language": language,
-        "verbose": False,
-        "temperature": 0.7,
-        "repetition_penalty": 1.2,
-        "max_tokens": max_tokens,
-    }
-
-    is_custom_voice = getattr(model.config, "tts_model_type", "") == "custom_voice"
-    if is_custom_voice:
-        gen_kwargs["speaker"] = request.get("speaker") or model.supported_speakers[0]
-        gen_method = model.generate_custom_voice
-    else:
-        gen_kwargs["instruct"] = instruct
-        gen_method = model.generate_voice_design
-
-    max_chunks = max(50, len(text) * 5)
-    sr = model.sample_rate
-
-    log_kwargs = {k: v for k, v in gen_kwargs.items() if k != "text"}
-    print(f"[TTS] text={text!r} params={log_kwargs}", file=sys.stderr)
-
-    try:
-        t0 = time.monotonic()
-        best_audio = None
-        best_rms = float("inf")
-
-        for attempt in range(MAX_RETRIES):
-            all_audio, avg_rms = _generate_audio(gen_method, gen_kwargs, max_chunks, sr)
-            print(f"[TTS] attempt {attempt + 1}/{MAX_RETRIES}: avg_rms={avg_rms:.4f}", file=sys.stderr)
-
-            if avg_rms < BAD_RMS_THRESHOLD:
-                best_audio = all_audio
-                best_rms = avg_rms
-                break
-
-            # Keep the best attempt so far
-            if avg_rms < best_rms:
-                best_audio = all_audio
-                best_rms = avg_rms
-
-            print(f"[TTS] bad quality (rms={avg_rms:.4f} >= {BAD_RMS_THRESHOLD}), retrying...", file=sys.stderr)
-
-        all_audio = best_audio or []
-        elapsed = time.monotonic() - t0
-        total_samples = sum(len(c) for c in all_audio)
-        total_dur = total_samples / sr if all_audio else 0
-        print(f"[TTS] done: {len(all_audio)} chunks, {total_dur:.1f}s audio, {elapsed:.1f}s wall, rms={best_rms:.4f}", file=sys.stderr)
-
-        # Play audio
-        if play_audio and all_audio:
-            stream = sd.OutputStream(samplerate=sr, channels=1, dtype="float32")
-            stream.start()
-            try:
-                for chunk in all_audio:
-                    stream.write(chunk)
-            finally:
-                time.sleep(0.1)
-                stream.stop()
-                stream.close()
-
-        # Save to file if requested
-        if output_path and output_path != "/dev/null" and all_audio:
-            full_audio = np.concatenate(all_audio, axis=0)
-            full_audio = trim_trailing_silence(full_audio, sr)
-            sf.write(output_path, full_audio, sr)
-
-        return {"status": "ok"}
-
-    except Exception as e:
-        traceback.print_exc(file=sys.stderr)
-        return {"status": "error", "message": str(e)}
+    gen = Generation(model, request, on_chunk, on_audio, should_stop, trace)
+    while gen.result is None:
+        gen.step()
+    return gen.result
@@ -0,0 +1,95 @@
+"""Long texts — split into pieces the workers generate in parallel, stitched back in order.
+
+A text longer than PIECE_CHARS is cut at sentence ends, sentences still too long at
+clause punctuation, and as a last resort at a space; the cuts are then packed into
+pieces of up to PIECE_CHARS characters. The first piece is kept short
+(FIRST_PIECE_CHARS) so that the first audio is ready early while the rest generates.
+
+Stitcher joins the pieces' utterances as they arrive: each piece's trailing silence is
+trimmed (handlers.trim_trailing_silence keeps a short natural pause) and consecutive
+pieces overlap by a short linear crossfade, so seams don't click.
+"""
+
+import re
+
+import numpy as np
+
+from jarvis.handlers import trim_trailing_silence
+
+PIECE_CHARS = 250  # longest piece (~15 s of speech, well inside generation_timeout)
+FIRST_PIECE_CHARS = 100  # the first piece stays short: it decides the time to first audio
+CROSSFADE_MS = 10  # default overlap between consecutive pieces
+PIECE_SEP = "#"  # request id of piece i: f"{request id}#{i}"
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+CLAUSE_END = re.compile(r"(?<=[,;:—–])\s+")
+
+
+def _cuts(text: str, limit: int):
+    """Sentences of text; sentences longer than limit cut at clauses, then at spaces."""
+    for sentence in SENTENCE_END.split(text.strip()):
+        if len(sentence) <= limit:
+            yield sentence
+            continue
+        for clause in CLAUSE_END.split(sentence):
+            while len(clause) > limit:
+                cut = clause.rfind(" ", 0, limit)
+                if cut <= 0:
+                    cut = limit
+                yield clause[:cut].strip()
+                clause = clause[cut:].strip()
+            if clause:
+                yield clause
+
+
+def split_text(text: str, max_chars: int = PIECE_CHARS,
+               first_chars: int = FIRST_PIECE_CHARS) -> list[str]:
+    """Pieces of text in order. A text of up to max_chars is one piece, unchanged."""
+    if len(text) <= max_chars:
+        return [text]
+    pieces: list[str] = []
+    current = ""
+    for cut in _cuts(text, max_chars):
+        limit = max_chars if pieces else first_chars
+        if current and len(current) + 1 + len(cut) > limit:
+            pieces.append(current)
+            current = cut
+        else:
+            current = f"{current} {cut}" if current else cut
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+class Stitcher:
+    """Joins piece utterances in order, as they arrive.
+
+    add() takes the next piece and returns the samples ready to go out: the end of each
+    piece is held back until the next one arrives, to crossfade with its start. finish()
+    returns what is still held back after the last piece. Output is float32, (n, 1).
+    """
+
+    def __init__(self, sr: int, crossfade_ms: float = CROSSFADE_MS, trim: bool = True):
+        self.sr = sr
+        self.fade = max(0, int(sr * crossfade_ms / 1000))
+        self.trim = trim
+        self._tail = np.zeros(0, dtype=np.float32)
+
+    def add(self, pcm: np.ndarray) -> np.ndarray:
+        pcm = np.asarray(pcm, dtype=np.float32).reshape(-1)
+        if self.trim:
+            pcm = trim_trailing_silence(pcm, self.sr)
+        n = min(len(self._tail), len(pcm))
+        if n:
+            ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)
+            seam = self._tail[len(self._tail) - n:] * (1.0 - ramp) + pcm[:n] * ramp
+            pcm = np.concatenate([self._tail[:len(self._tail) - n], seam, pcm[n:]])
+        else:
+            pcm = np.concatenate([self._tail, pcm])
+        keep = min(self.fade, len(pcm))
+        self._tail = pcm[len(pcm) - keep:]
+        return pcm[:len(pcm) - keep].reshape(-1, 1)
+
+    def finish(self) -> np.ndarray:
+        tail, self._tail = self._tail, np.zeros(0, dtype=np.float32)
+        return tail.reshape(-1, 1)
@@ -0,0 +1,168 @@
+"""Daemon metrics — counters and fixed-bucket histograms, served by the `metrics` action.
+
+Histograms keep per-bucket counts only (constant memory, cheap to observe from the
+event loop); quantiles are estimated by linear interpolation inside the bucket, the
+way Prometheus does it.
+"""
+
+import bisect
+import time
+from collections import Counter
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60, 120)  # seconds
+RTF_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10)  # generation time / audio time
+RETRY_BUCKETS = (0, 1, 2, 3, 5)  # extra attempts per request
+
+# Service-time model: generation seconds = base + per_char * characters, per language
+SERVICE_DECAY = 0.98  # weight kept by past observations at each new one
+SERVICE_MIN_SAMPLES = 3  # observations before the fit replaces the prior
+PRIOR_BASE_S = 0.5  # prior until then (doc/Latency.md: 28 chars in ~1.1 s)
+PRIOR_PER_CHAR_S = 0.04
+
+
+class Histogram:
+    """Counts of observed values per bucket (upper bounds inclusive, plus +inf)."""
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max: float | None = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> float | None:
+        if self.max is None:  # nothing observed yet
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.bounds):
+                    return self.max
+                lower = self.bounds[i - 1] if i else min(0.0, self.bounds[0])
+                upper = min(self.bounds[i], self.max)
+                return lower + (upper - lower) * max(0.0, rank - seen) / n
+            seen += n
+        return self.max
+
+    def snapshot(self) -> dict:
+        def r(v):
+            return None if v is None else round(v, 4)
+
+        return {
+            "count": self.count,
+            "mean": r(self.sum / self.count) if self.count else None,
+            "p50": r(self.quantile(0.5)),
+            "p90": r(self.quantile(0.9)),
+            "p99": r(self.quantile(0.99)),
+            "max": r(self.max),
+            "buckets": [[b, n] for b, n in zip(self.bounds + ("+inf",), self.counts)],
+        }
+
+
+class ServiceTime:
+    """Online estimate of a model's generation time from text length, per language.
+
+    Least-squares fit of seconds = base + per_char * chars over exponentially decayed
+    sums, so the estimate follows the machine's current speed (and load). The prior is
+    used until a language has SERVICE_MIN_SAMPLES observations; a fit whose intercept
+    or slope comes out negative falls back to a line through the origin.
+    """
+
+    def __init__(self, model_id: str):
+        self.model_id = model_id
+        # language -> [n, sum x, sum y, sum xx, sum xy], decayed
+        self._sums: dict[str, list[float]] = {}
+        self.samples: dict[str, int] = {}  # language -> observations
+
+    def observe(self, language: str, chars: int, seconds: float):
+        sums = self._sums.setdefault(language, [0.0] * 5)
+        for i, v in enumerate((1.0, chars, seconds, chars * chars, chars * seconds)):
+            sums[i] = sums[i] * SERVICE_DECAY + v
+        self.samples[language] = self.samples.get(language, 0) + 1
+
+    def fit(self, language: str) -> tuple[float, float]:
+        """(base_s, per_char_s) for the language."""
+        if self.samples.get(language, 0) < SERVICE_MIN_SAMPLES:
+            return PRIOR_BASE_S, PRIOR_PER_CHAR_S
+        n, sx, sy, sxx, sxy = self._sums[language]
+        det = n * sxx - sx * sx
+        if det > 1e-9 * n * sxx:
+            slope = (n * sxy - sx * sy) / det
+            base = (sy - slope * sx) / n
+            if slope >= 0 and base >= 0:
+                return base, slope
+        return 0.0, (sxy / sxx if sxx else PRIOR_PER_CHAR_S)
+
+    def predict(self, language: str, chars: int) -> float:
+        base, per_char = self.fit(language)
+        return base + per_char * chars
+
+    def snapshot(self) -> dict:
+        out = {}
+        for language, samples in self.samples.items():
+            base, per_char = self.fit(language)
+            out[language] = {"base_s": round(base, 3), "per_char_s": round(per_char, 4),
+                             "samples": samples}
+        return {"model": self.model_id, "languages": out}
+
+
+class Metrics:
+    """Daemon-wide request counters and latency histograms."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counters: Counter[str] = Counter()
+        self.histograms = {
+            "queue_wait_s": Histogram(LATENCY_BUCKETS),
+            "first_chunk_s": Histogram(LATENCY_BUCKETS),
+            "generation_s": Histogram(LATENCY_BUCKETS),
+            "rtf": Histogram(RTF_BUCKETS),
+            "retries": Histogram(RETRY_BUCKETS),
+            "handler_reload_s": Histogram(LATENCY_BUCKETS),
+        }
+
+    def observe(self, name: str, value: float):
+        self.histograms[name].observe(value)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def record_result(self, result: dict):
+        """Count a finished generate request and observe its worker-side timings."""
+        status = result.get("status", "error")
+        self.count(f"requests_{status}")
+        if result.get("cached"):
+            self.count("cache_hits")
+        if status != "ok" or result.get("cached"):
+            return
+        gen_s = result.get("generation_s")
+        audio_s = result.get("audio_s")
+        if gen_s is not None:
+            self.observe("generation_s", gen_s)
+            if audio_s:
+                self.observe("rtf", gen_s / audio_s)
+        if result.get("attempts"):
+            self.observe("retries", result["attempts"] - 1)
+        if result.get("aborted"):
+            self.count("takes_aborted", result["aborted"])
+
+    def record_trace(self, spans):
+        """Observe the handler reloads a request's workers went through."""
+        for span in spans:
+            if span["name"] == "worker.reload":
+                self.count("handler_reloads")
+                self.observe("handler_reload_s", span["dur"])
+
+    def snapshot(self) -> dict:
+        return {
+            "uptime_s": round(time.monotonic() - self.started, 1),
+            "counters": dict(self.counters),
+            "histograms": {name: h.snapshot() for name, h in self.histograms.items()},
+        }
@@ -408,13 +408,20 @@ async def stream_gemini(
 # TTS helper
 # ---------------------------------------------------------------------------
 
+_tts_client = None  # persistent daemon connection, opened on first use
+
+
 def _tts_speak(text: str, language: str):
+    global _tts_client
     try:
-        from jarvis.cli import send_request
-        send_request({
+        from jarvis.cli import DaemonClient
+        if _tts_client is None:
+            _tts_client = DaemonClient()
+        _tts_client.request({
             "action": "generate",
             "text": text,
             "language": language,
+            "priority": "normal",
         })
     except Exception as e:
         print(f"  TTS error: {e}", file=sys.stderr)
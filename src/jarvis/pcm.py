@@ -0,0 +1,144 @@
+"""Growable PCM buffer — one take's audio accumulated in place, with its energy per 20 ms window.
+
+Chunks are copied into preallocated spare capacity (doubled when it runs out), and the
+sum of squares of every 20 ms window is updated as they arrive, window by window, without
+squaring the chunk into a temporary. The loudness facts later steps need — chunk RMS,
+RMS of the windows a chunk completed, where the last loud window ends — are then read
+from the window energies: trimming trailing silence is an index lookup, and the
+utterance is a view of the buffer, never a concatenation of its chunks.
+"""
+
+import numpy as np
+
+WINDOW_S = 0.02  # energy window (trim_trailing_silence, silence ratio)
+SILENCE_RMS = 0.02  # window RMS at or below which a window counts as quiet when trimming
+
+
+class PcmBuffer:
+    """Mono float32 samples plus the sum of squares of each WINDOW_S window.
+
+    append() returns the chunk's RMS; window_rms() gives the RMS of the windows it
+    completed. view() and trimmed() are views, valid until the buffer grows again.
+    """
+
+    def __init__(self, sr: int, capacity_s: float = 10.0, silence_rms: float = SILENCE_RMS):
+        self.sr = sr
+        self.silence_rms = silence_rms
+        self.win = max(1, int(sr * WINDOW_S))
+        self.length = 0
+        self._pcm = np.empty(max(self.win, int(sr * capacity_s)), dtype=np.float32)
+        self._energy = np.zeros(len(self._pcm) // self.win + 1, dtype=np.float64)
+        self._loud = silence_rms * silence_rms * self.win  # window energy above which it is loud
+        self._last_loud = -1  # index of the last complete loud window
+        self._completed = (0, 0)  # windows completed by the last append
+
+    def __len__(self) -> int:
+        return self.length
+
+    def reset(self):
+        """Empty the buffer, keeping its allocation (next take of the same request)."""
+        self._energy[:self.length // self.win + 1] = 0.0
+        self.length = 0
+        self._last_loud = -1
+        self._completed = (0, 0)
+
+    def _reserve(self, n: int):
+        if n <= len(self._pcm):
+            return
+        pcm = np.empty(max(n, 2 * len(self._pcm)), dtype=np.float32)
+        pcm[:self.length] = self._pcm[:self.length]
+        energy = np.zeros(len(pcm) // self.win + 1, dtype=np.float64)
+        energy[:len(self._energy)] = self._energy
+        self._pcm, self._energy = pcm, energy
+
+    def append(self, chunk) -> float:
+        """Copy a chunk (any shape) in and update the window energies. Returns its RMS."""
+        flat = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        n = len(flat)
+        start = self.length
+        self._completed = (start // self.win, start // self.win)
+        if not n:
+            return 0.0
+        self._reserve(start + n)
+        x = self._pcm[start:start + n]
+        x[:] = flat
+
+        win = self.win
+        head = min(n, -start % win)  # samples completing the window already started
+        body = (n - head) // win * win
+        total = 0.0
+        if head:
+            e = float(np.dot(x[:head], x[:head]))
+            self._energy[start // win] += e
+            total += e
+        if body:
+            frames = x[head:head + body].reshape(-1, win)
+            first = (start + head) // win
+            energies = np.einsum("ij,ij->i", frames, frames)
+            self._energy[first:first + len(frames)] = energies
+            total += float(energies.sum())
+        if head + body < n:
+            rest = x[head + body:]
+            e = float(np.dot(rest, rest))
+            self._energy[(start + head + body) // win] = e
+            total += e
+
+        self.length = start + n
+        a, b = start // win, self.length // win
+        self._completed = (a, b)
+        if b > a:
+            loud = np.flatnonzero(self._energy[a:b] > self._loud)
+            if len(loud):
+                self._last_loud = a + int(loud[-1])
+        return float(np.sqrt(total / n))
+
+    def truncate(self, length: int):
+        """Drop the samples past length (e.g. a chunk that turned out silent)."""
+        if length >= self.length:
+            return
+        win = self.win
+        first = length // win
+        self._energy[first:self.length // win + 1] = 0.0
+        if length > first * win:
+            part = self._pcm[first * win:length]
+            self._energy[first] = float(np.dot(part, part))
+        self.length = length
+        if self._last_loud >= first:
+            loud = np.flatnonzero(self._energy[:first] > self._loud)
+            self._last_loud = int(loud[-1]) if len(loud) else -1
+        self._completed = (first, first)
+
+    def window_rms(self) -> np.ndarray:
+        """RMS of the windows the last append completed."""
+        a, b = self._completed
+        return np.sqrt(self._energy[a:b] / self.win)
+
+    def view(self, start: int = 0, end: int | None = None) -> np.ndarray:
+        """Samples [start, end) (end: all so far), shape (n, 1), without copy."""
+        end = self.length if end is None else min(end, self.length)
+        return self._pcm[start:end].reshape(-1, 1)
+
+    def trim_end(self, min_silence_s: float = 0.15, threshold: float | None = None) -> int:
+        """End of the audio once trailing silence is trimmed: the last loud window, plus
+        min_silence_s of what follows it. 0 if no complete window is loud.
+
+        threshold is the window RMS above which a window is loud; other than silence_rms,
+        the window energies are scanned instead of using the tracked last loud window.
+        """
+        last = self._last_loud
+        if threshold is not None and threshold != self.silence_rms:
+            energy = self._energy[:self.length // self.win]
+            loud = np.flatnonzero(energy > threshold * threshold * self.win)
+            last = int(loud[-1]) if len(loud) else -1
+        if last < 0:
+            return 0
+        return min((last + 1) * self.win + int(self.sr * min_silence_s), self.length)
+
+    def trimmed(self, min_silence_s: float = 0.15, threshold: float | None = None) -> np.ndarray:
+        """The audio without its trailing silence, shape (n, 1), without copy."""
+        return self._pcm[:self.trim_end(min_silence_s, threshold)].reshape(-1, 1)
+
+    def blocks(self, size: int):
+        """The audio as consecutive views of up to size samples (playback)."""
+        for i in range(0, self.length, size):
+            yield self._pcm[i:min(i + size, self.length)].reshape(-1, 1)
@@ -0,0 +1,185 @@
+"""Central playback service — the daemon's one output stream to the speakers.
+
+Workers no longer play audio: requests without "output" get their utterance sent back
+to the main process, which hands it to the Player. The Player keeps a single
+sd.OutputStream open for the daemon's lifetime and feeds it from its callback, so
+consecutive utterances play back to back with no device open/close between them.
+
+Order is the order requests arrived in, not the order their generations finished: a
+request reserves a ticket on arrival, and the callback plays tickets strictly in turn,
+waiting (in silence) for one still generating. Tickets of requests that end without
+audio are released and skipped.
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+import sounddevice as sd
+
+from jarvis import protocol
+
+
+class Utterance:
+    """Audio waiting for (or in) playback, and the future resolved when it's over."""
+
+    __slots__ = ("request_id", "pcm", "pos", "done")
+
+    def __init__(self, request_id, pcm: np.ndarray):
+        self.request_id = request_id
+        self.pcm = pcm
+        self.pos = 0
+        self.done: Future[bool] = Future()
+
+
+class Player:
+    """One persistent output stream playing utterances in ticket order.
+
+    reserve() a ticket when a request arrives, then either submit() its audio (returns a
+    concurrent Future set to True once played, False if cut short) or release() it.
+    cancel() stops the utterances of some requests, queued or playing.
+
+    Counters: underflows (the device ran dry, reported by PortAudio) and gaps (an
+    utterance ended while the next ticket was still generating).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stream = None
+        self.sample_rate = 0  # set when the stream opens
+        self._tickets = 0
+        self._order: deque[int] = deque()  # tickets not played yet, in arrival order
+        self._owners: dict[int, str] = {}  # ticket -> request id
+        self._ready: dict[int, Utterance] = {}
+        self._current: Utterance | None = None  # being played
+        self.played = 0
+        self.played_s = 0.0
+        self.interrupted = 0
+        self.underflows = 0
+        self.gaps = 0
+
+    def reserve(self, request_id) -> int:
+        with self._lock:
+            self._tickets += 1
+            self._order.append(self._tickets)
+            self._owners[self._tickets] = request_id
+            return self._tickets
+
+    def release(self, ticket: int):
+        """Give up a ticket that won't get audio (failed, cancelled, nothing generated)."""
+        with self._lock:
+            if ticket in self._owners and ticket not in self._ready:
+                self._order.remove(ticket)
+                del self._owners[ticket]
+
+    def submit(self, ticket: int, pcm: np.ndarray, sr: int) -> Future:
+        """Queue a ticket's audio. Opens the stream at the first utterance's rate."""
+        if self._stream is None:
+            self._open(sr)
+        if sr != self.sample_rate:
+            pcm, _ = protocol.convert(pcm, sr, "float32", self.sample_rate)
+        with self._lock:
+            if ticket not in self._owners:
+                utterance = Utterance(None, pcm)
+                utterance.done.set_result(False)  # cancelled before its audio arrived
+                return utterance.done
+            pcm = np.ascontiguousarray(pcm, dtype=np.float32).reshape(-1)
+            utterance = Utterance(self._owners[ticket], pcm)
+            self._ready[ticket] = utterance
+            return utterance.done
+
+    def cancel(self, request_ids) -> int:
+        """Stop the utterances of these requests. Returns how many were dropped."""
+        ids = set(request_ids)
+        dropped = 0
+        with self._lock:
+            if self._current is not None and self._current.request_id in ids:
+                self._finish(self._current, False)
+                dropped += 1
+            for ticket in [t for t in self._order if self._owners[t] in ids]:
+                self._order.remove(ticket)
+                del self._owners[ticket]
+                utterance = self._ready.pop(ticket, None)
+                if utterance is not None:
+                    utterance.done.set_result(False)
+                    self.interrupted += 1
+                    dropped += 1
+        return dropped
+
+    def _open(self, sr: int):
+        with self._lock:
+            if self._stream is not None:
+                return
+            self.sample_rate = sr
+            self._stream = sd.OutputStream(samplerate=sr, channels=1, dtype="float32",
+                                           callback=self._callback)
+            self._stream.start()
+
+    def _finish(self, utterance: Utterance, played: bool):
+        """End the current utterance (lock held)."""
+        self._current = None
+        if played:
+            self.played += 1
+            self.played_s += len(utterance.pcm) / self.sample_rate
+        else:
+            self.interrupted += 1
+        utterance.done.set_result(played)
+
+    def _next(self) -> Utterance | None:
+        """Move the next ready ticket into playback (lock held). None if there is none."""
+        if not self._order or self._order[0] not in self._ready:
+            return None
+        ticket = self._order.popleft()
+        del self._owners[ticket]
+        self._current = self._ready.pop(ticket)
+        return self._current
+
+    def _callback(self, outdata, frames, time_info, status):
+        if status.output_underflow:
+            self.underflows += 1
+        out = outdata[:, 0]
+        filled = 0
+        with self._lock:
+            while filled < frames:
+                u = self._current or self._next()
+                if u is None:
+                    break
+                n = min(frames - filled, len(u.pcm) - u.pos)
+                out[filled:filled + n] = u.pcm[u.pos:u.pos + n]
+                u.pos += n
+                filled += n
+                if u.pos >= len(u.pcm):
+                    self._finish(u, True)
+                    if self._order and self._order[0] not in self._ready:
+                        self.gaps += 1
+        out[filled:] = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open": self._stream is not None,
+                "sample_rate": self.sample_rate or None,
+                "playing": self._current is not None,
+                "queued": len(self._order),
+                "played": self.played,
+                "played_s": round(self.played_s, 1),
+                "interrupted": self.interrupted,
+                "underflows": self.underflows,
+                "gaps": self.gaps,
+            }
+
+    def close(self):
+        """Stop the stream; utterances still queued resolve as not played."""
+        with self._lock:
+            stream, self._stream = self._stream, None
+            if self._current is not None:
+                self._finish(self._current, False)
+            for utterance in self._ready.values():
+                utterance.done.set_result(False)
+            self._ready.clear()
+            self._order.clear()
+            self._owners.clear()
+        if stream is not None:
+            stream.stop()
+            stream.close()
@@ -0,0 +1,144 @@
+"""Wire format shared by the daemon and its clients.
+
+Every message is a frame: [4 bytes: payload length, big-endian uint32][payload].
+The payload is either
+
+  - JSON (UTF-8 object, always starts with "{"), used for requests and control replies;
+  - an audio frame, used for replies that carry PCM when the client asked for it:
+
+      [16 bytes: header][meta_len bytes: JSON object][raw PCM, little-endian, mono]
+
+    header = magic b"JPCM", version, sample format code, channels, reserved,
+             sample rate (uint32), meta_len (uint32), all little-endian.
+
+Clients opt in per request with "wire": "binary" and may negotiate the sample format
+("sample_format": "int16" | "float32", default float32) and rate ("sample_rate",
+default the model's native rate). Without "wire": "binary" the same audio goes out
+as base64 in a JSON message, in the negotiated format too.
+
+numpy is imported lazily so that the CLI stays quick to start for control commands.
+"""
+
+import json
+import struct
+
+MAGIC = b"JPCM"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBxII")
+
+# name -> (header code, numpy dtype)
+SAMPLE_FORMATS = {
+    "int16": (1, "<i2"),
+    "float32": (2, "<f4"),
+}
+_FORMAT_BY_CODE = {code: (name, dtype) for name, (code, dtype) in SAMPLE_FORMATS.items()}
+
+
+class ProtocolError(ValueError):
+    """A frame or an audio format negotiation that can't be honoured."""
+
+
+# ---------------------------------------------------------------------------
+# Framing
+# ---------------------------------------------------------------------------
+
+def frame(payload: bytes) -> bytes:
+    return struct.pack("!I", len(payload)) + payload
+
+
+def encode_json(msg: dict) -> bytes:
+    """A complete JSON frame, length prefix included."""
+    return frame(json.dumps(msg).encode("utf-8"))
+
+
+def encode_audio(meta: dict, pcm, sample_rate: int, sample_format: str = "float32") -> bytes:
+    """A complete audio frame: header + JSON meta + raw PCM already in `sample_format`."""
+    import numpy as np
+
+    code, dtype = SAMPLE_FORMATS[sample_format]
+    meta_bytes = json.dumps(meta).encode("utf-8")
+    data = np.ascontiguousarray(pcm, dtype=dtype).reshape(-1)
+    header = HEADER.pack(MAGIC, VERSION, code, 1, sample_rate, len(meta_bytes))
+    size = len(header) + len(meta_bytes) + data.nbytes
+    return b"".join((struct.pack("!I", size), header, meta_bytes, memoryview(data).cast("B")))
+
+
+def decode(payload: bytes | bytearray) -> dict:
+    """Decode a frame payload (length prefix stripped).
+
+    Audio frames come back as their meta dict plus "sample_rate", "dtype" and "pcm",
+    a numpy view over the received buffer (no copy).
+    """
+    if not payload.startswith(MAGIC):
+        reply: dict = json.loads(payload.decode("utf-8"))
+        return reply
+
+    import numpy as np
+
+    if len(payload) < HEADER.size:
+        raise ProtocolError("truncated audio frame header")
+    _, version, code, channels, sample_rate, meta_len = HEADER.unpack_from(payload)
+    if version != VERSION:
+        raise ProtocolError(f"unsupported audio frame version {version}")
+    if code not in _FORMAT_BY_CODE:
+        raise ProtocolError(f"unknown sample format code {code}")
+    name, dtype = _FORMAT_BY_CODE[code]
+    start = HEADER.size + meta_len
+    msg: dict = json.loads(payload[HEADER.size:start].decode("utf-8"))
+    pcm = np.frombuffer(payload, dtype=dtype, offset=start)
+    msg.update({"sample_rate": sample_rate, "dtype": name, "channels": channels, "pcm": pcm})
+    return msg
+
+
+# ---------------------------------------------------------------------------
+# Format negotiation
+# ---------------------------------------------------------------------------
+
+def negotiate(request: dict) -> tuple[bool, str, int | None]:
+    """Audio delivery asked for by a request: (binary, sample_format, sample_rate).
+
+    sample_rate is None to keep the model's rate. Raises ProtocolError on values
+    the daemon can't produce.
+    """
+    wire = request.get("wire", "json")
+    if wire not in ("json", "binary"):
+        raise ProtocolError(f"unknown wire format: {wire}")
+    sample_format = request.get("sample_format") or "float32"
+    if sample_format not in SAMPLE_FORMATS:
+        raise ProtocolError(f"unknown sample format: {sample_format} "
+                            f"(expected {', '.join(SAMPLE_FORMATS)})")
+    sample_rate = request.get("sample_rate")
+    if sample_rate is not None:
+        sample_rate = int(sample_rate)
+        if not 8000 <= sample_rate <= 192000:
+            raise ProtocolError(f"unsupported sample rate: {sample_rate}")
+    return wire == "binary", sample_format, sample_rate
+
+
+def convert(pcm, sr: int, sample_format: str = "float32", sample_rate: int | None = None):
+    """Resample (linear) and quantize float32 PCM for the client. Returns (pcm, rate)."""
+    import numpy as np
+
+    flat = np.asarray(pcm, dtype=np.float32).reshape(-1)
+    if sample_rate and sample_rate != sr and len(flat):
+        n_out = max(1, round(len(flat) * sample_rate / sr))
+        positions = np.arange(n_out, dtype=np.float64) * (sr / sample_rate)
+        flat = np.interp(positions, np.arange(len(flat)), flat).astype(np.float32)
+        sr = sample_rate
+    if sample_format == "int16":
+        flat = (np.clip(flat, -1.0, 1.0) * 32767.0).astype("<i2")
+    return flat, sr
+
+
+def to_float32(msg: dict):
+    """PCM of a received audio message (binary or base64 JSON) as float32, shape (n, 1)."""
+    import numpy as np
+
+    pcm = msg.get("pcm")
+    if pcm is None:
+        import base64
+        _, dtype = SAMPLE_FORMATS[msg.get("dtype", "float32")]
+        pcm = np.frombuffer(base64.b64decode(msg["audio"]), dtype=dtype)
+    if pcm.dtype.kind == "i":
+        pcm = pcm.astype(np.float32) / 32768.0
+    return pcm.astype(np.float32, copy=False).reshape(-1, 1)
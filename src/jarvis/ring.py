@@ -0,0 +1,106 @@
+"""Shared-memory PCM ring buffer — moves audio from a worker process to the daemon.
+
+One ring per worker. The worker (single producer) copies float32 samples in and sends a
+small (pos, length) descriptor over its result queue; the daemon (single consumer) copies
+the samples out and advances the read cursor stored in the segment header, which is what
+the producer waits on when the ring is full.
+
+Layout: [8 bytes: read cursor, uint64 sample count][capacity float32 samples]
+Cursors are monotonic sample counts; the slot of sample `pos` is `pos % capacity`.
+"""
+
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+HEADER_BYTES = 8
+DEFAULT_CAPACITY = 24000 * 60  # 60 s of audio at 24 kHz (~5.8 MB per worker)
+
+
+class AudioRing:
+    """Single-producer / single-consumer float32 ring in POSIX shared memory."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._owner = owner
+        self.capacity = (shm.size - HEADER_BYTES) // 4
+        self._read_pos = np.ndarray((1,), dtype=np.uint64, buffer=shm.buf, offset=0)
+        self._data = np.ndarray((self.capacity,), dtype=np.float32, buffer=shm.buf,
+                                offset=HEADER_BYTES)
+        self._write_pos = int(self._read_pos[0])
+
+    @classmethod
+    def create(cls, capacity: int = DEFAULT_CAPACITY) -> "AudioRing":
+        """Allocate a new ring (daemon side)."""
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + capacity * 4)
+        ring = cls(shm, owner=True)
+        ring._read_pos[0] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name: str) -> "AudioRing":
+        """Map an existing ring by name (worker side)."""
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    # -- producer ------------------------------------------------------------
+
+    def write(self, pcm: np.ndarray, timeout: float = 5.0) -> tuple[int, int] | None:
+        """Copy samples into the ring. Returns (pos, length), or None if they don't fit.
+
+        Blocks while the consumer has not yet released enough space. Returns None
+        (caller falls back to pickling) if the chunk is larger than the ring or the
+        consumer doesn't catch up within `timeout`.
+        """
+        flat = pcm.reshape(-1)
+        n = len(flat)
+        if n > self.capacity:
+            return None
+
+        deadline = time.monotonic() + timeout
+        while self._write_pos + n - int(self._read_pos[0]) > self.capacity:
+            if time.monotonic() > deadline:
+                return None
+            time.sleep(0.001)
+
+        pos = self._write_pos
+        start = pos % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = flat[:first]
+        if first < n:
+            self._data[:n - first] = flat[first:]
+        self._write_pos = pos + n
+        return pos, n
+
+    # -- consumer ------------------------------------------------------------
+
+    def read(self, pos: int, n: int) -> np.ndarray:
+        """Copy `n` samples written at `pos` out of the ring and release their space."""
+        start = pos % self.capacity
+        first = min(n, self.capacity - start)
+        if first == n:
+            out = self._data[start:start + n].copy()
+        else:
+            out = np.concatenate((self._data[start:], self._data[:n - first]))
+        self.release(pos, n)
+        return out
+
+    def release(self, pos: int, n: int):
+        """Mark samples up to pos + n as consumed without reading them."""
+        self._read_pos[0] = pos + n
+
+    def close(self):
+        """Unmap the segment; the owner also unlinks it."""
+        # Drop numpy views first, SharedMemory.close() refuses while buffers are exported
+        self._read_pos = np.empty(0, dtype=np.uint64)
+        self._data = np.empty(0, dtype=np.float32)
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
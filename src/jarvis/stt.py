@@ -3,7 +3,9 @@
 import json
 import queue
 import sys
+import threading
 import time
+from collections import deque
 
 import numpy as np
 import mlx.core as mx
@@ -14,9 +16,16 @@ import rustymimi
 from huggingface_hub import hf_hub_download
 from moshi_mlx import models, utils
 
+from jarvis.metrics import Histogram
+
 
 SAMPLE_RATE = 24000
 BLOCK_SIZE = 1920  # 80ms chunks
+MIC_RING_BLOCKS = 32  # ~2.5 s of mic audio the encoder may fall behind by before blocks are dropped
+WARMUP_FRAMES = 4  # silent frames through the codec before the first real one (as moshi_mlx/local.py)
+ENCODE_POLL_S = 0.002  # StreamTokenizer has no blocking read: poll interval while a frame is encoding
+PAD_TOKENS = (0, 3)  # text tokens that carry no text
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.04, 0.08, 0.16, 0.32, 0.64)  # seconds
 
 
 def load_model(hf_repo="kyutai/stt-1b-en_fr-mlx", max_steps=4000):
@@ -106,163 +115,243 @@ def reset(bundle):
     )
 
 
-def listen(bundle, duration=None):
-    """Capture mic and transcribe in real-time. Prints text to stdout."""
-    gen = bundle["gen"]
-    text_tokenizer = bundle["text_tokenizer"]
-    audio_tokenizer = bundle["audio_tokenizer"]
-    ct = bundle["ct"]
-    other_codebooks = bundle["other_codebooks"]
-
-    input_queue = queue.Queue()
-    running = True
+# ---------------------------------------------------------------------------
+# Streaming pipeline: mic ring -> encoder stage -> step stage
+# ---------------------------------------------------------------------------
 
-    def on_input(in_data, frames, time_info, status):
-        if running:
-            input_queue.put_nowait(in_data[:, 0].astype(np.float32).copy())
+class MicRing:
+    """Preallocated ring of mic blocks: the sounddevice callback writes, the encoder reads.
 
-    # Warmup audio tokenizer (4 silent frames, like moshi_mlx/local.py)
-    for _ in range(4):
-        silence = np.zeros(BLOCK_SIZE, dtype=np.float32)
-        audio_tokenizer.encode(silence)
-        while True:
-            time.sleep(0.001)
-            data = audio_tokenizer.get_encoded()
-            if data is not None:
-                break
+    The callback copies into a free slot and never allocates. A block that finds the ring
+    full is dropped (counted in overruns) rather than overwriting one still being read.
+    """
 
-    print("Listening... (Ctrl+C to stop)", file=sys.stderr, flush=True)
-    start_time = time.time()
-    step = 0
+    def __init__(self, blocks: int = MIC_RING_BLOCKS, block_size: int = BLOCK_SIZE):
+        self._buf = np.zeros((blocks, block_size), dtype=np.float32)
+        self._stamps = np.zeros(blocks)  # capture time of each block (perf_counter)
+        self._read = 0
+        self._write = 0
+        self._cond = threading.Condition()
+        self.closed = False
+        self.overruns = 0
+
+    def put(self, in_data: np.ndarray):
+        with self._cond:
+            if self._write - self._read >= len(self._buf):
+                self.overruns += 1
+                return
+            slot = self._write % len(self._buf)
+            n = min(len(in_data), self._buf.shape[1])
+            self._buf[slot, :n] = in_data[:n, 0]
+            self._buf[slot, n:] = 0.0
+            self._stamps[slot] = time.perf_counter()
+            self._write += 1
+            self._cond.notify()
+
+    def peek(self, timeout: float):
+        """(oldest unread block, capture time), waiting up to timeout; None if there is none.
+        The block is a view of the ring, valid until release()."""
+        with self._cond:
+            if timeout and self._write == self._read:
+                self._cond.wait_for(lambda: self._write > self._read or self.closed, timeout)
+            if self._write == self._read:
+                return None
+            slot = self._read % len(self._buf)
+            return self._buf[slot], float(self._stamps[slot])
+
+    def release(self):
+        with self._cond:
+            self._read += 1
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class SttPipeline:
+    """One listening session: mic, codec and language model as pipeline stages.
+
+    The encoder thread takes mic blocks from the MicRing and runs them through the
+    StreamTokenizer; tokens() steps LmGen on each encoded frame in the caller's thread
+    (MLX, which is not thread-safe, is only used there).
+    While the model steps on frame N, the codec is already encoding N+1. Stages wait on
+    each other (ring condition, frame queue) instead of sleeping; the only polling left
+    is on get_encoded(), which has no blocking form, and only while a frame is in the codec.
+
+    Per-stage latencies (capture: mic block waiting for the encoder; encode: codec;
+    handoff: encoded frame waiting for the model; step: LmGen.step) are in stats(), and in
+    bundle["timings"] once the session ends.
+    """
 
-    with sd.InputStream(samplerate=SAMPLE_RATE, channels=1,
-                        blocksize=BLOCK_SIZE, callback=on_input):
+    STAGES = ("capture", "encode", "handoff", "step")
+
+    def __init__(self, bundle):
+        self.bundle = bundle
+        self.mic = MicRing()
+        self.stages = {name: Histogram(STAGE_BUCKETS) for name in self.STAGES}
+        self.steps = 0
+        # (codes, encoded at), None once the encoder stops
+        self._frames: queue.Queue[tuple | None] = queue.Queue()
+        self._stop = threading.Event()
+        self._encoder = threading.Thread(target=self._encode_loop, name="stt-encoder", daemon=True)
+        self._stream = None
+
+    def __enter__(self):
+        self._stream = sd.InputStream(samplerate=SAMPLE_RATE, channels=1, blocksize=BLOCK_SIZE,
+                                      dtype="float32", callback=self._on_input)
+        self._encoder.start()
+        self._stream.start()
+        return self
+
+    def __exit__(self, *exc):
         try:
-            while running:
-                if duration and (time.time() - start_time) >= duration:
-                    break
-
-                try:
-                    pcm = input_queue.get(timeout=0.1)
-                except queue.Empty:
+            if self._stream is not None:
+                self._stream.stop()
+                self._stream.close()
+        finally:
+            self._stop.set()
+            self.mic.close()
+            self._encoder.join(timeout=1)
+            self.bundle["timings"] = self.stats()
+
+    def _on_input(self, in_data, frames, time_info, status):
+        self.mic.put(in_data)
+
+    def _encode_loop(self):
+        tokenizer = self.bundle["audio_tokenizer"]
+        # (capture time or None for warm-up, submit time) of frames in the codec
+        inflight: deque[tuple[float | None, float]] = deque()
+        silence = np.zeros(BLOCK_SIZE, dtype=np.float32)
+        for _ in range(WARMUP_FRAMES):
+            tokenizer.encode(silence)
+            inflight.append((None, time.perf_counter()))
+        try:
+            while not self._stop.is_set():
+                # Block on the mic when the codec is empty; otherwise only take what is there
+                block = self.mic.peek(0 if inflight else 0.1)
+                if block is not None:
+                    pcm, captured = block
+                    submitted = time.perf_counter()
+                    tokenizer.encode(pcm)  # copies the block: its slot is free again
+                    self.mic.release()
+                    self.stages["capture"].observe(submitted - captured)
+                    inflight.append((captured, submitted))
+                if not inflight:
                     continue
-
-                # Encode PCM → audio tokens (non-blocking StreamTokenizer)
-                audio_tokenizer.encode(pcm)
-                encoded = None
-                for _ in range(100):  # wait up to 100ms
-                    encoded = audio_tokenizer.get_encoded()
-                    if encoded is not None:
-                        break
-                    time.sleep(0.001)
-
-                if encoded is None:
+                codes = tokenizer.get_encoded()
+                if codes is None:
+                    if block is None:
+                        time.sleep(ENCODE_POLL_S)
                     continue
+                captured, submitted = inflight.popleft()
+                if captured is None:
+                    continue  # warm-up frame
+                encoded = time.perf_counter()
+                self.stages["encode"].observe(encoded - submitted)
+                self._frames.put((codes, encoded))
+        finally:
+            self._frames.put(None)
+
+    def tokens(self, deadline: float | None = None):
+        """Step the model on each encoded frame as it arrives. Yields the text of each step
+        ("" for padding), until deadline (time.perf_counter() value) or the end of the session."""
+        gen = self.bundle["gen"]
+        ct = self.bundle["ct"]
+        other_codebooks = self.bundle["other_codebooks"]
+        text_tokenizer = self.bundle["text_tokenizer"]
+        while True:
+            timeout = None if deadline is None else deadline - time.perf_counter()
+            if timeout is not None and timeout <= 0:
+                return
+            try:
+                item = self._frames.get(timeout=timeout)
+            except queue.Empty:
+                return
+            if item is None:
+                return
+            codes, encoded = item
+            start = time.perf_counter()
+            self.stages["handoff"].observe(start - encoded)
+
+            # Shape: (codebooks, 1) → transpose to (1, codebooks) → slice
+            audio_tokens = mx.array(codes).transpose(1, 0)[:, :other_codebooks]
+            text_token = gen.step(audio_tokens[0], ct)[0].item()
+            self.stages["step"].observe(time.perf_counter() - start)
+            self.steps += 1
+
+            if text_token in PAD_TOKENS:
+                yield ""
+            else:
+                yield text_tokenizer.id_to_piece(text_token).replace("\u2581", " ")
+
+    def stats(self) -> dict:
+        stages = {}
+        for name, h in self.stages.items():
+            snap = h.snapshot()
+            stages[name] = {k: snap[k] for k in ("count", "mean", "p50", "p90", "max")}
+        return {"steps": self.steps, "mic_overruns": self.mic.overruns, "stages": stages}
+
+    def summary(self) -> str:
+        """Stage latencies on one line: p50 / p90 in ms."""
+        def ms(v):
+            return "-" if v is None else f"{v * 1000:.1f}"
+
+        parts = [f"{name} {ms(h.quantile(0.5))}/{ms(h.quantile(0.9))}" for name, h in self.stages.items()]
+        return "p50/p90 ms: " + ", ".join(parts) + f", mic overruns {self.mic.overruns}"
+
+
+# ---------------------------------------------------------------------------
+# Listening
+# ---------------------------------------------------------------------------
 
-                # Shape: (codebooks, 1) → transpose to (1, codebooks) → slice
-                audio_tokens = mx.array(encoded).transpose(1, 0)[:, :other_codebooks]
-
-                # Run model step → (text_token, transformer_out)
-                text_token = gen.step(audio_tokens[0], ct)
-                text_token = text_token[0].item()
-                step += 1
+def listen(bundle, duration=None):
+    """Capture mic and transcribe in real-time. Prints text to stdout."""
+    print("Listening... (Ctrl+C to stop)", file=sys.stderr, flush=True)
+    start_time = time.perf_counter()
+    deadline = start_time + duration if duration else None
 
-                # Decode and print text token (skip padding tokens 0 and 3)
-                if text_token not in (0, 3):
-                    text = text_tokenizer.id_to_piece(text_token)
-                    text = text.replace("\u2581", " ")
+    with SttPipeline(bundle) as pipeline:
+        try:
+            for text in pipeline.tokens(deadline):
+                if text:
                     print(text, end="", flush=True)
-
         except KeyboardInterrupt:
             pass
-        finally:
-            running = False
 
     print(file=sys.stderr)
-    elapsed = time.time() - start_time
-    tokens_per_sec = step / elapsed if elapsed > 0 else 0
-    print(f"[{step} steps, {tokens_per_sec:.1f} tok/s, {elapsed:.1f}s]",
+    elapsed = time.perf_counter() - start_time
+    tokens_per_sec = pipeline.steps / elapsed if elapsed > 0 else 0
+    print(f"[{pipeline.steps} steps, {tokens_per_sec:.1f} tok/s, {elapsed:.1f}s]",
           file=sys.stderr, flush=True)
+    print(f"[{pipeline.summary()}]", file=sys.stderr, flush=True)
 
 
 def listen_until_silence(bundle, silence_threshold=15, max_duration=30):
     """Listen until silence detected. Returns transcribed text.
 
+    Stage timings of the session are left in bundle["timings"] (SttPipeline.stats()).
+
     Args:
         silence_threshold: consecutive silent steps before stopping (15 ≈ 1.2s)
         max_duration: max listen time in seconds
     """
-    gen = bundle["gen"]
-    text_tokenizer = bundle["text_tokenizer"]
-    audio_tokenizer = bundle["audio_tokenizer"]
-    ct = bundle["ct"]
-    other_codebooks = bundle["other_codebooks"]
-
-    input_queue = queue.Queue()
-    running = True
     accumulated = []
     silence_count = 0
 
-    def on_input(in_data, frames, time_info, status):
-        if running:
-            input_queue.put_nowait(in_data[:, 0].astype(np.float32).copy())
-
-    # Warmup audio tokenizer
-    for _ in range(4):
-        silence = np.zeros(BLOCK_SIZE, dtype=np.float32)
-        audio_tokenizer.encode(silence)
-        while True:
-            time.sleep(0.001)
-            data = audio_tokenizer.get_encoded()
-            if data is not None:
-                break
-
-    start_time = time.time()
-
-    with sd.InputStream(samplerate=SAMPLE_RATE, channels=1,
-                        blocksize=BLOCK_SIZE, callback=on_input):
+    with SttPipeline(bundle) as pipeline:
         try:
-            while running:
-                if (time.time() - start_time) >= max_duration:
-                    break
-
-                try:
-                    pcm = input_queue.get(timeout=0.1)
-                except queue.Empty:
-                    continue
-
-                audio_tokenizer.encode(pcm)
-                encoded = None
-                for _ in range(100):
-                    encoded = audio_tokenizer.get_encoded()
-                    if encoded is not None:
-                        break
-                    time.sleep(0.001)
-
-                if encoded is None:
-                    continue
-
-                audio_tokens = mx.array(encoded).transpose(1, 0)[:, :other_codebooks]
-                text_token = gen.step(audio_tokens[0], ct)
-                text_token = text_token[0].item()
-
-                if text_token not in (0, 3):
-                    text = text_tokenizer.id_to_piece(text_token)
-                    text = text.replace("\u2581", " ")
+            for text in pipeline.tokens(time.perf_counter() + max_duration):
+                if text:
                     accumulated.append(text)
                     silence_count = 0
                     print(text, end="", flush=True)
-                else:
-                    if accumulated:
-                        silence_count += 1
-
-                if silence_count >= silence_threshold and accumulated:
-                    break
-
+                elif accumulated:
+                    silence_count += 1
+                    if silence_count >= silence_threshold:
+                        break
         except KeyboardInterrupt:
             pass
-        finally:
-            running = False
 
     print(file=sys.stderr)
     return "".join(accumulated).strip()
@@ -2,16 +2,15 @@
 
 import asyncio
 import atexit
-import os
 import re
 import sys
 import termios
 import threading
 import tty
+import uuid
 from pathlib import Path
 
 import sounddevice as sd
-import soundfile as sf
 
 from claude_code_sdk import (
     query,
@@ -24,7 +23,8 @@ from claude_code_sdk import (
 from claude_code_sdk.types import StreamEvent
 
 from jarvis.stt import load_model, listen_until_silence, reset
-from jarvis.cli import send_request
+from jarvis import protocol
+from jarvis.cli import DaemonClient
 
 VOICE_SYSTEM_PROMPT = (
     "Tu es un assistant vocal. Tes réponses seront lues par un synthétiseur vocal. "
@@ -37,6 +37,10 @@ VOICE_SYSTEM_PROMPT = (
 
 N_GEN_WORKERS = 3
 
+# One persistent connection for the whole session: fillers, sentences and cancels
+# from all gen_workers are pipelined over it instead of reconnecting per request.
+daemon = DaemonClient()
+
 
 # ---------------------------------------------------------------------------
 # KeyMonitor — non-blocking keypress detection via cbreak stdin
@@ -118,60 +122,72 @@ def extract_sentences(buffer: str) -> tuple[list[str], str]:
 # TTS generation & playback
 # ---------------------------------------------------------------------------
 
-def generate_to_file(text: str, language: str, path: str) -> bool:
-    """Ask daemon to generate audio to file (no playback). Returns success."""
+def generate_audio(text: str, language: str, request_id: str | None = None):
+    """Ask daemon for the sentence's audio in its reply (no playback, no file).
+
+    Returns (pcm float32 (n, 1), sample_rate), or None on failure.
+    """
     try:
-        resp = send_request({
+        resp = daemon.request({
             "action": "generate",
+            "id": request_id,
             "text": text,
             "language": language,
-            "output": path,
+            "reply_audio": True,
+            "wire": "binary",
+            "priority": "interactive",
         })
-        return resp.get("status") == "ok"
     except Exception as e:
         print(f"TTS gen error: {e}", file=sys.stderr)
-        return False
+        return None
+    if resp.get("status") != "ok" or "sample_rate" not in resp:
+        return None
+    return protocol.to_float32(resp), resp["sample_rate"]
 
 
-def play_interruptible(path: str, barge_in: threading.Event, delete: bool = True) -> bool:
-    """Play a WAV file, stoppable via barge_in event.
+class Speaker:
+    """One output stream for the whole session, fed sentence after sentence.
 
-    Returns True if interrupted, False if completed normally.
+    The device is opened at the first sentence and stays open between sentences and
+    turns, so the gap between two sentences is the silence they carry, not device setup.
     """
-    try:
-        data, sr = sf.read(path, dtype="float32")
-    except Exception:
-        return False
-    finally:
-        if delete:
-            try:
-                os.unlink(path)
-            except OSError:
-                pass
 
-    if data.ndim == 1:
-        data = data.reshape(-1, 1)
+    BLOCK_S = 0.04  # barge-in is checked between 40 ms writes (~25 checks/sec)
 
-    stream = sd.OutputStream(samplerate=sr, channels=1, dtype="float32")
-    stream.start()
+    def __init__(self):
+        self._stream = None
+        self.sample_rate = None
 
-    chunk_size = int(sr * 0.04)  # 40ms chunks → ~25 checks/sec
-    offset = 0
+    def play(self, pcm, sr: int, barge_in: threading.Event) -> bool:
+        """Play float32 samples, stoppable via barge_in.
 
-    try:
-        while offset < len(data):
+        Returns True if interrupted, False if completed normally.
+        """
+        if self._stream is None or sr != self.sample_rate:
+            self.close()
+            self._stream = sd.OutputStream(samplerate=sr, channels=1, dtype="float32")
+            self.sample_rate = sr
+        if not self._stream.active:
+            self._stream.start()
+
+        block = int(sr * self.BLOCK_S)
+        for offset in range(0, len(pcm), block):
             if barge_in.is_set():
-                stream.abort()
+                # Drop what the device still buffers; the stream restarts at the next play()
+                self._stream.abort()
                 return True
-            end = min(offset + chunk_size, len(data))
-            stream.write(data[offset:end])
-            offset = end
-    finally:
-        if stream.active:
-            stream.stop()
-        stream.close()
+            self._stream.write(pcm[offset:offset + block])
+        return False
+
+    def close(self):
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.abort()
+            stream.close()
+
 
-    return False
+speaker = Speaker()
+atexit.register(speaker.close)
 
 
 # ---------------------------------------------------------------------------
@@ -183,28 +199,26 @@ async def gen_worker(
     ordered_queue: asyncio.Queue,
     language: str,
     barge_in: threading.Event,
-    worker_id: int,
+    turn_id: str,
 ):
-    """Pull (seq, sentence) from queue, generate audio, push to ordered_queue."""
+    """Pull (seq, sentence) from queue, generate audio, push (seq, (pcm, sr)) to ordered_queue.
+
+    Requests are tagged "<turn_id>-<seq>" so a barge-in can cancel them in the daemon.
+    """
     while True:
         item = await sentence_queue.get()
         if item is None or barge_in.is_set():
             await ordered_queue.put(None)
             break
         seq, sentence = item
-        path = f"/tmp/jarvis_tts_{os.getpid()}_{worker_id}_{seq:03d}.wav"
-        ok = await asyncio.to_thread(generate_to_file, sentence, language, path)
+        audio = await asyncio.to_thread(
+            generate_audio, sentence, language, f"{turn_id}-{seq}"
+        )
         if barge_in.is_set():
-            try:
-                os.unlink(path)
-            except OSError:
-                pass
             await ordered_queue.put(None)
             break
-        if ok:
-            await ordered_queue.put((seq, path))
-        else:
-            await ordered_queue.put((seq, None))
+        await ordered_queue.put((seq, audio))
+        if audio is None:
             print(f"  TTS failed: {sentence[:40]}", file=sys.stderr)
 
 
@@ -225,13 +239,13 @@ async def reorder_worker(
                 await audio_queue.put(None)
                 break
             continue
-        seq, path = item
-        buffer[seq] = path
+        seq, audio = item
+        buffer[seq] = audio
         # Flush all consecutive ready items
         while next_seq in buffer:
-            p = buffer.pop(next_seq)
-            if p:
-                await audio_queue.put(p)
+            audio = buffer.pop(next_seq)
+            if audio is not None:
+                await audio_queue.put(audio)
             next_seq += 1
 
 
@@ -240,29 +254,41 @@ async def play_worker(
     barge_in: threading.Event,
     filler_done: asyncio.Event | None = None,
 ):
-    """Play audio files from queue sequentially, stoppable via barge_in."""
+    """Play (pcm, sr) buffers from queue back to back on the speaker, stoppable via barge_in."""
     # Wait for filler to finish before playing real audio
     if filler_done is not None:
         await filler_done.wait()
 
     while True:
-        path = await audio_queue.get()
-        if path is None:
+        audio = await audio_queue.get()
+        if audio is None:
             break
-        interrupted = await asyncio.to_thread(play_interruptible, path, barge_in)
+        pcm, sr = audio
+        interrupted = await asyncio.to_thread(speaker.play, pcm, sr, barge_in)
         if interrupted:
-            # Drain and cleanup remaining queued files
+            # Drop the sentences still queued
             while not audio_queue.empty():
-                remaining = audio_queue.get_nowait()
-                if remaining is None:
+                if audio_queue.get_nowait() is None:
                     break
-                try:
-                    os.unlink(remaining)
-                except OSError:
-                    pass
             break
 
 
+async def cancel_on_barge_in(barge_in: threading.Event, turn_id: str, issued):
+    """On barge-in, cancel every sentence of this turn in the daemon with one request.
+
+    issued() returns how many sequence numbers have been handed out so far.
+    """
+    while not barge_in.is_set():
+        await asyncio.sleep(0.05)
+    ids = [f"{turn_id}-{i}" for i in range(issued())]
+    if not ids:
+        return
+    try:
+        await asyncio.to_thread(daemon.request, {"action": "cancel", "ids": ids})
+    except Exception as e:
+        print(f"TTS cancel error: {e}", file=sys.stderr)
+
+
 # ---------------------------------------------------------------------------
 # Conversation turn
 # ---------------------------------------------------------------------------
@@ -293,12 +319,11 @@ async def conversation_turn(
     async def _play_filler():
         try:
             resp = await asyncio.to_thread(
-                send_request, {"action": "get_filler", "language": language}
+                daemon.request, {"action": "get_filler", "language": language, "wire": "binary"}
             )
-            filler_path = resp.get("path")
-            if filler_path and not keys.barge_in.is_set():
+            if resp.get("status") == "ok" and not keys.barge_in.is_set():
                 await asyncio.to_thread(
-                    play_interruptible, filler_path, keys.barge_in, False
+                    speaker.play, protocol.to_float32(resp), resp["sample_rate"], keys.barge_in
                 )
         except Exception:
             pass
@@ -307,11 +332,16 @@ async def conversation_turn(
 
     filler_task = asyncio.create_task(_play_filler())
 
+    buffer = ""
+    seq = 0
+    new_session_id = session_id
+    turn_id = f"talk-{uuid.uuid4().hex[:8]}"
+
     # Launch N gen_workers + 1 reorder_worker + 1 play_worker
     gen_tasks = []
-    for i in range(N_GEN_WORKERS):
+    for _ in range(N_GEN_WORKERS):
         gen_tasks.append(asyncio.create_task(
-            gen_worker(sentence_queue, ordered_queue, language, keys.barge_in, i)
+            gen_worker(sentence_queue, ordered_queue, language, keys.barge_in, turn_id)
         ))
     reorder_task = asyncio.create_task(
         reorder_worker(ordered_queue, audio_queue, N_GEN_WORKERS)
@@ -319,10 +349,9 @@ async def conversation_turn(
     play_task = asyncio.create_task(
         play_worker(audio_queue, keys.barge_in, filler_done)
     )
-
-    buffer = ""
-    seq = 0
-    new_session_id = session_id
+    cancel_task = asyncio.create_task(
+        cancel_on_barge_in(keys.barge_in, turn_id, lambda: seq)
+    )
 
     try:
         async for msg in query(prompt=text, options=opts):
@@ -368,6 +397,10 @@ async def conversation_turn(
         await asyncio.gather(*gen_tasks)
         await reorder_task
         await play_task
+        if keys.barge_in.is_set():
+            await cancel_task
+        else:
+            cancel_task.cancel()
         keys.stop()
 
     print(flush=True)
@@ -0,0 +1,142 @@
+"""Request tracing — one trace id per request, timestamped spans from every process it crosses.
+
+The client creates the trace id (cli.send_request / DaemonClient) and sends it as
+request["trace_id"]. The daemon, the worker and the handler each record spans under
+that id; workers return theirs inside the result and the daemon appends the daemon and
+worker spans to TRACE_FILE (JSONL, one span per line), the client appends its own.
+TRACE_FILE is $JARVIS_TRACE_FILE if set, else jarvis/trace.jsonl in the user state
+directory ($XDG_STATE_HOME, default ~/.local/state): clients and daemon must agree on it.
+
+Span: {"trace", "proc", "pid", "name", "ts" (epoch s), "dur" (s), "attrs"}.
+`jah trace` prints a trace or exports spans to Chrome / Perfetto trace-event JSON.
+"""
+
+import contextlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+
+def default_trace_file() -> Path:
+    if os.environ.get("JARVIS_TRACE_FILE"):
+        return Path(os.environ["JARVIS_TRACE_FILE"]).expanduser()
+    state = Path(os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state")
+    return state / "jarvis" / "trace.jsonl"
+
+
+TRACE_FILE = default_trace_file()
+TRACE_MAX_BYTES = 20 * 1024 * 1024  # rotated to trace.jsonl.1 beyond this
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class Trace:
+    """Spans recorded by one process for one request."""
+
+    def __init__(self, trace_id: str | None = None, proc: str = "client"):
+        self.id = trace_id or new_trace_id()
+        self.proc = proc
+        self.spans: list[dict] = []
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attrs):
+        """Time a block. The yielded dict can be filled with attributes inside the block."""
+        start = time.time()
+        try:
+            yield attrs
+        finally:
+            self.add(name, start, time.time(), **attrs)
+
+    def add(self, name: str, start: float, end: float, **attrs):
+        span = {"trace": self.id, "proc": self.proc, "pid": os.getpid(), "name": name,
+                "ts": round(start, 6), "dur": round(max(0.0, end - start), 6)}
+        if attrs:
+            span["attrs"] = attrs
+        self.spans.append(span)
+
+    def extend(self, spans):
+        """Adopt spans recorded elsewhere for the same request (e.g. returned by a worker)."""
+        self.spans.extend(spans or [])
+
+    def total(self, name: str) -> float:
+        return sum(float(s["dur"]) for s in self.spans if s["name"] == name)
+
+
+def timing(trace: Trace, result: dict, total_s: float) -> dict:
+    """Timing summary attached to a generate reply."""
+    audio_s = result.get("audio_s")
+    generation_s = result.get("generation_s")
+    return {
+        "total_s": round(total_s, 3),
+        "queue_s": round(trace.total("daemon.queue"), 3),
+        "reload_s": round(trace.total("worker.reload"), 3),
+        "generation_s": generation_s,
+        "playback_s": round(trace.total("handler.playback") + trace.total("daemon.playback"), 3),
+        "write_s": round(trace.total("handler.write"), 3),
+        "attempts": result.get("attempts"),
+        "audio_s": audio_s,
+        "rtf": round(generation_s / audio_s, 3) if generation_s and audio_s else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Trace file
+# ---------------------------------------------------------------------------
+
+def write(spans, path: Path | None = None):
+    """Append spans to the JSONL trace file, rotating it when it grows too large."""
+    if not spans:
+        return
+    path = path or TRACE_FILE
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists() and path.stat().st_size > TRACE_MAX_BYTES:
+            path.replace(path.with_name(path.name + ".1"))
+        data = "".join(json.dumps(s) + "\n" for s in spans)
+        with open(path, "a") as f:
+            f.write(data)
+    except OSError:
+        pass  # tracing must never fail a request
+
+
+def read(path: Path | None = None) -> list:
+    """All spans in the trace file (rotated file first), skipping damaged lines."""
+    path = path or TRACE_FILE
+    spans = []
+    for p in (path.with_name(path.name + ".1"), path):
+        try:
+            with open(p) as f:
+                for line in f:
+                    try:
+                        spans.append(json.loads(line))
+                    except ValueError:
+                        pass
+        except OSError:
+            pass
+    return spans
+
+
+def to_chrome(spans) -> dict:
+    """Chrome trace-event JSON (chrome://tracing, ui.perfetto.dev): one process per proc."""
+    pids: dict[str, int] = {}
+    events = []
+    for s in sorted(spans, key=lambda s: s["ts"]):
+        if s["proc"] not in pids:
+            pids[s["proc"]] = len(pids) + 1
+            events.append({"name": "process_name", "ph": "M", "pid": pids[s["proc"]],
+                           "args": {"name": s["proc"]}})
+        events.append({
+            "name": s["name"],
+            "cat": s["name"].split(".", 1)[0],
+            "ph": "X",
+            "ts": round(s["ts"] * 1e6),
+            "dur": round(s["dur"] * 1e6),
+            "pid": pids[s["proc"]],
+            "tid": s["pid"],
+            "args": {"trace": s["trace"], **s.get("attrs", {})},
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -3,11 +3,12 @@
 import json
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import click
 
-from jarvis.cli import SOCKET_PATH, send_request
+from jarvis.cli import SOCKET_PATH, DaemonClient, send_request
 
 
 # --- Corpus ---
@@ -84,8 +85,9 @@ def build_corpus() -> list[dict]:
 
 # --- Test runner ---
 
-def run_test(entry: dict, index: int, total: int, silent: bool) -> dict:
-    """Run a single test and return the result."""
+def run_test(entry: dict, index: int, total: int, silent: bool,
+             client: DaemonClient | None = None) -> dict:
+    """Run a single test and return the result (over `client` if given)."""
     import socket as _socket
 
     text = entry["text"]
@@ -112,8 +114,12 @@ def run_test(entry: dict, index: int, total: int, silent: bool) -> dict:
             "language": "French",
             "instruct": "warm masculine voice",
             "output": "/dev/null" if silent else None,
+            "priority": "batch",
         }
-        resp = send_request(request, timeout=120)
+        if client is not None:
+            resp = client.request(request, timeout=120)
+        else:
+            resp = send_request(request, timeout=120)
         elapsed = (time.time() - t0) * 1000
         result["response_ms"] = round(elapsed)
         result["status"] = resp.get("status", "unknown")
@@ -222,7 +228,8 @@ def generate_report(results: list[dict]) -> dict:
     return report
 
 
-def run_stress(silent: bool, delay: float, report_path: str, category: str | None):
+def run_stress(silent: bool, delay: float, report_path: str, category: str | None,
+               concurrency: int = 1):
     """Run stress tests against the jarvis daemon."""
 
     if not SOCKET_PATH.exists():
@@ -234,15 +241,23 @@ def run_stress(silent: bool, delay: float, report_path: str, category: str | Non
         corpus = [e for e in corpus if e["category"] == category]
 
     total = len(corpus)
-    click.echo(f"Running {total} tests (delay={delay}s, silent={silent})...")
+    click.echo(f"Running {total} tests (delay={delay}s, silent={silent}, "
+               f"concurrency={concurrency})...")
     click.echo()
 
     results = []
-    for i, entry in enumerate(corpus):
-        result = run_test(entry, i, total, silent)
-        results.append(result)
-        if delay > 0 and i < total - 1:
-            time.sleep(delay)
+    if concurrency > 1:
+        # Pipeline requests over one persistent connection; the daemon answers by id
+        with DaemonClient() as client, ThreadPoolExecutor(concurrency) as pool:
+            futures = [pool.submit(run_test, entry, i, total, silent, client)
+                       for i, entry in enumerate(corpus)]
+            results = [f.result() for f in futures]
+    else:
+        for i, entry in enumerate(corpus):
+            result = run_test(entry, i, total, silent)
+            results.append(result)
+            if delay > 0 and i < total - 1:
+                time.sleep(delay)
 
     # Generate report
     report = generate_report(results)
@@ -0,0 +1,84 @@
+"""Audio file output: format selection, the .part file and its rename or discard."""
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from jarvis.audiofile import AudioWriter, output_format, write_audio
+
+SR = 24000
+
+
+def _tone(n: int) -> np.ndarray:
+    return (0.3 * np.sin(np.arange(n) / 10)).astype(np.float32)
+
+
+@pytest.mark.parametrize("path, fmt, expected", [
+    ("a.wav", None, "wav"),
+    ("a.WAV", None, "wav"),
+    ("a.flac", None, "flac"),
+    ("a.ogg", None, "opus"),
+    ("a.opus", None, "opus"),
+    ("a.wav", "flac", "flac"),
+    ("a.bin", "wav", "wav"),
+])
+def test_output_format(path, fmt, expected):
+    assert output_format(path, fmt) == expected
+
+
+@pytest.mark.parametrize("path, fmt", [("a.mp3", None), ("noext", None), ("a.wav", "mp3")])
+def test_output_format_rejects_unknown(path, fmt):
+    with pytest.raises(ValueError):
+        output_format(path, fmt)
+
+
+@pytest.mark.parametrize("name, subtype", [("out.wav", "PCM_16"), ("out.flac", "PCM_16"),
+                                           ("out.ogg", "OPUS")])
+def test_written_in_blocks_then_renamed(tmp_path, name, subtype):
+    path = tmp_path / name
+    writer = AudioWriter(path, SR)
+    part = tmp_path / f"{name}.part"
+    for block in np.split(_tone(SR), 4):
+        writer.write(block.reshape(-1, 1))
+        assert part.exists() and not path.exists()
+    writer.write(np.zeros(0, np.float32))
+    assert writer.frames == SR
+    assert writer.close() == path
+    assert path.exists() and not part.exists()
+
+    info = sf.info(path)
+    assert info.samplerate == SR and info.channels == 1 and info.subtype == subtype
+    if subtype == "PCM_16":
+        data, _ = sf.read(path, dtype="float32")
+        np.testing.assert_allclose(data, _tone(SR), atol=1 / 16384)
+
+
+def test_close_replaces_an_existing_file(tmp_path):
+    path = tmp_path / "out.wav"
+    path.write_bytes(b"old")
+    write_audio(path, _tone(1000), SR)
+    assert sf.info(path).frames == 1000
+
+
+def test_discard_leaves_nothing(tmp_path):
+    path = tmp_path / "out.wav"
+    path.write_bytes(b"previous take")
+    writer = AudioWriter(path, SR)
+    writer.write(_tone(1000))
+    writer.discard()
+    writer.discard()  # idempotent, e.g. cancelled after a failed close
+    assert path.read_bytes() == b"previous take"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_opus_rejects_unsupported_rate(tmp_path):
+    with pytest.raises(ValueError):
+        AudioWriter(tmp_path / "out.ogg", 22050)
+    assert not list(tmp_path.iterdir())
+
+
+def test_write_audio_discards_on_error(tmp_path):
+    path = tmp_path / "out.wav"
+    with pytest.raises(ValueError):
+        write_audio(path, np.array(["not audio"]), SR)
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,126 @@
+"""AudioCache: LRU eviction, index persistence and concurrent stores."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sounddevice")  # jarvis.cache -> jarvis.handlers
+
+from jarvis.cache import AudioCache, cache_key  # noqa: E402
+
+ENTRY = 100_000  # samples: 400 kB of float32, two entries fit in 1 MB, three don't
+
+
+def _audio(seed: int, n: int = ENTRY) -> np.ndarray:
+    return np.random.default_rng(seed).uniform(-1, 1, (n, 1)).astype(np.float32)
+
+
+def test_key_ignores_punctuation_noise_and_bypass():
+    a = cache_key({"text": "Bonjour... le monde"}, "m")
+    assert a == cache_key({"text": "Bonjour.  le monde"}, "m")
+    assert a != cache_key({"text": "Bonjour... le monde", "language": "French"}, "m")
+    assert a != cache_key({"text": "Bonjour... le monde"}, "other-model")
+    assert cache_key({"text": "Bonjour", "cache": False}, "m") is None
+    assert cache_key({"text": "  "}, "m") is None
+
+
+def test_key_covers_long_text_options():
+    a = cache_key({"text": "Bonjour"}, "m")
+    assert a == cache_key({"text": "Bonjour", "split": True, "trim": True, "crossfade_ms": 10}, "m")
+    for option in ({"split": False}, {"trim": False}, {"crossfade_ms": 40}):
+        assert a != cache_key({"text": "Bonjour", **option}, "m")
+
+
+def test_get_returns_what_was_put(tmp_path):
+    cache = AudioCache(tmp_path, max_mb=1)
+    audio = _audio(0)
+    cache.put("a", audio, 24000)
+    got, sr = cache.get("a")
+    assert sr == 24000
+    np.testing.assert_array_equal(got, audio)
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_entry_evicted_while_being_read(tmp_path, monkeypatch):
+    cache = AudioCache(tmp_path, max_mb=1)
+    cache.put("a", _audio(0), 24000)
+
+    def evicted_meanwhile(path, dtype):
+        with cache._lock:
+            cache._drop("a")
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(np, "fromfile", evicted_meanwhile)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["size_mb"] == 0
+
+
+def test_lru_eviction(tmp_path):
+    cache = AudioCache(tmp_path, max_mb=1)
+    cache.put("a", _audio(0), 24000)
+    cache.put("b", _audio(1), 24000)
+    assert cache.get("a") is not None  # b is now the least recently used
+    cache.put("c", _audio(2), 24000)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+    assert not (tmp_path / "b.f32").exists()
+
+
+def test_oversized_entry_is_not_stored(tmp_path):
+    cache = AudioCache(tmp_path, max_mb=1)
+    cache.put("big", _audio(0, 300_000), 24000)
+    assert cache.get("big") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_index_reload_keeps_lru_order(tmp_path):
+    cache = AudioCache(tmp_path, max_mb=1)
+    cache.put("a", _audio(0), 24000)
+    cache.put("b", _audio(1), 16000)
+    cache.get("a")
+    cache.save_index()
+    (tmp_path / "orphan.f32").write_bytes(b"\0" * 16)  # stored after the last index save
+    (tmp_path / "leftover.tmp").write_bytes(b"x")
+
+    reloaded = AudioCache(tmp_path, max_mb=1)
+    assert reloaded.stats()["entries"] == 2
+    assert reloaded.get("b")[1] == 16000
+    np.testing.assert_array_equal(reloaded.get("a")[0], _audio(0))
+    assert not (tmp_path / "orphan.f32").exists()
+    assert not (tmp_path / "leftover.tmp").exists()
+
+    reloaded.put("c", _audio(2), 24000)  # evicts b: reading it back made a the newer one
+    assert reloaded.get("b") is None and reloaded.get("a") is not None
+
+
+def test_reload_with_smaller_cap_evicts(tmp_path):
+    cache = AudioCache(tmp_path, max_mb=2)
+    for i in range(4):
+        cache.put(str(i), _audio(i), 24000)
+    cache.save_index()
+    assert AudioCache(tmp_path, max_mb=1).stats()["entries"] == 2
+
+
+def test_concurrent_puts(tmp_path):
+    cache = AudioCache(tmp_path, max_mb=1)
+    small = 1000
+
+    def put(i):
+        cache.put(f"k{i % 50}", _audio(i % 50, small), 24000)
+        cache.get(f"k{(i * 7) % 50}")
+        if i % 25 == 0:
+            cache.save_index()
+
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(put, range(400)))
+    cache.save_index()
+
+    assert not list(tmp_path.glob("*.tmp"))
+    reloaded = AudioCache(tmp_path, max_mb=1)
+    assert reloaded.stats()["entries"] == 50
+    for i in range(50):
+        np.testing.assert_array_equal(reloaded.get(f"k{i}")[0], _audio(i, small))
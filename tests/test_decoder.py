@@ -0,0 +1,152 @@
+"""Batched decoding: requests decoded together must get the audio they get one at a time."""
+
+import numpy as np
+import pytest
+
+mx = pytest.importorskip("mlx.core")
+qwen3_tts = pytest.importorskip("mlx_audio.tts.models.qwen3_tts.qwen3_tts")
+
+from mlx_audio.tts.models.qwen3_tts.config import ModelConfig  # noqa: E402
+
+from jarvis.decoder import BatchedModel, LayerCache, supports  # noqa: E402
+
+GREEDY = {"instruct": "Voix calme.", "temperature": 0, "repetition_penalty": 1.2}
+
+
+class Tokenizer:
+    def encode(self, text):
+        return [ord(c) % 200 + 10 for c in text]
+
+
+class SpeechTokenizer:
+    """Codes as samples, so that the audio tells which codes were generated."""
+
+    def decode(self, codes):
+        audio = (codes[0].astype(mx.float32) / 64).reshape(1, -1)
+        return audio, mx.array([audio.shape[1] - 1])
+
+
+@pytest.fixture(scope="module")
+def model():
+    """A Qwen3-TTS voice-design model with tiny random weights, whose codec EOS (80) is out of
+    its vocabulary: requests run to max_tokens unless a test picks another EOS."""
+    mx.random.seed(0)
+    predictor = dict(vocab_size=64, hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+                     num_attention_heads=4, num_key_value_heads=2, head_dim=16, num_code_groups=4)
+    talker = dict(code_predictor_config=predictor, vocab_size=80, hidden_size=32,
+                  intermediate_size=64, num_hidden_layers=2, num_attention_heads=4,
+                  num_key_value_heads=2, head_dim=16, num_code_groups=4,
+                  rope_scaling={"interleaved": True, "mrope_section": [4, 2, 2], "rope_type": "default"},
+                  text_hidden_size=24, text_vocab_size=256, codec_eos_token_id=80,
+                  codec_think_id=71, codec_nothink_id=72, codec_think_bos_id=73,
+                  codec_think_eos_id=74, codec_pad_id=75, codec_bos_id=76)
+    config = ModelConfig(tts_model_type="voice_design", talker_config=talker, im_start_token_id=1,
+                         im_end_token_id=2, tts_pad_token_id=3, tts_bos_token_id=4,
+                         tts_eos_token_id=5)
+    model = qwen3_tts.Model(config)
+    model.tokenizer = Tokenizer()
+    model.speech_tokenizer = SpeechTokenizer()
+    mx.eval(model.parameters())
+    return model
+
+
+TEXTS = ["Bonjour tout le monde.", "Salut.", "Une phrase un peu plus longue que les autres.",
+         "Encore une."]
+
+
+def _sequential(model, text, max_tokens):
+    results = list(model.generate_voice_design(text, max_tokens=max_tokens, **GREEDY))
+    return np.array(results[0].audio) if results else None
+
+
+def _run(batched, requests, joins=None, closes=None, steps=100):
+    """Step the batch like the worker loop, reading every request after each step."""
+    joins, closes = joins or {}, closes or {}
+    out = {}
+    for step in range(steps):
+        for name, (text, max_tokens) in joins.get(step, {}).items():
+            requests[name] = batched.generate_voice_design(text, max_tokens=max_tokens, **GREEDY)
+        for name in closes.get(step, ()):
+            requests[name].close()
+            out[name] = "closed"
+        batched.batch.step()
+        for name, request in requests.items():
+            if name in out:
+                continue
+            try:
+                result = next(request)
+            except StopIteration:
+                out[name] = None
+                continue
+            if result.audio is not None:
+                out[name] = np.array(result.audio)
+        if len(out) == len(requests) and not any(joins.get(s) for s in range(step + 1, steps)):
+            break
+    return out
+
+
+def test_supports(model):
+    assert supports(model)
+    assert not supports(object())
+
+
+def test_batch_matches_sequential_with_late_joins(model):
+    lengths = [7, 12, 20, 5]
+    expected = [_sequential(model, t, n) for t, n in zip(TEXTS, lengths)]
+    batched = BatchedModel(model)
+    requests = {i: batched.generate_voice_design(TEXTS[i], max_tokens=lengths[i], **GREEDY)
+                for i in (0, 1)}
+    out = _run(batched, requests, joins={3: {2: (TEXTS[2], 20)}, 9: {3: (TEXTS[3], 5)}})
+    for i in range(4):
+        np.testing.assert_array_equal(out[i], expected[i])
+    assert len(batched.batch) == 0 and not batched.batch.cache
+
+
+def test_eos_and_close_leave_the_batch(model):
+    # Make a token the first text emits early the codec EOS, so requests end on their own
+    audio = _sequential(model, TEXTS[0], 30)  # 4 codes per step, last sample trimmed
+    first = np.append(audio, 0).reshape(-1, 4)[:, 0]
+    eos = model.config.talker_config.codec_eos_token_id
+    model.config.talker_config.codec_eos_token_id = int(round(first[4] * 64))
+    try:
+        expected = [_sequential(model, t, 30) for t in TEXTS]
+        batched = BatchedModel(model)
+        requests = {i: batched.generate_voice_design(t, max_tokens=30, **GREEDY)
+                    for i, t in enumerate(TEXTS)}
+        out = _run(batched, requests, closes={2: [1]})
+    finally:
+        model.config.talker_config.codec_eos_token_id = eos
+    assert expected[0] is None or len(expected[0]) < 5 * 4  # ended on the EOS
+    assert out[1] == "closed"
+    for i in (0, 2, 3):
+        if expected[i] is None:
+            assert out[i] is None
+        else:
+            np.testing.assert_array_equal(out[i], expected[i])
+    assert len(batched.batch) == 0
+
+
+def test_lone_request_steps_the_batch_itself(model):
+    batched = BatchedModel(model)
+    results = [r for r in batched.generate_voice_design(TEXTS[2], max_tokens=9, **GREEDY)
+               if r.audio is not None]
+    assert len(results) == 1 and results[0].token_count == 9
+    np.testing.assert_array_equal(np.array(results[0].audio), _sequential(model, TEXTS[2], 9))
+
+
+def test_wrong_model_type_is_refused(model):
+    with pytest.raises(ValueError):
+        BatchedModel(model).generate_custom_voice("Salut.", speaker="vivian")
+
+
+def test_layer_cache_merge_and_keep():
+    short, long = LayerCache(), LayerCache()
+    short.update_and_fetch(mx.ones((1, 2, 3, 4)), mx.ones((1, 2, 3, 4)))
+    long.update_and_fetch(2 * mx.ones((1, 2, 5, 4)), 2 * mx.ones((1, 2, 5, 4)))
+    short.merge(long)
+    keys, _ = short.state(short.offset)
+    assert short.offset == 5 and keys.shape == (2, 2, 5, 4)
+    np.testing.assert_array_equal(np.array(keys[0, 0, :, 0]), [0, 0, 1, 1, 1])  # left-padded
+    short.keep([0], 3)
+    keys, _ = short.update_and_fetch(3 * mx.ones((1, 2, 1, 4)), 3 * mx.ones((1, 2, 1, 4)))
+    np.testing.assert_array_equal(np.array(keys[0, 0, :, 0]), [1, 1, 1, 3])
@@ -0,0 +1,70 @@
+"""FillerBank: takes served from memory, then from the written bank, across a save."""
+
+import numpy as np
+import pytest
+
+from jarvis.fillers import FillerBank
+
+SR = 24000
+
+
+def _take(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).uniform(-0.5, 0.5, SR // 4).astype(np.float32)
+
+
+@pytest.fixture
+def bank(tmp_path):
+    return FillerBank("m", root=tmp_path)
+
+
+def _add(bank, n, language="French"):
+    keys = [key for key, lang, _, _ in bank.missing() if lang == language][:n]
+    for i, key in enumerate(keys):
+        bank.add(key, _take(i), SR)
+    return keys
+
+
+def test_saved_bank_is_reloaded(tmp_path, bank):
+    _add(bank, 3)
+    phrase, samples, sr = bank.get("French")
+    assert sr == SR and len(samples) == SR // 4
+    assert bank.get("English") is None
+    bank.save()
+    reloaded = FillerBank("m", root=tmp_path)
+    assert reloaded.stats()["takes"] == 3 and reloaded.sample_rate == SR
+    assert {bytes(reloaded.get("French")[1]) for _ in range(50)} == \
+        {_take(i).tobytes() for i in range(3)}
+    assert FillerBank("other-model", root=tmp_path).stats()["takes"] == 0
+
+
+def test_save_deletes_legacy_wav_takes(tmp_path, bank):
+    legacy = [tmp_path / "fr_00_v0.wav", tmp_path / "en_14_v4.wav"]
+    for path in legacy:
+        path.write_bytes(b"RIFF")
+    bank.save()  # nothing to write yet: the old takes are kept
+    assert all(path.exists() for path in legacy)
+    _add(bank, 1)
+    bank.save()
+    assert not any(path.exists() for path in legacy)
+    assert (tmp_path / "bank.f32").exists()
+
+
+def test_takes_added_while_saving_are_kept(bank):
+    first = _add(bank, 2)
+    late = [key for key, _, _, _ in bank.missing()][0]
+    map_bank = bank._map
+
+    def add_meanwhile(path):  # save() is writing the files, e.g. in a thread
+        bank.add(late, _take(9), SR)
+        assert bank.get("French") is not None
+        return map_bank(path)
+
+    bank._map = add_meanwhile
+    bank.save()
+    assert bank.stats()["takes"] == 3
+    assert isinstance(bank._takes[first[0]][2], np.ndarray)  # served from the new mapping
+    assert bank._fresh is not None and bank._dirty  # the late take is written next time
+    del bank._map
+    bank.save()
+    assert bank._fresh is None and not bank._dirty
+    assert FillerBank("m", root=bank.root).stats()["takes"] == 3
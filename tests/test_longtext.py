@@ -0,0 +1,90 @@
+"""Long texts: where split_text cuts, and how Stitcher joins the pieces."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sounddevice")  # jarvis.longtext -> jarvis.handlers
+
+from jarvis.longtext import Stitcher, split_text  # noqa: E402
+
+SR = 24000
+
+
+def test_short_text_is_one_piece_unchanged():
+    text = "  Bonjour.   Ça va ?  "
+    assert split_text(text, max_chars=50) == [text]
+    assert split_text("x" * 50, max_chars=50) == ["x" * 50]
+
+
+def test_pieces_respect_limits_and_keep_every_word():
+    text = " ".join(f"Phrase numéro {i}, avec une incise, puis la fin." for i in range(40))
+    pieces = split_text(text, max_chars=120, first_chars=60)
+    assert len(pieces) > 1
+    assert len(pieces[0]) <= 60
+    assert all(len(p) <= 120 for p in pieces)
+    assert " ".join(pieces).split() == text.split()
+
+
+def test_cuts_at_sentence_ends_first():
+    text = "Première phrase assez courte. Deuxième phrase, un peu plus longue. Troisième !"
+    pieces = split_text(text, max_chars=40, first_chars=30)
+    assert pieces == ["Première phrase assez courte.", "Deuxième phrase, un peu plus longue.",
+                      "Troisième !"]
+
+
+def test_long_sentence_cut_at_clauses_then_spaces():
+    clause = "mot " * 30  # 120 characters without punctuation
+    text = f"Début, {clause.strip()}; fin de la phrase."
+    pieces = split_text(text, max_chars=50, first_chars=50)
+    assert all(len(p) <= 50 for p in pieces)
+    assert pieces[0].startswith("Début,")
+    assert " ".join(pieces).split() == text.split()
+
+
+def test_unbreakable_word_is_cut_at_the_limit():
+    pieces = split_text("a" * 130, max_chars=50, first_chars=50)
+    assert pieces == ["a" * 50, "a" * 50, "a" * 30]
+
+
+def _stitch(stitcher, pieces):
+    out = [stitcher.add(p) for p in pieces] + [stitcher.finish()]
+    assert all(o.ndim == 2 and o.shape[1] == 1 and o.dtype == np.float32 for o in out)
+    return np.concatenate(out).reshape(-1)
+
+
+@pytest.mark.parametrize("crossfade_ms", [0, 10, 25])
+def test_stitched_length_loses_one_crossfade_per_seam(crossfade_ms):
+    stitcher = Stitcher(SR, crossfade_ms=crossfade_ms, trim=False)
+    lengths = [4800, 2400, 7200, 1200]
+    pcm = _stitch(stitcher, [np.ones(n, np.float32) for n in lengths])
+    fade = int(SR * crossfade_ms / 1000)
+    assert stitcher.fade == fade
+    assert len(pcm) == sum(lengths) - (len(lengths) - 1) * fade
+
+
+def test_crossfade_ramps_from_one_piece_to_the_next():
+    stitcher = Stitcher(SR, crossfade_ms=10, trim=False)
+    fade = stitcher.fade
+    pcm = _stitch(stitcher, [np.ones(1000, np.float32), -np.ones(1000, np.float32)])
+    seam = pcm[1000 - fade:1000]
+    assert seam[0] == pytest.approx(1.0) and seam[-1] == pytest.approx(-1.0)
+    assert np.all(np.diff(seam) < 0)
+    assert np.all(pcm[:1000 - fade] == 1.0) and np.all(pcm[1000:] == -1.0)
+
+
+def test_piece_shorter_than_the_crossfade():
+    stitcher = Stitcher(SR, crossfade_ms=10, trim=False)
+    lengths = [1000, 100, 1000]
+    pcm = _stitch(stitcher, [np.ones(n, np.float32) for n in lengths])
+    fade = stitcher.fade
+    assert len(pcm) == sum(lengths) - 100 - fade  # a seam overlaps no more than the new piece
+    np.testing.assert_allclose(pcm, 1.0, atol=1e-6)
+
+
+def test_trailing_silence_trimmed_before_the_seam():
+    stitcher = Stitcher(SR, crossfade_ms=10, trim=True)
+    t = np.arange(SR // 2) / SR
+    speech = (0.3 * np.sin(2 * np.pi * 200 * t)).astype(np.float32)
+    piece = np.concatenate([speech, np.zeros(SR, np.float32)])
+    pcm = _stitch(stitcher, [piece, piece])
+    assert len(pcm) < 2 * len(speech) + SR  # most of the first second of silence is gone
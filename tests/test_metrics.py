@@ -0,0 +1,76 @@
+"""Metrics: histogram quantiles and the service-time fit behind admission control."""
+
+import pytest
+
+from jarvis.metrics import (PRIOR_BASE_S, PRIOR_PER_CHAR_S, SERVICE_MIN_SAMPLES, Histogram,
+                            ServiceTime)
+
+
+def test_histogram_quantiles():
+    h = Histogram((1, 2, 5))
+    for v in (0.5, 1.5, 1.5, 4, 10):
+        h.observe(v)
+    snap = h.snapshot()
+    assert snap["count"] == 5 and snap["max"] == 10
+    assert snap["buckets"] == [[1, 1], [2, 2], [5, 1], ["+inf", 1]]
+    assert h.quantile(0.5) == pytest.approx(1.75)
+    assert h.quantile(1.0) == 10
+    assert Histogram((1,)).quantile(0.5) is None
+
+
+def test_prior_until_enough_samples():
+    st = ServiceTime("m")
+    for _ in range(SERVICE_MIN_SAMPLES - 1):
+        st.observe("French", 100, 9.0)
+    assert st.fit("French") == (PRIOR_BASE_S, PRIOR_PER_CHAR_S)
+    st.observe("French", 100, 9.0)
+    assert st.fit("French") != (PRIOR_BASE_S, PRIOR_PER_CHAR_S)
+    assert st.fit("English") == (PRIOR_BASE_S, PRIOR_PER_CHAR_S)
+
+
+def test_fit_recovers_a_line():
+    st = ServiceTime("m")
+    for chars in (20, 50, 80, 150, 300, 40, 220):
+        st.observe("French", chars, 0.8 + 0.03 * chars)
+    base, per_char = st.fit("French")
+    assert base == pytest.approx(0.8)
+    assert per_char == pytest.approx(0.03)
+    assert st.predict("French", 100) == pytest.approx(3.8)
+
+
+def test_languages_are_fitted_apart():
+    st = ServiceTime("m")
+    for chars in (20, 100, 200):
+        st.observe("French", chars, 0.5 + 0.02 * chars)
+        st.observe("English", chars, 1.0 + 0.05 * chars)
+    assert st.fit("French") == pytest.approx((0.5, 0.02))
+    assert st.fit("English") == pytest.approx((1.0, 0.05))
+    assert st.snapshot()["languages"]["English"]["samples"] == 3
+
+
+def test_same_length_samples_fall_back_to_origin():
+    st = ServiceTime("m")
+    for seconds in (4.0, 5.0, 6.0):
+        st.observe("French", 100, seconds)  # no spread in x: slope undetermined
+    base, per_char = st.fit("French")
+    assert base == 0.0
+    assert per_char == pytest.approx(0.05, rel=0.02)
+
+
+def test_negative_intercept_falls_back_to_origin():
+    st = ServiceTime("m")
+    for chars in (50, 100, 200):
+        st.observe("French", chars, -1.0 + 0.05 * chars)
+    base, per_char = st.fit("French")
+    assert base == 0.0 and per_char > 0
+
+
+def test_recent_observations_weigh_more():
+    st = ServiceTime("m")
+    for _ in range(20):
+        for chars in (50, 150):
+            st.observe("French", chars, 0.02 * chars)
+    for _ in range(100):
+        for chars in (50, 150):
+            st.observe("French", chars, 0.06 * chars)  # the machine got slower
+    assert st.fit("French")[1] == pytest.approx(0.06, rel=0.05)
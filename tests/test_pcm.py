@@ -0,0 +1,103 @@
+"""PcmBuffer: window energies and trimming must agree with the array code they replace."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sounddevice")  # jarvis.handlers, for the array trim_trailing_silence
+
+from jarvis.handlers import trim_trailing_silence  # noqa: E402
+from jarvis.pcm import PcmBuffer  # noqa: E402
+
+SR = 24000
+
+
+def _utterance(seed: int) -> list[np.ndarray]:
+    """Chunks of uneven sizes: loud and quiet stretches, ending in a quiet tail."""
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for i in range(12):
+        n = int(rng.integers(1, 4000))
+        level = 0.003 if i in (4, 5) or i >= 9 else rng.uniform(0.05, 0.4)
+        chunks.append(rng.normal(0, level, n).astype(np.float32))
+    return chunks
+
+
+def _buffer(chunks, capacity_s=0.05) -> PcmBuffer:
+    buf = PcmBuffer(SR, capacity_s)  # small: appends also grow the buffer
+    for c in chunks:
+        buf.append(c.reshape(-1, 1))
+    return buf
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_trim_matches_array_baseline(seed):
+    chunks = _utterance(seed)
+    audio = np.concatenate(chunks).reshape(-1, 1)
+    buf = _buffer(chunks)
+    np.testing.assert_array_equal(buf.view(), audio)
+    for min_silence_s in (0.0, 0.15, 0.5):
+        np.testing.assert_array_equal(trim_trailing_silence(buf, SR, min_silence_s=min_silence_s),
+                                      trim_trailing_silence(audio, SR, min_silence_s=min_silence_s))
+
+
+@pytest.mark.parametrize("threshold", [0.001, 0.01, 0.1, 0.3])
+def test_trim_threshold_passed_through(threshold):
+    chunks = _utterance(3)
+    audio = np.concatenate(chunks).reshape(-1, 1)
+    np.testing.assert_array_equal(trim_trailing_silence(_buffer(chunks), SR, threshold),
+                                  trim_trailing_silence(audio, SR, threshold))
+
+
+def test_trim_rejects_another_sample_rate():
+    with pytest.raises(ValueError):
+        trim_trailing_silence(_buffer(_utterance(0)), 16000)
+
+
+def test_silent_buffer_trims_to_nothing():
+    buf = _buffer([np.zeros(5000, np.float32)])
+    assert buf.trim_end() == 0 and len(trim_trailing_silence(buf, SR)) == 0
+
+
+def test_chunk_and_window_rms():
+    buf = PcmBuffer(SR, 1.0)
+    first = np.full(700, 0.5, np.float32)  # 480-sample windows: completes one, starts another
+    assert buf.append(first) == pytest.approx(0.5)
+    np.testing.assert_allclose(buf.window_rms(), [0.5])
+    second = np.full(1000, 0.1, np.float32)
+    assert buf.append(second) == pytest.approx(0.1)
+    rms = buf.window_rms()  # the window first started, then a full window of second
+    assert len(rms) == 2
+    assert rms[0] == pytest.approx(np.sqrt((220 * 0.25 + 260 * 0.01) / 480))
+    assert rms[1] == pytest.approx(0.1)
+
+
+def test_truncate_drops_a_silent_chunk():
+    chunks = _utterance(5)[:4]
+    buf = _buffer(chunks)
+    kept = len(buf)
+    end = buf.trim_end()
+    buf.append(np.zeros(3000, np.float32))
+    buf.truncate(kept)
+    assert len(buf) == kept and buf.trim_end() == end
+    buf.append(np.full(2000, 0.3, np.float32))  # window energies restart from the cut
+    audio = np.concatenate(chunks + [np.full(2000, 0.3, np.float32)]).reshape(-1, 1)
+    np.testing.assert_array_equal(trim_trailing_silence(buf, SR), trim_trailing_silence(audio, SR))
+
+
+def test_reset_reuses_the_allocation():
+    buf = _buffer(_utterance(1), capacity_s=1.0)
+    buf.reset()
+    assert len(buf) == 0 and buf.trim_end() == 0
+    chunks = _utterance(2)
+    for c in chunks:
+        buf.append(c)
+    audio = np.concatenate(chunks).reshape(-1, 1)
+    np.testing.assert_array_equal(trim_trailing_silence(buf, SR), trim_trailing_silence(audio, SR))
+
+
+def test_blocks_cover_the_audio():
+    chunks = _utterance(4)
+    buf = _buffer(chunks)
+    blocks = list(buf.blocks(SR // 10))
+    assert all(len(b) <= SR // 10 for b in blocks)
+    np.testing.assert_array_equal(np.concatenate(blocks), buf.view())
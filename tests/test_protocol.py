@@ -0,0 +1,90 @@
+"""Wire format: frame round-trips and audio format negotiation."""
+
+import base64
+import struct
+
+import numpy as np
+import pytest
+
+from jarvis import protocol
+from jarvis.protocol import ProtocolError
+
+
+def _payload(framed: bytes) -> bytes:
+    (size,) = struct.unpack("!I", framed[:4])
+    assert size == len(framed) - 4
+    return framed[4:]
+
+
+def test_json_frame_round_trip():
+    msg = {"status": "ok", "id": "r1", "text": "Bonjour à tous"}
+    assert protocol.decode(_payload(protocol.encode_json(msg))) == msg
+
+
+@pytest.mark.parametrize("sample_format", ["float32", "int16"])
+def test_audio_frame_round_trip(sample_format):
+    pcm, sr = protocol.convert(np.linspace(-0.5, 0.5, 480, dtype=np.float32), 24000,
+                               sample_format)
+    framed = protocol.encode_audio({"status": "audio", "id": "r1"}, pcm, sr, sample_format)
+    msg = protocol.decode(_payload(framed))
+    assert msg["status"] == "audio" and msg["id"] == "r1"
+    assert msg["sample_rate"] == 24000
+    assert msg["dtype"] == sample_format
+    assert msg["channels"] == 1
+    np.testing.assert_array_equal(msg["pcm"], pcm)
+
+
+def test_to_float32_binary_and_base64_agree():
+    pcm, _ = protocol.convert(np.linspace(-1, 1, 100, dtype=np.float32), 24000, "int16")
+    binary = protocol.decode(_payload(protocol.encode_audio({}, pcm, 24000, "int16")))
+    as_json = {"audio": base64.b64encode(pcm.tobytes()).decode(), "dtype": "int16"}
+    a, b = protocol.to_float32(binary), protocol.to_float32(as_json)
+    assert a.shape == b.shape == (100, 1)
+    np.testing.assert_array_equal(a, b)
+    np.testing.assert_allclose(a[:, 0], np.linspace(-1, 1, 100), atol=1 / 16384)
+
+
+def test_decode_rejects_bad_audio_frames():
+    good = _payload(protocol.encode_audio({}, np.zeros(4, np.float32), 24000))
+    with pytest.raises(ProtocolError):
+        protocol.decode(good[:protocol.HEADER.size - 1])
+    with pytest.raises(ProtocolError, match="version"):
+        protocol.decode(good[:4] + bytes([protocol.VERSION + 1]) + good[5:])
+    with pytest.raises(ProtocolError, match="sample format"):
+        protocol.decode(good[:5] + bytes([99]) + good[6:])
+
+
+def test_negotiate_defaults_and_values():
+    assert protocol.negotiate({}) == (False, "float32", None)
+    assert protocol.negotiate({"wire": "binary", "sample_format": "int16",
+                               "sample_rate": "16000"}) == (True, "int16", 16000)
+
+
+@pytest.mark.parametrize("request_", [
+    {"wire": "msgpack"},
+    {"sample_format": "int8"},
+    {"sample_rate": 4000},
+    {"sample_rate": 384000},
+])
+def test_negotiate_rejects(request_):
+    with pytest.raises(ProtocolError):
+        protocol.negotiate(request_)
+
+
+def test_convert_resamples_and_quantizes():
+    pcm = np.full(2400, 0.5, np.float32)
+    out, sr = protocol.convert(pcm, 24000, "float32", 16000)
+    assert sr == 16000 and len(out) == 1600 and out.dtype == np.float32
+    np.testing.assert_allclose(out, 0.5)
+
+    out, sr = protocol.convert(np.array([2.0, -2.0, 0.5], np.float32), 24000, "int16")
+    assert sr == 24000
+    assert out.dtype == np.dtype("<i2")
+    assert out.tolist() == [32767, -32767, 16383]
+
+
+def test_convert_same_rate_is_unchanged():
+    pcm = np.random.default_rng(0).uniform(-1, 1, 1000).astype(np.float32)
+    out, sr = protocol.convert(pcm.reshape(-1, 1), 24000, "float32", 24000)
+    assert sr == 24000
+    np.testing.assert_array_equal(out, pcm)
@@ -0,0 +1,122 @@
+"""QualityScore thresholds, and a Generation giving up early on a clearly bad take."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sounddevice")  # imported by jarvis.handlers for playback
+
+from jarvis.handlers import (BAD_RMS_THRESHOLD, EARLY_ABORT_CHUNKS, MAX_RETRIES,  # noqa: E402
+                             Generation, QualityScore)
+from jarvis.pcm import PcmBuffer  # noqa: E402
+
+SR = 24000
+CHUNK = SR // 10
+
+
+def _tone(rms: float, n: int = CHUNK) -> np.ndarray:
+    """A 200 Hz tone with harmonics (voiced-speech-like spectrum) at the given RMS."""
+    t = np.arange(n) / SR
+    wave = sum(np.sin(2 * np.pi * 200 * k * t) / k for k in (1, 2, 3))
+    return (wave * rms / np.sqrt(np.mean(wave ** 2))).astype(np.float32)
+
+
+def _noise(rms: float, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(0, rms, CHUNK).astype(np.float32)
+
+
+def _score(chunks) -> QualityScore:
+    take, score = PcmBuffer(SR), QualityScore()
+    for chunk in chunks:
+        start = len(take)
+        score.add(take, start, take.append(chunk))
+    return score
+
+
+def test_clean_take_passes():
+    score = _score([_tone(0.05)] * 5)
+    assert score.rms == pytest.approx(0.05, rel=0.01)
+    assert score.clip_ratio == 0 and score.silence_ratio == 0
+    assert score.flatness < 0.1
+    assert score.defect() is None and score.passes()
+
+
+def test_rms_gate_between_pass_and_abort():
+    score = _score([_tone(0.15)] * 5)  # above BAD_RMS_THRESHOLD, below ABORT_RMS
+    assert score.rms > BAD_RMS_THRESHOLD
+    assert score.defect() is None and not score.passes()
+    loud = _score([_tone(0.25)] * 5)
+    assert loud.defect().startswith("rms") and not loud.passes()
+
+
+def test_clipping():
+    chunk = np.clip(_tone(0.08) * 12, -1, 1)
+    score = _score([_tone(0.05), chunk])
+    assert score.clip_ratio > 0.01
+    assert score.defect().startswith("clipping")
+
+
+def test_noise_is_flat():
+    score = _score([_noise(0.05, seed) for seed in range(3)])
+    assert score.flatness > 0.4
+    assert score.defect().startswith("noise")
+
+
+def test_silence():
+    score = _score([np.zeros(CHUNK, np.float32)] * 3)
+    assert score.silence_ratio == 1.0 and score.flatness is None
+    assert score.defect().startswith("silence") and not score.passes()
+
+
+def test_abort_waits_for_enough_chunks():
+    chunks = [_tone(0.3)] * EARLY_ABORT_CHUNKS
+    assert _score(chunks[:-1]).abort_reason() is None
+    assert _score(chunks).abort_reason() is not None
+
+
+class Chunk:
+    def __init__(self, audio):
+        self.audio = audio
+
+
+class FlakyModel:
+    """Voice-design stub: the first `bad` takes are loud noise, later takes a clean tone."""
+
+    sample_rate = SR
+
+    class config:
+        tts_model_type = "voice_design"
+
+    def __init__(self, bad: int, chunks: int = 8):
+        self.bad = bad
+        self.chunks = chunks
+        self.takes = []  # chunks pulled from each take
+
+    def generate_voice_design(self, text, **kwargs):
+        bad = len(self.takes) < self.bad
+        self.takes.append(0)
+        for i in range(self.chunks):
+            self.takes[-1] += 1
+            yield Chunk(_noise(0.3, i) if bad else _tone(0.05))
+
+
+def _run(model) -> dict:
+    gen = Generation(model, {"text": "Bonjour tout le monde.", "output": "/dev/null"})
+    while not gen.done:
+        gen.step()
+    return gen.result
+
+
+def test_bad_take_aborted_early_then_retried():
+    model = FlakyModel(bad=1)
+    result = _run(model)
+    assert model.takes == [EARLY_ABORT_CHUNKS, model.chunks]
+    assert result["status"] == "ok" and result["passed"]
+    assert result["attempts"] == 2 and result["aborted"] == 1
+
+
+def test_last_attempt_is_never_aborted():
+    model = FlakyModel(bad=MAX_RETRIES)
+    result = _run(model)
+    assert model.takes == [EARLY_ABORT_CHUNKS] * (MAX_RETRIES - 1) + [model.chunks]
+    assert result["status"] == "ok" and not result["passed"]
+    assert result["attempts"] == MAX_RETRIES and result["aborted"] == MAX_RETRIES - 1
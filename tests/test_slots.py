@@ -0,0 +1,87 @@
+"""Worker slots: generations stepped in turn must not change each other's audio."""
+
+import zlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sounddevice")  # imported by jarvis.handlers for playback
+
+from jarvis.handlers import Generation  # noqa: E402
+
+SR = 24000
+
+
+class Chunk:
+    def __init__(self, audio):
+        self.audio = audio
+
+
+class StubModel:
+    """Deterministic voice-design model: a tone per text, 100 ms chunks, then silence."""
+
+    sample_rate = SR
+
+    class config:
+        tts_model_type = "voice_design"
+
+    def generate_voice_design(self, text, **kwargs):
+        rng = np.random.default_rng(zlib.crc32(text.encode()))
+        freq = rng.uniform(120, 300)
+        t = np.arange(SR // 10) / SR
+        for i in range(len(text) // 3 + 2):
+            amp = rng.uniform(0.2, 0.4)
+            yield Chunk((amp * np.sin(2 * np.pi * freq * (t + i / 10))).astype(np.float32))
+        yield Chunk(np.zeros(SR // 10, np.float32))
+
+
+def _generation(model, text, outputs):
+    request = {"text": text, "language": "French", "output": "/dev/null"}
+    return Generation(model, request, on_audio=lambda a: outputs.setdefault(text, a.copy()))
+
+
+TEXTS = ["Bonjour tout le monde.", "Une phrase un peu plus longue que la première.", "Salut."]
+
+
+def test_interleaved_generations_match_sequential():
+    model = StubModel()
+
+    sequential = {}
+    for text in TEXTS:
+        gen = _generation(model, text, sequential)
+        while not gen.done:
+            gen.step()
+        assert gen.result["status"] == "ok"
+
+    interleaved = {}
+    active = [_generation(model, text, interleaved) for text in TEXTS]
+    while active:
+        for gen in active:
+            gen.step()
+        assert all(g.result["status"] == "ok" for g in active if g.done)
+        active = [g for g in active if not g.done]
+
+    assert sequential.keys() == interleaved.keys() == set(TEXTS)
+    for text in TEXTS:
+        assert len(sequential[text]) > 0
+        np.testing.assert_array_equal(interleaved[text], sequential[text])
+
+
+class PendingModel(StubModel):
+    """A batched model: results without audio while the request waits for its batch."""
+
+    def generate_voice_design(self, text, **kwargs):
+        for chunk in super().generate_voice_design(text, **kwargs):
+            yield Chunk(None)
+            yield chunk
+
+
+def test_pending_results_are_not_chunks():
+    expected, pending = {}, {}
+    for model, outputs in ((StubModel(), expected), (PendingModel(), pending)):
+        gen = _generation(model, TEXTS[0], outputs)
+        gen.max_chunks = len(TEXTS[0]) // 3 + 3  # the stub's chunks, pending ones excluded
+        while not gen.done:
+            gen.step()
+        assert gen.result["status"] == "ok"
+    np.testing.assert_array_equal(pending[TEXTS[0]], expected[TEXTS[0]])